@@ -1,6 +1,6 @@
 import tkinter
 from tkinter import *
-import random
+from sampling import QuestionSampler
 
 questions = [
     "r = lambda q: q * 2\ns = lambda q: q * 3\nx = 2\nx = r(x)\nx = s(x)\nx = r(x)\nprint x",
@@ -31,13 +31,11 @@ answers_choice = [
 answers = [1, 1, 2, 1, 3, 1, 3, 3, 0, 3]
 user_answer = []
 indexes = []
+sampler = QuestionSampler()
 
 def gen():
     global indexes
-    while len(indexes) < 10:
-        x = random.randint(0, 9)
-        if x not in indexes:
-            indexes.append(x)
+    indexes = sampler.sample(len(questions), 10)
 
 def showresult(score):
     lblQuestion.destroy()
@@ -0,0 +1,217 @@
+import logging
+import math
+import random
+import threading
+from array import array
+from bisect import bisect_left
+
+log = logging.getLogger(__name__)
+
+
+def difficulty_estimate(attempts, correct):
+    """
+    Difficulty of a question on the logit scale used for abilities: 0 for a
+    question half the players get right, higher for harder ones. Smoothed so
+    questions with few or no answers start at 0.
+    """
+    p = (correct + 1) / (attempts + 2)
+    return math.log((1 - p) / p)
+
+
+class DifficultyIndex:
+    """The questions of one category sorted by difficulty, for nearest-difficulty lookups."""
+
+    def __init__(self, difficulties, rng):
+        order = list(range(len(difficulties)))
+        rng.shuffle(order)  # Equal difficulties, e.g. unanswered questions, come out in random order
+        order.sort(key=difficulties.__getitem__)
+        self.difficulties = array('d', (difficulties[idx] for idx in order))
+        self.questions = array('I', order)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def nearest(self, target, exclude, spread, rng):
+        """
+        A random one of the `spread` questions closest in difficulty to `target`
+        that aren't in `exclude`, or None. Bisecting finds the position in
+        O(log n); the walk outwards only steps over excluded questions.
+        """
+        difficulties, questions = self.difficulties, self.questions
+        right = bisect_left(difficulties, target)
+        left = right - 1
+        candidates = []
+        while len(candidates) < spread and (left >= 0 or right < len(questions)):
+            if right >= len(questions) or (left >= 0 and target - difficulties[left] <= difficulties[right] - target):
+                pos, left = left, left - 1
+            else:
+                pos, right = right, right + 1
+            if questions[pos] not in exclude:
+                candidates.append(questions[pos])
+        return rng.choice(candidates) if candidates else None
+
+
+class AdaptiveState:
+    """A player's running ability estimate during an adaptive quiz."""
+    __slots__ = ("ability", "error", "asked", "difficulties", "results")
+
+    def __init__(self):
+        self.ability = 0.0
+        self.error = 1.0                # standard error of the ability estimate
+        self.asked = set()
+        self.difficulties = array('d')  # of the answered questions, in order
+        self.results = array('b')
+
+
+class AdaptiveSelector:
+    """
+    Picks each question of an adaptive quiz to match the player's current
+    ability, using a Rasch (one-parameter IRT) model.
+
+    Question difficulties come from the answer statistics in `stats` (a
+    QuestionStats) and are kept in a DifficultyIndex per category. An index
+    is rebuilt once its category has grown or has had `rebuild_after` new
+    answers. Rebuilds run on a background thread while the old index keeps
+    serving, so a pick is always a bisect. A category that has no index yet
+    gets random questions until its first build finishes. After each answer
+    the ability is re-estimated (MAP with a standard normal prior) and the
+    next question is the one whose difficulty is nearest to it. A quiz ends
+    after `max_questions`, or once `min_questions` have been asked and the
+    ability is known to within `target_error`.
+
+    With `background=False` indexes are built when needed on the calling
+    thread, which keeps picks reproducible for a given `seed`.
+    """
+
+    def __init__(self, bank, stats=None, max_questions=12, min_questions=6, target_error=0.6,
+                 spread=3, rebuild_after=500, seed=None, background=True):
+        self.bank = bank
+        self.stats = stats
+        self.max_questions = max_questions
+        self.min_questions = min_questions
+        self.target_error = target_error
+        self.spread = spread
+        self.rebuild_after = rebuild_after
+        self.background = background
+        self.rng = random.Random(seed)
+        self._build_rng = random.Random(seed)   # only used by whichever thread builds indexes
+        self._indexes = {}      # category -> (DifficultyIndex, question count, answers recorded when built)
+        self._wanted = {}       # categories waiting for a rebuild, in request order
+        self._lock = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def _recorded(self, category):
+        return self.stats.recorded(category) if self.stats is not None else 0
+
+    def _stale(self, category, cached):
+        return (cached is None or cached[1] != self.bank.count(category)
+                or self._recorded(category) - cached[2] >= self.rebuild_after)
+
+    def index(self, category):
+        """The category's current DifficultyIndex, or None while its first build is still running."""
+        cached = self._indexes.get(category)
+        if self._stale(category, cached):
+            if not self.background:
+                self._rebuild(category)
+                return self._indexes[category][0]
+            with self._lock:
+                if category not in self._wanted:
+                    self._wanted[category] = None
+                    self._start()
+                    self._lock.notify()
+        return cached[0] if cached is not None else None
+
+    def _rebuild(self, category):
+        count = self.bank.count(category)
+        recorded = self._recorded(category)
+        counters = self.stats.categories.get(category) if self.stats is not None else None
+        answered = min(count, len(counters)) if counters is not None else 0
+        difficulties = [difficulty_estimate(counters.attempts[idx], counters.correct[idx]) for idx in range(answered)]
+        difficulties += [0.0] * (count - answered)
+        self._indexes[category] = (DifficultyIndex(difficulties, self._build_rng), count, recorded)
+
+    def _start(self):
+        if self._thread is None and not self._closed:
+            self._thread = threading.Thread(target=self._run, name="adaptive-index", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._wanted and not self._closed:
+                    self._lock.wait()
+                if self._closed:
+                    return
+                category = next(iter(self._wanted))
+            try:
+                self._rebuild(category)
+            except Exception:
+                # Quizzes keep picking at random; the next pick asks for another rebuild
+                log.exception("Could not rebuild the difficulty index of %r", category)
+            finally:
+                with self._lock:
+                    del self._wanted[category]
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def difficulty(self, category, idx):
+        """The current difficulty estimate of one question, straight from the statistics."""
+        counters = self.stats.categories.get(category) if self.stats is not None else None
+        if counters is None or idx >= len(counters):
+            return 0.0
+        return difficulty_estimate(counters.attempts[idx], counters.correct[idx])
+
+    def start(self, category):
+        """Returns (state, first question index) for a new quiz in `category`."""
+        state = AdaptiveState()
+        return state, self._pick(state, category)
+
+    def _pick(self, state, category):
+        index = self.index(category)
+        if index is not None:
+            idx = index.nearest(state.ability, state.asked, self.spread, self.rng)
+        else:
+            idx = self._random_pick(state, category)
+        if idx is not None:
+            state.asked.add(idx)
+        return idx
+
+    def answered(self, state, category, idx, is_correct):
+        """Updates the ability estimate; returns the next question index, or None when the quiz is done."""
+        state.difficulties.append(self.difficulty(category, idx))
+        state.results.append(is_correct)
+        self._estimate(state)
+        asked = len(state.results)
+        if asked >= self.max_questions or (asked >= self.min_questions and state.error <= self.target_error):
+            return None
+        return self._pick(state, category)
+
+    def _random_pick(self, state, category):
+        # Fewer than max_questions are ever asked, so this takes a few tries at most
+        count = self.bank.count(category)
+        if len(state.asked) >= count:
+            return None
+        while True:
+            idx = self.rng.randrange(count)
+            if idx not in state.asked:
+                return idx
+
+    @staticmethod
+    def _estimate(state):
+        # A few Newton steps on the log posterior; the quiz has at most a few dozen answers
+        theta = state.ability
+        for _ in range(4):
+            gradient, information = -theta, 1.0
+            for b, x in zip(state.difficulties, state.results):
+                p = 1 / (1 + math.exp(b - theta))
+                gradient += x - p
+                information += p * (1 - p)
+            theta = max(-6.0, min(6.0, theta + gradient / information))
+        state.ability = theta
+        state.error = 1 / math.sqrt(information)
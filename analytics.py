@@ -0,0 +1,236 @@
+import argparse
+import json
+import math
+from array import array
+from contextlib import nullcontext
+
+from write_behind import WriteBehindFile
+
+COUNTERS = {"attempts": "I", "correct": "I", "time_total": "d",
+            "scored": "I", "scored_correct": "I", "rest_sum": "d", "rest_sq_sum": "d", "rest_correct_sum": "d"}
+
+
+class _CategoryStats:
+    """Running counters for the questions of one category, one array slot per question."""
+    __slots__ = tuple(COUNTERS) + ("stride", "choice_counts", "recorded")
+
+    def __init__(self, stride=4):
+        for name, typecode in COUNTERS.items():
+            setattr(self, name, array(typecode))
+        self.stride = stride                # choice_counts slots per question
+        self.choice_counts = array("I")     # question * stride + choice -> times chosen
+        self.recorded = 0                   # answers since this process started
+
+    def __len__(self):
+        return len(self.attempts)
+
+    def ensure(self, idx, num_choices):
+        if num_choices > self.stride:
+            # Widen every question's run of choice counters
+            old, old_stride = self.choice_counts, self.stride
+            self.stride = num_choices
+            self.choice_counts = array("I", bytes(4 * self.stride * len(self)))
+            for q in range(len(self)):
+                self.choice_counts[q * self.stride:q * self.stride + old_stride] = old[q * old_stride:(q + 1) * old_stride]
+        grow = idx + 1 - len(self)
+        if grow > 0:
+            for name, typecode in COUNTERS.items():
+                getattr(self, name).extend(array(typecode, bytes(array(typecode).itemsize * grow)))
+            self.choice_counts.extend(array("I", bytes(4 * self.stride * grow)))
+
+
+class QuestionStats:
+    """
+    Streaming per-question analytics.
+
+    Every answer is folded into running counters as it happens: attempts,
+    correct answers, time taken and how often each choice was picked. When a
+    quiz ends, each answered question also gets the player's score on the
+    rest of that quiz, which is enough for the point-biserial discrimination
+    index. Both difficulty and discrimination are computed from these sums,
+    so no answer history is ever rescanned.
+
+    With a `path`, the counters are kept in a JSON file written behind, like
+    users.json and questions.json.
+    """
+
+    def __init__(self, path=None, flush_every=100, flush_interval=5.0):
+        self.categories = {}
+        self.answers_recorded = 0   # since this process started, for callers that cache derived data
+        self.writer = None
+        if path:
+            self.load(path)
+            self.writer = WriteBehindFile(path, self._snapshot, flush_every, flush_interval, indent=None)
+
+    def load(self, path):
+        """Reads the counters saved in `path`, if there are any. Nothing is written back to it."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._restore(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def _changing(self):
+        return self.writer.changing() if self.writer is not None else nullcontext()
+
+    def _category(self, name):
+        stats = self.categories.get(name)
+        if stats is None:
+            stats = self.categories[name] = _CategoryStats()
+        return stats
+
+    def record_answer(self, category, idx, choice, num_choices, is_correct, seconds):
+        """Counts one answer to question `idx` of `category`."""
+        with self._changing():
+            stats = self._category(category)
+            stats.ensure(idx, num_choices)
+            stats.attempts[idx] += 1
+            stats.correct[idx] += is_correct
+            stats.time_total[idx] += seconds
+            stats.choice_counts[idx * stats.stride + choice] += 1
+            stats.recorded += 1
+            self.answers_recorded += 1
+
+    def record_quiz(self, category, questions, correct, total):
+        """
+        Counts a finished quiz for discrimination: `questions` are the answered
+        question indices, `correct` whether each was answered correctly, and
+        `total` the number of questions the quiz had.
+        """
+        if total < 2:
+            return
+        score = sum(correct)
+        with self._changing():
+            stats = self._category(category)
+            for idx, is_correct in zip(questions, correct):
+                stats.ensure(idx, 0)
+                # Score on the other questions, so a question isn't correlated with itself
+                rest = (score - is_correct) / (total - 1)
+                stats.scored[idx] += 1
+                stats.rest_sum[idx] += rest
+                stats.rest_sq_sum[idx] += rest * rest
+                if is_correct:
+                    stats.scored_correct[idx] += 1
+                    stats.rest_correct_sum[idx] += rest
+
+    def recorded(self, category):
+        """Answers recorded for `category` since this process started."""
+        stats = self.categories.get(category)
+        return stats.recorded if stats is not None else 0
+
+    def question(self, category, idx):
+        """
+        Returns a dict of statistics for a question: attempts, difficulty (share
+        answered correctly), mean_time (seconds), choices (times each was picked)
+        and discrimination (point-biserial correlation of answering correctly
+        with the rest of the quiz; None until it can be computed).
+        """
+        stats = self.categories.get(category)
+        if stats is None or idx >= len(stats):
+            return {"attempts": 0, "difficulty": None, "mean_time": None, "choices": [], "discrimination": None}
+        attempts = stats.attempts[idx]
+        return {
+            "attempts": attempts,
+            "difficulty": stats.correct[idx] / attempts if attempts else None,
+            "mean_time": stats.time_total[idx] / attempts if attempts else None,
+            "choices": stats.choice_counts[idx * stats.stride:(idx + 1) * stats.stride].tolist(),
+            "discrimination": self._discrimination(stats, idx),
+        }
+
+    @staticmethod
+    def _discrimination(stats, idx):
+        n, n1 = stats.scored[idx], stats.scored_correct[idx]
+        if n1 == 0 or n1 == n:
+            return None
+        mean = stats.rest_sum[idx] / n
+        variance = stats.rest_sq_sum[idx] / n - mean * mean
+        if variance <= 1e-12:
+            return None
+        mean1 = stats.rest_correct_sum[idx] / n1
+        mean0 = (stats.rest_sum[idx] - stats.rest_correct_sum[idx]) / (n - n1)
+        p = n1 / n
+        return (mean1 - mean0) / math.sqrt(variance) * math.sqrt(p * (1 - p))
+
+    def report(self, category, min_attempts=1):
+        """Yields (index, statistics) for the questions of `category` answered at least `min_attempts` times."""
+        stats = self.categories.get(category)
+        for idx in range(len(stats) if stats else 0):
+            if stats.attempts[idx] >= min_attempts:
+                yield idx, self.question(category, idx)
+
+    def _snapshot(self):
+        return {name: dict({counter: getattr(stats, counter).tolist() for counter in COUNTERS},
+                           stride=stats.stride, choice_counts=stats.choice_counts.tolist())
+                for name, stats in self.categories.items()}
+
+    def _restore(self, data):
+        for name, saved in data.items():
+            stats = _CategoryStats(saved["stride"])
+            for counter, typecode in COUNTERS.items():
+                setattr(stats, counter, array(typecode, saved[counter]))
+            stats.choice_counts = array("I", saved["choice_counts"])
+            self.categories[name] = stats
+
+    def flush(self):
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def main():
+    from storage import open_storage
+
+    parser = argparse.ArgumentParser(description="Show per-question answer statistics.")
+    parser.add_argument("--stats", default="question_stats.json")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default=None)
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--category", default=None, help="only this category")
+    parser.add_argument("--min-attempts", type=int, default=20, help="ignore questions answered fewer times")
+    parser.add_argument("--limit", type=int, default=10, help="questions to list per section")
+    args = parser.parse_args()
+
+    stats = QuestionStats()
+    try:
+        with open(args.stats, "r", encoding="utf-8") as f:
+            stats._restore(json.load(f))
+    except FileNotFoundError:
+        parser.error(f"No statistics found at '{args.stats}'")
+    storage = open_storage(args.storage, args.db)
+    categories = storage.load_questions() or {}
+    storage.close()
+
+    for category in sorted(stats.categories):
+        if args.category and category != args.category:
+            continue
+        rows = list(stats.report(category, args.min_attempts))
+        print(f"{category}: {len(rows)} questions with at least {args.min_attempts} answers")
+        if not rows:
+            continue
+        questions = categories.get(category, {}).get("questions", [])
+        answers = categories.get(category, {}).get("answers", [])
+
+        def describe(idx, row):
+            text = questions[idx] if idx < len(questions) else "(question no longer in the bank)"
+            discrimination = "-" if row["discrimination"] is None else f"{row['discrimination']:+.2f}"
+            return (f"  #{idx + 1} {row['difficulty']:.0%} correct, discrimination {discrimination}, "
+                    f"{row['mean_time']:.1f}s, {row['attempts']} answers: {text}")
+
+        print(" Hardest:")
+        for idx, row in sorted(rows, key=lambda item: item[1]["difficulty"])[:args.limit]:
+            print(describe(idx, row))
+        # Questions that strong players miss more often than weak ones are usually ambiguous or mis-keyed
+        suspect = [(idx, row) for idx, row in rows
+                   if (row["discrimination"] is not None and row["discrimination"] < 0.1)
+                   or (idx < len(answers) and answers[idx] < len(row["choices"])
+                       and max(row["choices"]) > row["choices"][answers[idx]])]
+        if suspect:
+            print(" Worth checking (low discrimination, or a wrong choice picked more than the answer):")
+            for idx, row in sorted(suspect, key=lambda item: item[1]["discrimination"] or 0)[:args.limit]:
+                print(describe(idx, row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import struct
+import time
+import zlib
+from array import array
+
+from metrics import METRICS
+
+# Index record: attempt id, category checksum, offset of its first answer, answers, questions asked
+INDEX_RECORD = struct.Struct("<IIQII")
+# Start of the index file: magic and the log's random id, padded to the size of an index record
+HEADER = struct.Struct("<4s16s4x")
+MAGIC = b"QZA1"
+# Answer record: question index within the category, chosen choice
+ANSWER_RECORD = struct.Struct("<Ib")
+
+
+def category_id(name):
+    return zlib.crc32(name.encode("utf-8"))
+
+
+class AttemptLog:
+    """
+    Append-only record of every finished quiz's answers, so results can be
+    re-scored later, e.g. after an answer key is corrected.
+
+    Attempts are stored in two binary files of fixed-size records: the index
+    (`path`) with one record per attempt, and the answers (`path` + ".dat")
+    with one record per answered question. Fixed-size records can be read
+    straight into arrays for batch re-scoring.
+
+    Attempt ids count up from 1 in each log, so score entries store key(id),
+    which also holds the log's random id: results recorded through another
+    log, or a log that has since been replaced, never match this one's
+    attempts. Logs from before the header was added keep plain ids.
+    """
+
+    def __init__(self, path="attempts.bin"):
+        self.path = path
+        self.answers_path = path + ".dat"
+        try:
+            with open(path, "rb") as f:
+                header = f.read(HEADER.size)
+        except FileNotFoundError:
+            header = b""
+        self._index = open(path, "ab")
+        self._answers = open(self.answers_path, "ab")
+        size = self._index.tell()
+        if size < HEADER.size:
+            # A new log, or one that crashed before its first record was complete
+            self.log_id = os.urandom(16).hex()
+            self._index.truncate(0)
+            self._index.write(HEADER.pack(MAGIC, bytes.fromhex(self.log_id)))
+            self._index.flush()
+            self.header_size = size = HEADER.size
+            self._answers.truncate(0)
+            self._answers.seek(0)
+        elif header[:4] == MAGIC:
+            self.log_id = HEADER.unpack(header)[1].hex()
+            self.header_size = HEADER.size
+        else:
+            self.log_id = None
+            self.header_size = 0
+        # Drop a partial record left by a crash; answers without an index record are never read
+        index_size = size - (size - self.header_size) % INDEX_RECORD.size
+        self._index.truncate(index_size)
+        self._index.seek(index_size)
+        self.count = (index_size - self.header_size) // INDEX_RECORD.size
+        self.answer_count = self._answers.tell() // ANSWER_RECORD.size
+        self._answers.truncate(self.answer_count * ANSWER_RECORD.size)
+        self._answers.seek(self.answer_count * ANSWER_RECORD.size)
+
+    def key(self, attempt):
+        """The id score entries store for this log's `attempt`."""
+        return attempt if self.log_id is None else f"{self.log_id}-{attempt}"
+
+    def append(self, category, questions, choices, total):
+        """Records an attempt's answered question indices and choices; returns key(its attempt id)."""
+        started = time.perf_counter()
+        self.count += 1
+        answers = b"".join(ANSWER_RECORD.pack(q, c) for q, c in zip(questions, choices))
+        self._answers.write(answers)
+        self._answers.flush()
+        self._index.write(INDEX_RECORD.pack(self.count, category_id(category), self.answer_count,
+                                            len(choices), total))
+        self._index.flush()
+        METRICS.record_io("write", self.path, INDEX_RECORD.size + len(answers), time.perf_counter() - started)
+        self.answer_count += len(choices)
+        return self.key(self.count)
+
+    def flush(self):
+        self._answers.flush()
+        self._index.flush()
+
+    def read(self):
+        """
+        Returns the whole log as arrays: (attempt ids, category ids, answer
+        offsets, answer counts, totals, questions, choices).
+        """
+        self.flush()
+        with open(self.path, "rb") as f:
+            f.seek(self.header_size)
+            index = f.read(self.count * INDEX_RECORD.size)
+        with open(self.answers_path, "rb") as f:
+            answers = f.read(self.answer_count * ANSWER_RECORD.size)
+        columns = [array(code) for code in ("I", "I", "Q", "I", "I")]
+        for record in INDEX_RECORD.iter_unpack(index):
+            for column, value in zip(columns, record):
+                column.append(value)
+        questions, choices = array("I"), array("b")
+        for question, choice in ANSWER_RECORD.iter_unpack(answers):
+            questions.append(question)
+            choices.append(choice)
+        return tuple(columns) + (questions, choices)
+
+    def close(self):
+        self._index.close()
+        self._answers.close()
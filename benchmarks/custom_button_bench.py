@@ -0,0 +1,58 @@
+"""
+Measures CustomButton construction with a cold and a warm geometry cache.
+
+Run from the project root (needs a display):
+    python benchmarks/custom_button_bench.py
+"""
+import os
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from enhanced_quiz_app import STYLE, CustomButton
+
+# The buttons of the main menu and question screen
+BUTTONS = [
+    ("LOGIN", STYLE["FONT_BUTTON"], 20, 10, 25),
+    ("SIGN UP", STYLE["FONT_BUTTON"], 20, 10, 25),
+    ("Logout", ("Arial", 10), 15, 5, 15),
+    ("START QUIZ", STYLE["FONT_BUTTON"], 20, 10, 25),
+    ("HIGH SCORES", STYLE["FONT_BUTTON"], 20, 10, 25),
+    ("ADD QUESTIONS", STYLE["FONT_BUTTON"], 20, 10, 25),
+    ("MANAGE ADMINS", STYLE["FONT_BUTTON"], 20, 10, 25),
+    ("SUBMIT", (STYLE["FONT_BODY"][0], 12, "bold"), 30, 10, 25),
+]
+ROUNDS = 200
+
+
+def build(frame, cold):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        if cold:
+            CustomButton.geometry_cache.clear()
+        for text, font, padx, pady, radius in BUTTONS:
+            CustomButton(frame, text=text, command=None, font=font, padx=padx, pady=pady, radius=radius,
+                         bg_color=STYLE["PRIMARY"], fg_color=STYLE["TEXT_LIGHT"], hover_color=STYLE["SECONDARY"])
+        for widget in frame.winfo_children():
+            widget.destroy()
+    return (time.perf_counter() - started) / (ROUNDS * len(BUTTONS))
+
+
+def main():
+    root = tk.Tk()
+    root.withdraw()
+    frame = tk.Frame(root, bg=STYLE["BG"])
+
+    build(frame, cold=False)  # warm up Tk's font cache
+    cold = build(frame, cold=True)
+    warm = build(frame, cold=False)
+    print(f"cold cache: {cold * 1e6:8.1f} us per button")
+    print(f"warm cache: {warm * 1e6:8.1f} us per button")
+    print(f"speedup:    {cold / warm:8.2f}x  (hits={CustomButton.geometry_cache.hits}, misses={CustomButton.geometry_cache.misses})")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
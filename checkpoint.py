@@ -0,0 +1,205 @@
+import atexit
+import hashlib
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+
+from adaptive import AdaptiveState
+from write_behind import write_bytes_atomic
+
+MAGIC = b"QZC1"
+# magic, flags, question index, score, time limit, questions in order, seconds remaining (-1 when untimed)
+HEADER = struct.Struct("<4sBIIIId")
+ADAPTIVE_HEADER = struct.Struct("<ddI")
+CRC = struct.Struct("<I")
+FLAG_ADAPTIVE = 1
+
+
+class SessionCheckpoint:
+    """What is needed to pick a quiz up where it was left."""
+    __slots__ = ("user", "category", "difficulty", "order", "answers", "correct", "question_index", "score",
+                 "time_limit", "remaining", "adaptive")
+
+    @property
+    def total(self):
+        return len(self.order)
+
+
+def _pack_text(text):
+    data = text.encode("utf-8")
+    return struct.pack("<H", len(data)) + data
+
+
+def encode_session(session, remaining):
+    """Packs a QuizSession into bytes; `remaining` is its seconds left, None when untimed."""
+    adaptive = session.adaptive
+    parts = [HEADER.pack(MAGIC, FLAG_ADAPTIVE if adaptive is not None else 0, session.question_index,
+                         session.score, session.time_limit, len(session.order),
+                         -1.0 if remaining is None else remaining),
+             _pack_text(session.user or ""), _pack_text(session.category), _pack_text(session.difficulty),
+             session.order.tobytes(), session.answers.tobytes(), session.correct.tobytes()]
+    if adaptive is not None:
+        asked = array('I', adaptive.asked)
+        parts += [ADAPTIVE_HEADER.pack(adaptive.ability, adaptive.error, len(asked)), asked.tobytes(),
+                  adaptive.difficulties.tobytes(), adaptive.results.tobytes()]
+    data = b"".join(parts)
+    return data + CRC.pack(zlib.crc32(data))
+
+
+def decode_session(data):
+    """Unpacks bytes from encode_session(); raises ValueError if they are damaged."""
+    if len(data) < HEADER.size + CRC.size or CRC.unpack_from(data, len(data) - CRC.size)[0] != zlib.crc32(data[:-CRC.size]):
+        raise ValueError("Damaged checkpoint")
+    magic, flags, question_index, score, time_limit, count, remaining = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a quiz checkpoint")
+    pos = HEADER.size
+
+    def take(typecode, n):
+        nonlocal pos
+        values = array(typecode)
+        values.frombytes(data[pos:pos + n * values.itemsize])
+        pos += n * values.itemsize
+        return values
+
+    def text():
+        nonlocal pos
+        (length,) = struct.unpack_from("<H", data, pos)
+        pos += 2 + length
+        return data[pos - length:pos].decode("utf-8")
+
+    checkpoint = SessionCheckpoint()
+    checkpoint.user, checkpoint.category, checkpoint.difficulty = text(), text(), text()
+    checkpoint.order = take('I', count)
+    checkpoint.answers = take('b', question_index)
+    checkpoint.correct = take('b', question_index)
+    checkpoint.question_index = question_index
+    checkpoint.score = score
+    checkpoint.time_limit = time_limit
+    checkpoint.remaining = None if remaining < 0 else remaining
+    checkpoint.adaptive = None
+    if flags & FLAG_ADAPTIVE:
+        state = AdaptiveState()
+        state.ability, state.error, asked = ADAPTIVE_HEADER.unpack_from(data, pos)
+        pos += ADAPTIVE_HEADER.size
+        state.asked = set(take('I', asked))
+        state.difficulties = take('d', question_index)
+        state.results = take('b', question_index)
+        checkpoint.adaptive = state
+    return checkpoint
+
+
+class CheckpointWriter:
+    """
+    Keeps one checkpoint file per user for the quiz they are taking.
+
+    save() is cheap: it packs the session and hands it to a background thread,
+    which replaces the user's file atomically, at most once every
+    `min_interval` seconds per user. Only the latest state is written, so fast
+    answering costs one write per interval. discard() removes the file once
+    the quiz is over, and close() (also run at exit) writes whatever is pending.
+    """
+
+    def __init__(self, directory="checkpoints", min_interval=2.0):
+        self.directory = directory
+        self.min_interval = min_interval
+        self._made_directory = False    # created on the first write, not for every run of the app
+        self._lock = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._pending = {}      # path -> checkpoint bytes, or None to delete the file
+        self._last_write = {}   # path -> time of its last write
+        self._thread = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def path(self, user):
+        # Usernames can hold any character, so files are named by a digest
+        return os.path.join(self.directory, hashlib.blake2b(user.encode("utf-8"), digest_size=16).hexdigest() + ".ckpt")
+
+    def _queue(self, path, data):
+        with self._lock:
+            self._pending[path] = data
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="checkpoints", daemon=True)
+                self._thread.start()
+            self._lock.notify()
+
+    def save(self, engine, session):
+        self._queue(self.path(session.user), encode_session(session, engine.remaining(session)))
+
+    def discard(self, user):
+        self._queue(self.path(user), None)
+
+    def load(self, user):
+        """The user's last checkpoint, or None if there is none or it can't be read."""
+        path = self.path(user)
+        with self._lock:
+            data = self._pending.get(path, False)
+        if data is None:
+            return None
+        try:
+            if data is False:
+                with open(path, "rb") as f:
+                    data = f.read()
+            checkpoint = decode_session(data)
+        except (OSError, ValueError, UnicodeDecodeError, struct.error):
+            return None
+        return checkpoint if checkpoint.user == user else None
+
+    def _next_due(self):
+        """(path, 0) for a pending write that may happen now, else (None, seconds to wait or None)."""
+        now = time.monotonic()
+        wait = None
+        for path, data in self._pending.items():
+            due = now if data is None else self._last_write.get(path, 0.0) + self.min_interval
+            if due <= now:
+                return path, 0
+            wait = due - now if wait is None else min(wait, due - now)
+        return None, wait
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._closed and self._next_due()[0] is None:
+                    self._lock.wait(self._next_due()[1])
+                if self._closed:
+                    return
+            with self._io_lock:
+                with self._lock:
+                    path = self._next_due()[0]
+                    if path is None:
+                        continue
+                    data = self._pending.pop(path)
+                    self._last_write[path] = time.monotonic()
+                self._write(path, data)
+
+    def _write(self, path, data):
+        try:
+            if data is None:
+                os.remove(path)
+            else:
+                if not self._made_directory:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self._made_directory = True
+                write_bytes_atomic(path, data, label="checkpoint")
+        except OSError:
+            pass  # Already gone, or a missed checkpoint, which only means resuming from an earlier one
+
+    def flush(self):
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for path, data in pending.items():
+                self._write(path, data)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)
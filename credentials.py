@@ -0,0 +1,164 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+DEFAULT_KDF = {"algorithm": "scrypt", "n": 2 ** 14, "r": 8, "p": 1}
+FALLBACK_KDF = {"algorithm": "pbkdf2_sha256", "iterations": 240000}
+SALT_BYTES = 16
+
+
+class ServiceBusy(Exception):
+    """Raised when too many credential checks are already queued."""
+
+
+def _resolve_kdf(kdf):
+    kdf = dict(kdf or DEFAULT_KDF)
+    # hashlib.scrypt is only available when Python is built against OpenSSL 1.1+
+    if kdf["algorithm"] == "scrypt" and not hasattr(hashlib, "scrypt"):
+        kdf = dict(FALLBACK_KDF)
+    return kdf
+
+
+def _derive(secret, salt, kdf):
+    if kdf["algorithm"] == "scrypt":
+        n, r, p = kdf["n"], kdf["r"], kdf["p"]
+        return hashlib.scrypt(secret.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=32)
+    if kdf["algorithm"] == "pbkdf2_sha256":
+        return hashlib.pbkdf2_hmac("sha256", secret.encode(), salt, kdf["iterations"])
+    raise ValueError(f"Unsupported KDF: {kdf['algorithm']}")
+
+
+def _parse(encoded):
+    """Splits a stored hash into (kdf, salt, digest). Bare SHA-256 hex digests are the legacy format."""
+    parts = encoded.split("$")
+    if parts[0] == "scrypt" and len(parts) == 6:
+        kdf = {"algorithm": "scrypt", "n": int(parts[1]), "r": int(parts[2]), "p": int(parts[3])}
+        return kdf, bytes.fromhex(parts[4]), bytes.fromhex(parts[5])
+    if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+        kdf = {"algorithm": "pbkdf2_sha256", "iterations": int(parts[1])}
+        return kdf, bytes.fromhex(parts[2]), bytes.fromhex(parts[3])
+    return {"algorithm": "sha256"}, b"", encoded
+
+
+def hash_secret(secret, kdf=None):
+    kdf = _resolve_kdf(kdf)
+    salt = os.urandom(SALT_BYTES)
+    digest = _derive(secret, salt, kdf).hex()
+    if kdf["algorithm"] == "scrypt":
+        return f"scrypt${kdf['n']}${kdf['r']}${kdf['p']}${salt.hex()}${digest}"
+    return f"pbkdf2_sha256${kdf['iterations']}${salt.hex()}${digest}"
+
+
+def hash_secrets(secrets, kdf=None):
+    return [hash_secret(secret, kdf) for secret in secrets]
+
+
+def verify_secret(secret, encoded, kdf=None):
+    """
+    Checks `secret` against a stored hash. Returns (matches, new_hash), where
+    new_hash is a re-hash with the current KDF when the stored hash is a legacy
+    SHA-256 digest or uses outdated parameters, and None otherwise.
+    """
+    kdf = _resolve_kdf(kdf)
+    stored_kdf, salt, digest = _parse(encoded)
+    if stored_kdf["algorithm"] == "sha256":
+        matches = hmac.compare_digest(hashlib.sha256(secret.encode()).hexdigest(), digest)
+    else:
+        matches = hmac.compare_digest(_derive(secret, salt, stored_kdf), digest)
+
+    if matches and stored_kdf != kdf:
+        return True, hash_secret(secret, kdf)
+    return matches, None
+
+
+class CredentialService:
+    """
+    Runs password hashing and verification on a worker pool so a slow KDF
+    never blocks the caller. At most `max_pending` jobs are queued; beyond
+    that submissions fail fast with ServiceBusy.
+    """
+
+    def __init__(self, kdf=None, workers=None, max_pending=64, use_processes=True):
+        self.kdf = _resolve_kdf(kdf)
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.use_processes = use_processes
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1024)
+        self._started = time.monotonic()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ServiceBusy("Too many login attempts in progress, please try again.")
+
+        # The pool is started on first use to keep it off the startup path
+        if self._executor is None:
+            executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._executor = executor_class(max_workers=self.workers)
+
+        submitted_at = time.perf_counter()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._submitted += 1
+        future.add_done_callback(lambda f: self._on_done(f, submitted_at))
+        return future
+
+    def _on_done(self, future, submitted_at):
+        self._slots.release()
+        with self._lock:
+            self._latencies.append(time.perf_counter() - submitted_at)
+            if future.cancelled() or future.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    def hash(self, secret):
+        """Future resolving to the encoded hash of `secret`."""
+        return self._submit(hash_secret, secret, self.kdf)
+
+    def hash_many(self, secrets):
+        """Future resolving to a list of encoded hashes, computed in one job."""
+        return self._submit(hash_secrets, list(secrets), self.kdf)
+
+    def verify(self, secret, encoded):
+        """Future resolving to (matches, new_hash); see verify_secret."""
+        return self._submit(verify_secret, secret, encoded, self.kdf)
+
+    def metrics(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            elapsed = max(time.monotonic() - self._started, 1e-9)
+            result = {
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "pending": self._submitted - self._completed - self._failed,
+                "throughput_per_sec": self._completed / elapsed,
+            }
+        if latencies:
+            result["latency_avg_ms"] = sum(latencies) / len(latencies) * 1000
+            result["latency_p50_ms"] = latencies[len(latencies) // 2] * 1000
+            result["latency_p99_ms"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
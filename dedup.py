@@ -0,0 +1,208 @@
+import argparse
+import hashlib
+import operator
+import random
+import zlib
+from array import array
+
+MASK_64 = (1 << 64) - 1
+VALUE_MASK = (1 << 48) - 1
+EMPTY_BIN = 1 << 48
+DENSIFY_OFFSET = 0x9E3779B97F4A
+# Questions written from one template share bands; capping buckets keeps checks fast for them
+MAX_BUCKET = 64
+
+
+def normalize(text):
+    """Text as compared for duplicates: case and whitespace don't count."""
+    return " ".join(text.split()).casefold()
+
+
+def content_key(category, question, choices):
+    """8-byte digest identifying a question by its text and set of choices within a category."""
+    parts = [category, normalize(question)] + sorted(normalize(choice) for choice in choices)
+    return hashlib.blake2b("\0".join(parts).encode(), digest_size=8).digest()
+
+
+def shingles(question, choices, size=5):
+    """Hashes of the overlapping `size`-character pieces of the normalized question and choices."""
+    text = normalize(" | ".join([question] + list(choices)))
+    if len(text) <= size:
+        return {zlib.crc32(text.encode())}
+    return {zlib.crc32(text[i:i + size].encode()) for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    """
+    MinHash signatures, whose agreement estimates the Jaccard similarity of two
+    shingle sets. Uses one-permutation hashing: each shingle is hashed once and
+    kept as the minimum of one of `num_perm` bins, so a signature costs one pass
+    over the shingles rather than one per hash function. Empty bins borrow the
+    value of the next filled bin (densification).
+    """
+
+    def __init__(self, num_perm=32, seed=1):
+        if num_perm & (num_perm - 1):
+            raise ValueError("num_perm must be a power of two")
+        self.num_perm = num_perm
+        self.bin_shift = 64 - (num_perm.bit_length() - 1)
+        self.multiplier = random.Random(seed).randrange(1, 1 << 64) | 1
+
+    def signature(self, hashes):
+        bins = [EMPTY_BIN] * self.num_perm
+        shift, multiplier = self.bin_shift, self.multiplier
+        for h in hashes:
+            h = (h * multiplier) & MASK_64
+            b = h >> shift
+            value = h & VALUE_MASK
+            if value < bins[b]:
+                bins[b] = value
+        for i, value in enumerate(bins):
+            if value == EMPTY_BIN:
+                for step in range(1, self.num_perm):
+                    borrowed = bins[(i + step) % self.num_perm]
+                    if borrowed != EMPTY_BIN:
+                        bins[i] = (borrowed + step * DENSIFY_OFFSET) & VALUE_MASK
+                        break
+        return array("Q", bins)
+
+    @staticmethod
+    def similarity(sig1, sig2):
+        return sum(map(operator.eq, sig1, sig2)) / len(sig1)
+
+
+class DuplicateIndex:
+    """
+    Finds exact and near duplicates among questions of the same category.
+
+    Exact duplicates share a content key (same normalized text and choices).
+    Near duplicates are found with MinHash over character shingles and LSH banding:
+    a question only gets compared with those sharing at least one band of its
+    signature, so each check costs about the same however large the bank is.
+    """
+
+    def __init__(self, near=True, threshold=0.7, num_perm=32, bands=8):
+        self.near = near
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.refs = []          # id -> caller's reference, e.g. (category, index)
+        self.exact = {}         # content key -> id
+        self.signatures = {}    # id -> signature
+        self.buckets = {}       # band key -> [ids]
+
+    @classmethod
+    def from_bank(cls, bank, **kwargs):
+        index = cls(**kwargs)
+        for name in bank.names():
+            for idx in range(bank.count(name)):
+                question, choices, _ = bank.get(name, idx)
+                index.add((name, idx), name, question, choices)
+        return index
+
+    def _probe(self, category, question, choices):
+        key = content_key(category, question, choices)
+        exact_id = self.exact.get(key)
+        if exact_id is not None or not self.near:
+            return key, None, (), exact_id, []
+
+        signature = self.hasher.signature(shingles(question, choices))
+        band_keys = [hash((category, band, signature[band * self.rows:(band + 1) * self.rows].tobytes()))
+                     for band in range(self.bands)]
+        candidates = {item for band_key in band_keys for item in self.buckets.get(band_key, ())}
+        similar = []
+        for item in candidates:
+            score = MinHasher.similarity(signature, self.signatures[item])
+            if score >= self.threshold:
+                similar.append((score, item))
+        similar.sort(reverse=True)
+        return key, signature, band_keys, None, similar
+
+    def _result(self, exact_id, similar):
+        return (self.refs[exact_id] if exact_id is not None else None,
+                [(self.refs[item], score) for score, item in similar])
+
+    def check(self, category, question, choices):
+        """
+        Returns (exact, similar) for a question that is not in the index yet:
+        the reference of an identical question or None, and a list of
+        (reference, estimated similarity) for near duplicates, most similar first.
+        """
+        _, _, _, exact_id, similar = self._probe(category, question, choices)
+        return self._result(exact_id, similar)
+
+    def add(self, ref, category, question, choices):
+        """Indexes a question under `ref`; returns what check() would have returned."""
+        key, signature, band_keys, exact_id, similar = self._probe(category, question, choices)
+        if exact_id is None:
+            item = len(self.refs)
+            self.refs.append(ref)
+            self.exact[key] = item
+            if signature is not None:
+                self.signatures[item] = signature
+                for band_key in band_keys:
+                    bucket = self.buckets.setdefault(band_key, [])
+                    if len(bucket) < MAX_BUCKET:
+                        bucket.append(item)
+        return self._result(exact_id, similar)
+
+
+def duplicate_report(bank, near=True, threshold=0.7):
+    """Returns ({original: [exact copies]}, [(question, similar question, similarity)]) for a whole bank."""
+    index = DuplicateIndex(near, threshold)
+    exact_groups, near_pairs = {}, []
+    for name in bank.names():
+        for idx in range(bank.count(name)):
+            question, choices, _ = bank.get(name, idx)
+            exact, similar = index.add((name, idx), name, question, choices)
+            if exact is not None:
+                exact_groups.setdefault(exact, []).append((name, idx))
+            elif similar:
+                ref, score = similar[0]
+                near_pairs.append(((name, idx), ref, score))
+    return exact_groups, near_pairs
+
+
+def main():
+    from question_bank import CompactQuestionBank, MappedQuestionBank
+    from storage import open_storage
+
+    parser = argparse.ArgumentParser(description="Report duplicate and near-duplicate questions in the bank.")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default=None)
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--question-bank", default=None, help="report on a memory-mapped bank instead")
+    parser.add_argument("--threshold", type=float, default=0.7, help="near-duplicate similarity, 0-1")
+    parser.add_argument("--exact-only", action="store_true")
+    parser.add_argument("--limit", type=int, default=50, help="groups and pairs to list")
+    args = parser.parse_args()
+
+    if args.question_bank:
+        bank = MappedQuestionBank(args.question_bank)
+    else:
+        storage = open_storage(args.storage, args.db)
+        bank = CompactQuestionBank(storage.load_questions())
+        storage.close()
+    exact_groups, near_pairs = duplicate_report(bank, not args.exact_only, args.threshold)
+
+    def describe(ref):
+        return f"[{ref[0]} #{ref[1] + 1}] {bank.get(*ref)[0]}"
+
+    copies = sum(len(group) for group in exact_groups.values())
+    print(f"{copies} exact duplicates of {len(exact_groups)} questions")
+    for original, group in list(exact_groups.items())[:args.limit]:
+        print(f"  {describe(original)}")
+        for ref in group:
+            print(f"    = {describe(ref)}")
+    if not args.exact_only:
+        print(f"{len(near_pairs)} near duplicates (similarity >= {args.threshold:.2f})")
+        for ref, similar_ref, score in sorted(near_pairs, key=lambda pair: -pair[2])[:args.limit]:
+            print(f"  {score:.2f} {describe(ref)}")
+            print(f"       ~ {describe(similar_ref)}")
+    total = sum(bank.count(name) for name in bank.names())
+    print(f"{total} questions checked")
+    bank.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,30 @@
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Taken before tkinter and the app's modules are imported, so the startup report includes them
+STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox
-import json
-import random
-import hashlib
-import time
-from datetime import datetime
+from quiz_engine import QuizEngine
+from storage import open_storage, seed_default_questions, seed_default_users
+from question_bank import CompactQuestionBank, MappedQuestionBank
+from credentials import CredentialService, ServiceBusy
+from scheduler import TkScheduler
+from dedup import DuplicateIndex
+from sampling import PackCache
+from analytics import QuestionStats
+from adaptive import AdaptiveSelector
+from attempt_log import AttemptLog
+from user_index import UserIndex
+from checkpoint import CheckpointWriter
+from metrics import MetricsExporter, timed
 
 STYLE = {
     "BG": "#F0F2F5",  # Light grey, less stark than pure white
@@ -35,7 +55,40 @@ SECURITY_QUESTIONS = [
     "What is your favorite book?"
 ]
 
+# Above this many questions, adding a question only checks for exact duplicates
+NEAR_DUPLICATE_LIMIT = 20000
+
+class LRUCache:
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = self.misses = 0
+
 class CustomButton(tk.Frame):
+    # (text, font, padx, pady, radius) -> (width, height, polygon points); the same
+    # buttons are rebuilt on every screen, so measuring text once is enough.
+    geometry_cache = LRUCache(256)
+
     def __init__(self, parent, text, command, padx=20, pady=10, font=None, bg_color=None, fg_color=None, hover_color=None, radius=25):
         parent_bg = parent.cget("bg")
         super().__init__(parent, bg=parent_bg)
@@ -45,15 +98,12 @@ class CustomButton(tk.Frame):
         self.hover_color = hover_color
         self.radius = radius
 
-        test_label = tk.Label(self, text=text, font=font, padx=padx, pady=pady)
-        width = test_label.winfo_reqwidth()
-        height = test_label.winfo_reqheight()
-        test_label.destroy()
+        width, height, points = self._geometry(text, font, padx, pady, radius)
 
         self.canvas = tk.Canvas(self, width=width, height=height, bg=parent_bg, highlightthickness=0)
         self.canvas.pack()
 
-        self.rect = self._round_rectangle(0, 0, width, height, radius=self.radius, fill=self.bg_color, outline=self.bg_color)
+        self.rect = self.canvas.create_polygon(points, fill=self.bg_color, outline=self.bg_color, smooth=True)
         self.text_id = self.canvas.create_text(width/2, height/2, text=text, font=font, fill=fg_color)
 
         self.canvas.tag_bind(self.rect, "<Enter>", self._on_enter)
@@ -63,28 +113,40 @@ class CustomButton(tk.Frame):
         self.canvas.tag_bind(self.rect, "<Button-1>", self._on_click)
         self.canvas.tag_bind(self.text_id, "<Button-1>", self._on_click)
 
-    def _round_rectangle(self, x1, y1, x2, y2, radius=25, **kwargs):
-        points = [x1+radius, y1,
-                  x1+radius, y1,
-                  x2-radius, y1,
-                  x2-radius, y1,
-                  x2, y1,
-                  x2, y1+radius,
-                  x2, y1+radius,
-                  x2, y2-radius,
-                  x2, y2-radius,
-                  x2, y2,
-                  x2-radius, y2,
-                  x2-radius, y2,
-                  x1+radius, y2,
-                  x1+radius, y2,
-                  x1, y2,
-                  x1, y2-radius,
-                  x1, y2-radius,
-                  x1, y1+radius,
-                  x1, y1+radius,
-                  x1, y1]
-        return self.canvas.create_polygon(points, **kwargs, smooth=True)
+    def _geometry(self, text, font, padx, pady, radius):
+        key = (text, font, padx, pady, radius)
+        geometry = CustomButton.geometry_cache.get(key)
+        if geometry is None:
+            test_label = tk.Label(self, text=text, font=font, padx=padx, pady=pady)
+            width = test_label.winfo_reqwidth()
+            height = test_label.winfo_reqheight()
+            test_label.destroy()
+            geometry = (width, height, self._round_rectangle_points(0, 0, width, height, radius))
+            CustomButton.geometry_cache.put(key, geometry)
+        return geometry
+
+    @staticmethod
+    def _round_rectangle_points(x1, y1, x2, y2, radius=25):
+        return (x1+radius, y1,
+                x1+radius, y1,
+                x2-radius, y1,
+                x2-radius, y1,
+                x2, y1,
+                x2, y1+radius,
+                x2, y1+radius,
+                x2, y2-radius,
+                x2, y2-radius,
+                x2, y2,
+                x2-radius, y2,
+                x2-radius, y2,
+                x1+radius, y2,
+                x1+radius, y2,
+                x1, y2,
+                x1, y2-radius,
+                x1, y2-radius,
+                x1, y1+radius,
+                x1, y1+radius,
+                x1, y1)
 
     def _on_enter(self, event):
         self.canvas.itemconfig(self.rect, fill=self.hover_color, outline=self.hover_color)
@@ -132,6 +194,14 @@ class ChoiceButton(tk.Frame):
     def _on_click(self, event):
         self.variable.set(self.value)
 
+    def reset(self, text):
+        """Prepares the button for a new question, undoing set_feedback."""
+        self.label.config(text=text)
+        self.set_selected(False)
+        self.bind_all("<Enter>", self._on_enter)
+        self.bind_all("<Leave>", self._on_leave)
+        self.bind_all("<Button-1>", self._on_click)
+
     def set_selected(self, is_selected):
         if is_selected:
             self.config(bg=STYLE["PRIMARY"], highlightbackground=STYLE["SECONDARY"], highlightthickness=2)
@@ -155,6 +225,175 @@ class ChoiceButton(tk.Frame):
             self.config(bg="#FFFFFF", highlightbackground="#DDDDDD", highlightthickness=1)
             self.label.config(bg="#FFFFFF", fg="#AAAAAA") # Dim the text
 
+class RowHeights:
+    """
+    Heights of a list's rows, all `default` until set(). Once any row differs,
+    prefix sums are kept in a Fenwick tree, so both the offset of a row and the
+    row at an offset take O(log n) and changing one height doesn't shift the rest.
+    """
+
+    def __init__(self, count, default):
+        self.count = count
+        self.default = default
+        self.heights = None     # array of heights, once any row differs from default
+        self.tree = None
+
+    def height(self, i):
+        return self.heights[i] if self.heights is not None else self.default
+
+    def set(self, i, height):
+        if self.heights is None:
+            if height == self.default:
+                return
+            self.heights = array('q', [self.default]) * self.count
+            self.tree = array('q', bytes(8 * (self.count + 1)))
+            for j in range(1, self.count + 1):
+                self.tree[j] += self.default
+                parent = j + (j & -j)
+                if parent <= self.count:
+                    self.tree[parent] += self.tree[j]
+        delta = height - self.heights[i]
+        self.heights[i] = height
+        j = i + 1
+        while j <= self.count:
+            self.tree[j] += delta
+            j += j & -j
+
+    def offset(self, i):
+        """Total height of the rows before row `i`."""
+        if self.tree is None:
+            return i * self.default
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def total(self):
+        return self.offset(self.count)
+
+    def find(self, y):
+        """The row covering offset `y`, clamped to the last row."""
+        if self.tree is None:
+            i = int(y) // self.default
+        else:
+            i, step = 0, 1 << self.count.bit_length()
+            while step:
+                if i + step <= self.count and self.tree[i + step] <= y:
+                    i += step
+                    y -= self.tree[i]
+                step >>= 1
+        return max(0, min(i, self.count - 1))
+
+class VirtualList(tk.Frame):
+    """
+    A scrolling list that only has widgets for the rows in view. make_row(parent)
+    builds one reusable row and fill_row(row, index) shows item `index` in it;
+    rows are recycled as the list scrolls, so a list of any length opens as
+    fast as a short one. With measure=True rows may differ in height: each
+    row's height is measured the first time it is shown and cached, with
+    `row_height` as the estimate for rows not shown yet.
+    """
+
+    def __init__(self, parent, row_height, make_row, fill_row, count=0, measure=False):
+        super().__init__(parent, bg=parent.cget("bg"))
+        self.row_height = row_height
+        self.make_row = make_row
+        self.fill_row = fill_row
+        self.measure = measure
+        self.count = count
+        self.heights = RowHeights(count, row_height)
+        self.rows = []          # (row widget, canvas window id)
+        self.first = 0
+        self.shown = 0          # rows laid out from self.first
+        self.covered = 0        # canvas y down to which the laid out rows reach
+
+        self.canvas = tk.Canvas(self, bg=self.cget("bg"), highlightthickness=0, yscrollincrement=row_height)
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.bind("<Configure>", self._on_resize)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.bind(sequence, self._on_wheel)
+
+    def _yview(self, *args):
+        self.canvas.yview(*args)
+        self._refresh()
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self._yview("scroll", -1, "units")
+        else:
+            self._yview("scroll", 1, "units")
+
+    def _add_row(self):
+        row = self.make_row(self.canvas)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            row.bind(sequence, self._on_wheel)
+        window_id = self.canvas.create_window(0, 0, window=row, anchor="nw", width=self.canvas.winfo_width())
+        self.rows.append((row, window_id))
+
+    def _on_resize(self, event):
+        for _, window_id in self.rows:
+            self.canvas.itemconfigure(window_id, width=event.width)
+        self._update_scrollregion()
+        self._refresh(force=True)
+
+    def _update_scrollregion(self):
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), self.heights.total()))
+
+    def set_count(self, count):
+        """Changes the number of items and redraws the rows in view."""
+        self.count = count
+        self.heights = RowHeights(count, self.row_height)
+        self._update_scrollregion()
+        self._refresh(force=True)
+
+    def _refresh(self, force=False):
+        top = max(0, int(self.canvas.canvasy(0)))
+        bottom = top + self.canvas.winfo_height()
+        first = self.heights.find(top)
+        if first == self.first and self.covered >= bottom and not force:
+            return
+        self.first = first
+
+        # Lay out rows from the first visible one until the view is covered
+        y = self.heights.offset(first)
+        index, shown, resized = first, 0, False
+        while index < self.count and (y < bottom or shown == 0):
+            if shown == len(self.rows):
+                self._add_row()
+            row, window_id = self.rows[shown]
+            self.fill_row(row, index)
+            if self.measure:
+                row.update_idletasks()
+                height = row.winfo_reqheight()
+                if height != self.heights.height(index):
+                    self.heights.set(index, height)
+                    resized = True
+            height = self.heights.height(index)
+            self.canvas.coords(window_id, 0, y)
+            self.canvas.itemconfigure(window_id, state="normal", height=height)
+            y += height
+            index += 1
+            shown += 1
+        for _, window_id in self.rows[shown:]:
+            self.canvas.itemconfigure(window_id, state="hidden")
+        self.shown = shown
+        self.covered = y
+        if resized:
+            self._update_scrollregion()
+
+    def refresh_item(self, index):
+        """Redraws item `index` if it is in view."""
+        position = index - self.first
+        if 0 <= position < self.shown:
+            if self.measure:
+                self._refresh(force=True)
+            else:
+                self.fill_row(self.rows[position][0], index)
+
 class ToggleSwitch(tk.Frame):
     def __init__(self, parent, variable):
         super().__init__(parent, bg=parent.cget("bg"))
@@ -188,16 +427,76 @@ class ToggleSwitch(tk.Frame):
             self.canvas.coords(self.thumb, 3, 3, self.height - 3, self.height - 3)
             self.canvas.itemconfig(self.thumb, fill="#FFFFFF")
 
+class StartupProfile:
+    """Wall-clock time of each startup phase, for --startup-report. Phases may run on any thread."""
+
+    def __init__(self, started=None, report=False):
+        self.started = time.perf_counter() if started is None else started
+        self.report = report
+        self.phases = []    # (name, milliseconds, ran in the background)
+        self.marks = []     # (name, milliseconds since start)
+
+    def add(self, name, seconds):
+        self.phases.append((name, seconds * 1000, threading.current_thread() is not threading.main_thread()))
+
+    @contextmanager
+    def phase(self, name):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - began)
+
+    def mark(self, name):
+        self.marks.append((name, (time.perf_counter() - self.started) * 1000))
+
+    def summary(self):
+        lines = ["Startup time by phase:"]
+        for name, ms, background in self.phases:
+            lines.append(f"  {name:<14}{ms:9.1f} ms{' (background)' if background else ''}")
+        for name, ms in self.marks:
+            lines.append(f"  {name:<14}{ms:9.1f} ms after start")
+        return "\n".join(lines)
+
+    def finished(self):
+        if self.report:
+            print(self.summary())
+
+
 class QuizApp:
-    def __init__(self):
-        self.root = tk.Tk()
+    def __init__(self, storage=None, question_bank=None, packs=None, stats=None, attempts=None, checkpoints=None,
+                 fast_start=False, startup=None):
+        self.startup = startup or StartupProfile()
+        with self.startup.phase("window"):
+            self.root = tk.Tk()
+        self.storage = storage or open_storage()
+        self.question_bank = question_bank
+        self.packs = packs
+        self.stats = stats
+        self.attempts = attempts
+        self.checkpoints = checkpoints
+        self.credentials = CredentialService()
+        self.scheduler = TkScheduler(self.root)
+        self.duplicate_index = None
+        self.user_index = None
         self.current_user = None
         self.current_user_role = None
+        self.engine = None
+        self._loader = None
+        self._load_error = None
         self.setup_window()
-        self.configure_styles()
-        self.load_data()
+        with self.startup.phase("styles"):
+            self.configure_styles()
+        if fast_start:
+            # The login page only needs the users; the rest loads once it is on screen
+            with self.startup.phase("users"):
+                self._load_users()
+        else:
+            self.load_data()
         self.reset_quiz()
-        self.create_login_page()
+        with self.startup.phase("login page"):
+            self.create_login_page()
+        self.root.after_idle(self._first_frame)
         
     def setup_window(self):
         self.root.title("Enhanced Quiz App")
@@ -219,82 +518,73 @@ class QuizApp:
                              background=STYLE["PRIMARY"],
                              troughcolor="#E9ECEF")
 
+    @timed("load_data")
     def load_data(self):
-        self.questions_file = "questions.json"
-        try:
-            with open(self.questions_file, "r") as f:
-                self.categories = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.categories = self.get_default_questions()
-            self._save_questions()
-
-        self._load_users()
-
+        self._load_content()
+        with self.startup.phase("users"):
+            self._load_users()
+
+    @timed("load_content")
+    def _load_content(self):
+        """Loads the questions and scores and creates the quiz engine. Touches no widgets, so it can run on any thread."""
+        # A memory-mapped question bank replaces the storage backend's questions
+        if self.question_bank is None:
+            with self.startup.phase("questions"):
+                categories = seed_default_questions(self.storage)
+                self.question_bank = CompactQuestionBank(categories, self.storage)
+                self.storage.release_questions(self.question_bank.to_categories)
+
+        with self.startup.phase("scores"):
+            self.scores = self.storage.scores
+        with self.startup.phase("engine"):
+            # Set last: the Tk thread takes a non-None engine to mean loading is done
+            self.engine = QuizEngine(self.question_bank, packs=self.packs, stats=self.stats,
+                                     adaptive=AdaptiveSelector(self.question_bank, self.stats), attempts=self.attempts)
+
+    def _load_in_background(self):
         try:
-            with open("scores.json", "r") as f:
-                self.high_scores = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.high_scores = []
-    
-    def save_scores(self):
-        with open("scores.json", "w") as f:
-            json.dump(self.high_scores, f, indent=4)
-
+            self._load_content()
+        except Exception as e:
+            self._load_error = e
+
+    def _first_frame(self):
+        self.startup.mark("first frame")
+        if self.engine is None:
+            self._loader = threading.Thread(target=self._load_in_background, name="startup", daemon=True)
+            self._loader.start()
+        self._when_loaded(self._startup_done, on_error=self._startup_failed)
+
+    def _when_loaded(self, then, on_error=None):
+        """Calls then() on the Tk thread once the background load has finished, right away if it has."""
+        if self._loader is not None and self._loader.is_alive():
+            self.root.after(50, lambda: self._when_loaded(then, on_error))
+        elif self.engine is not None:
+            then()
+        elif on_error is not None:
+            on_error()
+
+    def _startup_done(self):
+        self.startup.mark("ready")
+        self.startup.finished()
+
+    def _startup_failed(self):
+        messagebox.showerror("Error", f"Could not load the quiz data: {self._load_error}")
+        self.root.destroy()
+
+    @timed("load_users")
     def _load_users(self):
-        self.users_file = "users.json"
-        try:
-            with open(self.users_file, "r") as f:
-                self.users = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.users = {}
-
-        users_updated = False
-
-        # Ensure the root admin user "sai kiran" exists and has the correct role.
-        root_admin_user = "sai kiran"
-        if root_admin_user not in self.users or self.users[root_admin_user].get("role") != "root_admin":
-            root_admin_password = "sai123@R"
-            password_hash = hashlib.sha256(root_admin_password.encode()).hexdigest()
-            if root_admin_user not in self.users:
-                self.users[root_admin_user] = {}
-            self.users[root_admin_user]["password"] = password_hash
-            self.users[root_admin_user]["role"] = "root_admin"
-            users_updated = True
-
-        # Ensure a default demo user exists for testing.
-        demo_user_name = "demo"
-        if demo_user_name not in self.users:
-            demo_user_password = "demo"
-            password_hash = hashlib.sha256(demo_user_password.encode()).hexdigest()
-            self.users[demo_user_name] = {
-                "password": password_hash, "role": "user"
-            }
-            users_updated = True
+        self.users = self.storage.load_users()
+        seed_default_users(self.storage, self.users)
 
-        if users_updated:
-            self._save_users()
-
-    def _save_users(self):
-        with open(self.users_file, "w") as f:
-            json.dump(self.users, f, indent=4)
-
-    def _save_questions(self):
-        with open(self.questions_file, "w") as f:
-            json.dump(self.categories, f, indent=4)
+    @timed("save_user")
+    def _save_user(self, username):
+        self.storage.save_user(username, self.users[username])
     
     def reset_quiz(self):
-        self.current_category = None
-        self.difficulty = "Medium"
-        self.current_questions = []
-        self.current_choices = []
-        self.current_answers = []
+        if getattr(self, "session", None):
+            self.engine.end_session(self.session.session_id)
+        self.session = None
         self.choice_widgets = []
-        self.user_answers = []
-        self.question_index = 0
-        self.score = 0
-        self.start_time = None
-        self.time_limit = 0
-        self.timer_running = False
         self.current_user_role = None
 
     def create_login_page(self):
@@ -334,6 +624,26 @@ class QuizApp:
         forgot_label.pack(pady=(10,0))
         forgot_label.bind("<Button-1>", lambda e: self._show_forgot_password_flow())
 
+    def _run_credential_job(self, submit, on_done, parent=None):
+        """Starts a hashing job on the credential pool and calls on_done(result) on the Tk thread."""
+        try:
+            future = submit()
+        except ServiceBusy as e:
+            messagebox.showerror("Busy", str(e), parent=parent)
+            return
+
+        def poll():
+            if not future.done():
+                self.root.after(20, poll)
+                return
+            try:
+                result = future.result()
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not check credentials: {e}", parent=parent)
+                return
+            on_done(result)
+        poll()
+
     def _attempt_login(self, username, password):
 
         if not username or not password:
@@ -342,16 +652,62 @@ class QuizApp:
 
         user_data = self.users.get(username)
         if user_data:
-            password_hash = hashlib.sha256(password.encode()).hexdigest()
-            if password_hash == user_data["password"]:
-                self.current_user = username
-                self.current_user_role = user_data.get("role", "user")
-                self.create_main_menu()
-            else:
-                messagebox.showerror("Login Failed", "Incorrect password.")
+            self._run_credential_job(lambda: self.credentials.verify(password, user_data["password"]),
+                                     lambda result: self._finish_login(username, result))
         else:
             messagebox.showerror("Login Failed", "Username not found.")
 
+    def _finish_login(self, username, result):
+        matches, new_hash = result
+        if not matches:
+            messagebox.showerror("Login Failed", "Incorrect password.")
+            return
+        if self.current_user == username:
+            return  # A repeated click already logged this user in
+
+        user_data = self.users[username]
+        if new_hash:
+            # Upgrade legacy SHA-256 hashes to the current KDF
+            user_data["password"] = new_hash
+            self._save_user(username)
+        self.current_user = username
+        self.current_user_role = user_data.get("role", "user")
+        if self.engine is None:
+            self.root.config(cursor="watch")  # Still loading the questions
+        self._when_loaded(self._enter_app)
+
+    def _enter_app(self):
+        self.root.config(cursor="")
+        if not self._offer_resume():
+            self.create_main_menu()
+
+    def _offer_resume(self):
+        """Offers to continue the quiz the user left unfinished. Returns True if it was resumed."""
+        if self.checkpoints is None:
+            return False
+        checkpoint = self.checkpoints.load(self.current_user)
+        if checkpoint is None:
+            return False
+        if not messagebox.askyesno("Resume Quiz", f"You have an unfinished {checkpoint.difficulty} quiz in "
+                                   f"{checkpoint.category} (question {checkpoint.question_index + 1} of "
+                                   f"{checkpoint.total}). Continue where you left off?"):
+            self.checkpoints.discard(self.current_user)
+            return False
+        try:
+            self.session = self.engine.resume_session(checkpoint)
+        except ValueError as e:
+            messagebox.showerror("Error", f"The quiz can't be resumed. {e}")
+            self.checkpoints.discard(self.current_user)
+            return False
+        self._build_question_screen()
+        self.show_question()
+        return True
+
+    @timed("save_checkpoint")
+    def _save_checkpoint(self):
+        if self.checkpoints is not None and self.session.user:
+            self.checkpoints.save(self.engine, self.session)
+
     def _show_signup_page(self):
         signup_window = tk.Toplevel(self.root)
         signup_window.title("Sign Up")
@@ -391,15 +747,22 @@ class QuizApp:
                      hover_color=STYLE["SUCCESS_HOVER"]).pack(pady=30)
 
     def _create_account(self, username, password, confirm, sq_text, sa, window):
-        error_message = self._create_user_logic(username, password, confirm, sq_text, sa)
+        def on_created(error_message):
+            if error_message:
+                messagebox.showerror("Error", error_message, parent=window)
+            else:
+                messagebox.showinfo("Success", "Account created successfully! You can now log in.", parent=window)
+                window.destroy()
+
+        error_message = self._create_user_logic(username, password, confirm, sq_text, sa, on_created, window)
         if error_message:
             messagebox.showerror("Error", error_message, parent=window)
-        else:
-            messagebox.showinfo("Success", "Account created successfully! You can now log in.", parent=window)
-            window.destroy()
 
-    def _create_user_logic(self, username, password, confirm, sq_text, sa):
-        """Core logic for creating a user. Returns an error message string or None on success."""
+    def _create_user_logic(self, username, password, confirm, sq_text, sa, on_created, window=None):
+        """
+        Core logic for creating a user. Returns a validation error message, or None once
+        hashing has started; on_created(error_message_or_None) runs when the user is saved.
+        """
         if not all([username, password, confirm, sq_text, sa]):
             return "Please fill all fields."
 
@@ -412,18 +775,27 @@ class QuizApp:
         if len(password) < 6:
             return "Password must be at least 6 characters long."
 
-        # If all validation passes, create the user
+        # If all validation passes, hash the secrets off the UI thread and then create the user
         sq_idx = SECURITY_QUESTIONS.index(sq_text)
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-        sa_hash = hashlib.sha256(sa.lower().encode()).hexdigest()
-        self.users[username] = {
-            "password": password_hash, 
-            "role": "user",
-            "security_question_idx": sq_idx,
-            "security_answer_hash": sa_hash
-        }
-        self._save_users()
-        return None # Indicates success
+
+        def save(hashes):
+            if username in self.users:
+                on_created("Username already exists.")
+                return
+            password_hash, sa_hash = hashes
+            self.users[username] = {
+                "password": password_hash, 
+                "role": "user",
+                "security_question_idx": sq_idx,
+                "security_answer_hash": sa_hash
+            }
+            self._save_user(username)
+            if self.user_index is not None:
+                self.user_index.add(username, "user")
+            on_created(None)
+
+        self._run_credential_job(lambda: self.credentials.hash_many([password, sa.lower()]), save, window)
+        return None # Indicates that validation passed
 
     def create_main_menu(self):
         self.clear_window()
@@ -456,13 +828,14 @@ class QuizApp:
 
         # Category
         tk.Label(settings_frame, text="Category", font=STYLE["FONT_HEADER"], bg=STYLE["BG"], fg=STYLE["TEXT"]).grid(row=0, column=0, sticky="w", pady=10)
-        self.category_var = tk.StringVar(value=list(self.categories.keys())[0])
-        ttk.Combobox(settings_frame, textvariable=self.category_var, values=list(self.categories.keys()), font=STYLE["FONT_BODY"], state="readonly", width=30).grid(row=0, column=1, sticky="e", pady=10)
+        category_names = self.question_bank.names()
+        self.category_var = tk.StringVar(value=category_names[0] if category_names else "")
+        ttk.Combobox(settings_frame, textvariable=self.category_var, values=category_names, font=STYLE["FONT_BODY"], state="readonly", width=30).grid(row=0, column=1, sticky="e", pady=10)
 
         # Difficulty
         tk.Label(settings_frame, text="Difficulty", font=STYLE["FONT_HEADER"], bg=STYLE["BG"], fg=STYLE["TEXT"]).grid(row=1, column=0, sticky="w", pady=10)
         self.difficulty_var = tk.StringVar(value="Medium")
-        difficulties = ["Easy", "Medium", "Hard"]
+        difficulties = ["Easy", "Medium", "Hard", "Adaptive"]
         diff_frame = tk.Frame(settings_frame, bg=STYLE["BG"])
         diff_frame.grid(row=1, column=1, sticky="e", pady=10)
         for diff in difficulties:
@@ -520,126 +893,125 @@ class QuizApp:
         self.reset_quiz()
         self.create_login_page()
     
+    @timed("start_quiz")
     def start_quiz(self):
-        self.current_category = self.category_var.get()
-        self.difficulty = self.difficulty_var.get()
-        category_data = self.categories[self.current_category]
-        
-        # Shuffle all questions for variety each time
-        all_questions = list(zip(
-            category_data["questions"],
-            category_data["choices"],
-            category_data["answers"]
-        ))
-        random.shuffle(all_questions)
-
-        # Determine number of questions based on difficulty
-        num_questions_map = {"Easy": 5, "Medium": 10, "Hard": len(all_questions)}
-        num_questions = min(num_questions_map.get(self.difficulty, 10), len(all_questions))
-
-        if not all_questions:
-            messagebox.showerror("Error", "No questions available in this category.")
+        try:
+            self.session = self.engine.start_session(self.current_user, self.category_var.get(),
+                                                     self.difficulty_var.get(), timed=self.timer_var.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
             self.create_main_menu()
             return
 
-        # Unpack the selected number of questions
-        selected_questions = all_questions[:num_questions]
-        q, c, a = zip(*selected_questions)
-        self.current_questions, self.current_choices, self.current_answers = list(q), list(c), list(a)
-        
-        self.question_index = 0
-        self.score = 0
-        self.user_answers = []
-        
-        if self.timer_var.get():
-            time_per_question = {"Easy": 45, "Medium": 30, "Hard": 15}
-            self.time_limit = num_questions * time_per_question.get(self.difficulty, 30)
-            self.start_time = time.time()
-            self.timer_running = True
-        
+        self._save_checkpoint()
+        self._build_question_screen()
         self.show_question()
     
-    def show_question(self):
-        num_questions = len(self.current_questions)
-        if self.question_index >= num_questions:
-            self.show_results()
-            return
-            
+    def _build_question_screen(self):
+        """Creates the question screen once per quiz; show_question then updates it in place."""
         self.clear_window()
-        
+        self.answer_locked = False
+
         # Timer display
-        if self.timer_var.get():
+        self.timer_label = None
+        if self.session.time_limit:
             self.timer_label = tk.Label(self.root, text="", font=(STYLE["FONT_BODY"][0], 14, "bold"),
                                        bg=STYLE["BG"], fg=STYLE["PRIMARY"])
             self.timer_label.pack(pady=10)
-            self.update_timer()
-        
+
         # Progress bar
-        progress = (self.question_index / num_questions) * 100
-        tk.Label(self.root, text=f"Question {self.question_index + 1} of {num_questions}",
-                font=STYLE["FONT_BODY"], bg=STYLE["BG"], fg=STYLE["TEXT"]).pack(pady=10)
+        self.progress_label = tk.Label(self.root, text="", font=STYLE["FONT_BODY"], bg=STYLE["BG"], fg=STYLE["TEXT"])
+        self.progress_label.pack(pady=10)
         
-        progress_bar = ttk.Progressbar(self.root, length=400, mode='determinate')
-        progress_bar['value'] = progress
-        progress_bar.pack(pady=10)
+        self.progress_bar = ttk.Progressbar(self.root, length=400, mode='determinate')
+        self.progress_bar.pack(pady=10)
         
         # Question
-        question_text = self.current_questions[self.question_index]
-        tk.Label(self.root, text=question_text, font=(STYLE["FONT_BODY"][0], 14), 
-                bg=STYLE["BG"], fg=STYLE["TEXT"], wraplength=700, justify="center").pack(pady=30)
+        self.question_label = tk.Label(self.root, text="", font=(STYLE["FONT_BODY"][0], 14), 
+                                       bg=STYLE["BG"], fg=STYLE["TEXT"], wraplength=700, justify="center")
+        self.question_label.pack(pady=30)
         
         # Answer choices
         self.answer_var = tk.IntVar(value=-1)
         self.answer_var.trace_add("write", self._update_choice_visuals)
-        choices = self.current_choices[self.question_index]
+        self.choices_frame = tk.Frame(self.root, bg=STYLE["BG"])
+        self.choices_frame.pack(fill="x")
+        self.choice_pool = []
         self.choice_widgets = []
-
-        for i, choice in enumerate(choices):
-            choice_btn = ChoiceButton(self.root, text=f"{chr(65+i)}) {choice}", value=i, variable=self.answer_var)
-            choice_btn.pack(pady=4, padx=100, fill="x")
-            self.choice_widgets.append(choice_btn)
         
         # Submit button
         CustomButton(self.root, text="SUBMIT", command=self.submit_answer, font=(STYLE["FONT_BODY"][0], 12, "bold"),
                      bg_color=STYLE["PRIMARY"], fg_color=STYLE["TEXT_LIGHT"], hover_color=STYLE["SECONDARY"], padx=30, pady=10).pack(pady=30)
-    
-    def update_timer(self):
-        if not self.timer_running:
+
+        if self.timer_label:
+            self.scheduler.countdown(self.engine.deadline(self.session), self._update_timer_label, self._on_time_up)
+
+    @timed("show_question")
+    def show_question(self):
+        session = self.session
+        if session is None or session.finished:
             return
-            
-        elapsed = time.time() - self.start_time
-        remaining = max(0, self.time_limit - elapsed)
-        
-        minutes = int(remaining // 60)
-        seconds = int(remaining % 60)
-        
-        if remaining <= 0:
-            self.timer_running = False
-            messagebox.showwarning("Time Up!", "Time's up! Quiz will end now.")
+        num_questions = session.total
+        if session.question_index >= num_questions:
             self.show_results()
             return
+
+        self.answer_locked = False
+        planned = self.engine.planned_total(session)
+        self.progress_label.config(text=f"Question {session.question_index + 1} of {'up to ' if session.adaptive else ''}{planned}")
+        self.progress_bar['value'] = (session.question_index / planned) * 100
+
+        question_text, choices, _ = self.engine.current_question(session)
+        self.question_label.config(text=question_text)
+
+        # Reuse the choice widgets from the previous question, only growing the pool when needed
+        self.answer_var.set(-1)
+        while len(self.choice_pool) < len(choices):
+            self.choice_pool.append(ChoiceButton(self.choices_frame, text="", value=len(self.choice_pool), variable=self.answer_var))
+        for i, choice_btn in enumerate(self.choice_pool):
+            if i < len(choices):
+                choice_btn.reset(f"{chr(65+i)}) {choices[i]}")
+                if not choice_btn.winfo_manager():
+                    choice_btn.pack(pady=4, padx=100, fill="x")
+            else:
+                choice_btn.pack_forget()
+        self.choice_widgets = self.choice_pool[:len(choices)]
+        self.engine.question_shown(session)
+    
+    def _update_timer_label(self, remaining):
+        minutes = int(remaining // 60)
+        seconds = int(remaining % 60)
         
         self.timer_label.config(text=f"Time Remaining: {minutes:02d}:{seconds:02d}")
         
         if remaining <= 60:  # Last minute - red warning
             self.timer_label.config(fg=STYLE["INCORRECT"])
-        
-        self.root.after(1000, self.update_timer)
+
+    def _on_time_up(self):
+        if not self.session or not self.session.timer_running:
+            return
+        self.session.timer_running = False
+        self._update_timer_label(0)
+        messagebox.showwarning("Time Up!", "Time's up! Quiz will end now.")
+        self.show_results()
     
+    @timed("submit_answer")
     def submit_answer(self):
+        if self.answer_locked:
+            return  # Waiting for the next question after feedback
         if self.answer_var.get() == -1:
             messagebox.showwarning("No Answer", "Please select an answer!")
             return
         
-        self.user_answers.append(self.answer_var.get())
-        
-        if self.user_answers[-1] == self.current_answers[self.question_index]:
-            self.score += 1
+        user_idx = self.answer_var.get()
+        try:
+            _, correct_idx = self.engine.submit_answer(self.session, user_idx)
+        except ValueError:
+            return  # Already answered or the quiz has ended
+        self.answer_locked = True
+        self._save_checkpoint()
 
         # Provide visual feedback
-        correct_idx = self.current_answers[self.question_index]
-        user_idx = self.user_answers[-1]
-
         for i, widget in enumerate(self.choice_widgets):
             is_correct = (i == correct_idx)
             is_user_choice = (i == user_idx)
@@ -649,7 +1021,6 @@ class QuizApp:
         self.root.after(1500, self._next_question)
 
     def _next_question(self):
-        self.question_index += 1
         self.show_question()
     
     def _update_choice_visuals(self, *args):
@@ -657,19 +1028,23 @@ class QuizApp:
         for i, widget in enumerate(self.choice_widgets):
             widget.set_selected(i == selected_value)
     
+    @timed("show_results")
     def show_results(self):
-        self.timer_running = False
+        session = self.session
+        already_recorded = session.finished
+        score_entry = self.engine.finish(session)
+        if self.checkpoints is not None and not already_recorded and session.user:
+            self.checkpoints.discard(session.user)
         self.clear_window()
         
-        # Calculate score percentage
-        total_questions = len(self.current_questions)
-        percentage = (self.score / total_questions) * 100 if total_questions > 0 else 0
+        total_questions = score_entry["total"]
+        percentage = score_entry["percentage"]
         
         # Result display
         tk.Label(self.root, text="QUIZ COMPLETED!", 
                 font=(STYLE["FONT_TITLE"][0], 28, "bold"), bg=STYLE["BG"], fg=STYLE["TEXT"]).pack(pady=50)
         
-        tk.Label(self.root, text=f"Score: {self.score}/{total_questions} ({percentage:.1f}%)",
+        tk.Label(self.root, text=f"Score: {session.score}/{total_questions} ({percentage:.1f}%)",
                 font=(STYLE["FONT_BODY"][0], 20), bg=STYLE["BG"], fg=STYLE["PRIMARY"]).pack(pady=20)
         
         # Performance message
@@ -693,21 +1068,8 @@ class QuizApp:
                 bg=STYLE["BG"], fg=color).pack(pady=20)
         
         # Save high score
-        player_name = self.current_user
-        if player_name:
-            score_entry = {
-                "name": player_name,
-                "score": self.score,
-                "total": total_questions,
-                "percentage": percentage,
-                "category": self.current_category,
-                "difficulty": self.difficulty,
-                "date": datetime.now().strftime("%Y-%m-%d %H:%M")
-            }
-            self.high_scores.append(score_entry)
-            self.high_scores.sort(key=lambda x: x["percentage"], reverse=True)
-            self.high_scores = self.high_scores[:10]  # Keep top 10
-            self.save_scores()
+        if score_entry["name"] and not already_recorded:
+            self.scores.append(score_entry)
         
         # Buttons
         btn_frame = tk.Frame(self.root, bg=STYLE["BG"])
@@ -724,60 +1086,110 @@ class QuizApp:
         review_window.title("Answer Review")
         review_window.geometry("700x500")
         review_window.configure(bg=STYLE["BG"])
-        
-        # Scrollable frame
-        canvas = tk.Canvas(review_window, bg=STYLE["BG"], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(review_window, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg=STYLE["BG"])
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-        
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        # Review content
-        for i, question in enumerate(self.current_questions):
-            frame = tk.Frame(scrollable_frame, bg="#FFFFFF", relief="solid", bd=1)
+
+        # Only the questions in view get widgets, so even a whole-category Hard quiz opens at once
+        session = self.session
+
+        def make_row(parent):
+            row = tk.Frame(parent, bg=STYLE["BG"])
+            frame = tk.Frame(row, bg="#FFFFFF", relief="solid", bd=1)
             frame.pack(fill="x", padx=10, pady=5)
-            
-            tk.Label(frame, text=f"Q{i+1}: {question}", font=(STYLE["FONT_BODY"][0], 10, "bold"),
-                    bg="#FFFFFF", fg=STYLE["TEXT"], wraplength=600, justify="left").pack(anchor="w", padx=10, pady=5)
-            
-            correct_choice = self.current_choices[i][self.current_answers[i]]
-            user_choice = self.current_choices[i][self.user_answers[i]] if i < len(self.user_answers) else "No answer (Time up?)"
-            
-            tk.Label(frame, text=f"Correct Answer: {correct_choice}", font=(STYLE["FONT_BODY"][0], 9),
-                    bg="#FFFFFF", fg=STYLE["CORRECT"]).pack(anchor="w", padx=20)
-            
-            is_correct = i < len(self.user_answers) and self.user_answers[i] == self.current_answers[i]
+            row.question = tk.Label(frame, font=(STYLE["FONT_BODY"][0], 10, "bold"),
+                                    bg="#FFFFFF", fg=STYLE["TEXT"], wraplength=600, justify="left")
+            row.question.pack(anchor="w", padx=10, pady=5)
+            row.correct = tk.Label(frame, font=(STYLE["FONT_BODY"][0], 9), bg="#FFFFFF", fg=STYLE["CORRECT"],
+                                   wraplength=580, justify="left")
+            row.correct.pack(anchor="w", padx=20)
+            row.user = tk.Label(frame, font=(STYLE["FONT_BODY"][0], 9), bg="#FFFFFF",
+                                wraplength=580, justify="left")
+            row.user.pack(anchor="w", padx=20, pady=(0, 5))
+            return row
+
+        def fill_row(row, i):
+            question, choices, answer = self.engine.question(session, i)
+            row.question.config(text=f"Q{i+1}: {question}")
+
+            correct_choice = choices[answer]
+            user_choice = choices[session.answers[i]] if i < len(session.answers) else "No answer (Time up?)"
+            row.correct.config(text=f"Correct Answer: {correct_choice}")
+
+            is_correct = i < len(session.answers) and session.answers[i] == answer
             color = STYLE["CORRECT"] if is_correct else STYLE["INCORRECT"]
-            tk.Label(frame, text=f"Your Answer: {user_choice}", font=(STYLE["FONT_BODY"][0], 9),
-                    bg="#FFFFFF", fg=color).pack(anchor="w", padx=20, pady=(0, 5))
-        
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+            row.user.config(text=f"Your Answer: {user_choice}", fg=color)
+
+        VirtualList(review_window, 100, make_row, fill_row, session.total, measure=True).pack(fill="both", expand=True)
     
     def show_high_scores(self):
         scores_window = tk.Toplevel(self.root)
         scores_window.title("High Scores")
-        scores_window.geometry("600x450")
+        scores_window.geometry("600x560")
         scores_window.configure(bg=STYLE["BG"])
         
         tk.Label(scores_window, text="HIGH SCORES", font=("Arial", 20, "bold"),
                 bg=STYLE["BG"], fg=STYLE["TEXT"]).pack(pady=20)
-        
-        if not self.high_scores:
-            tk.Label(scores_window, text="No scores yet!", font=("Arial", 14),
-                    bg=STYLE["BG"], fg=STYLE["PRIMARY"]).pack(pady=50)
-        else:
-            for i, score in enumerate(self.high_scores[:10]):
+
+        leaderboard = self.scores.leaderboard
+        all_categories, all_difficulties = "All Categories", "All Difficulties"
+
+        # Filters
+        filter_frame = tk.Frame(scores_window, bg=STYLE["BG"])
+        filter_frame.pack(pady=(0, 10))
+        category_var = tk.StringVar(value=all_categories)
+        difficulty_var = tk.StringVar(value=all_difficulties)
+        category_box = ttk.Combobox(filter_frame, textvariable=category_var, state="readonly", width=25,
+                                    values=[all_categories] + leaderboard.categories())
+        category_box.pack(side="left", padx=5)
+        difficulty_box = ttk.Combobox(filter_frame, textvariable=difficulty_var, state="readonly", width=15,
+                                      values=[all_difficulties, "Easy", "Medium", "Hard", "Adaptive"])
+        difficulty_box.pack(side="left", padx=5)
+
+        list_frame = tk.Frame(scores_window, bg=STYLE["BG"])
+        list_frame.pack(fill="x")
+        rank_label = tk.Label(scores_window, text="", font=("Arial", 11, "italic"), bg=STYLE["BG"], fg=STYLE["TEXT"])
+        rank_label.pack(pady=5)
+        nav_frame = tk.Frame(scores_window, bg=STYLE["BG"])
+        nav_frame.pack(pady=5)
+        page_label = tk.Label(nav_frame, text="", font=STYLE["FONT_BODY"], bg=STYLE["BG"], fg=STYLE["TEXT"])
+        current_page = [0]
+        page_size = 10
+
+        def render(page=None):
+            if page is not None:
+                current_page[0] = page
+            category = None if category_var.get() == all_categories else category_var.get()
+            difficulty = None if difficulty_var.get() == all_difficulties else difficulty_var.get()
+
+            pages = leaderboard.page_count(page_size, category, difficulty)
+            current_page[0] = max(0, min(current_page[0], pages - 1))
+            for widget in list_frame.winfo_children():
+                widget.destroy()
+
+            high_scores = leaderboard.page(current_page[0], page_size, category, difficulty)
+            if not high_scores:
+                tk.Label(list_frame, text="No scores yet!", font=("Arial", 14),
+                        bg=STYLE["BG"], fg=STYLE["PRIMARY"]).pack(pady=50)
+            for offset, score in enumerate(high_scores):
+                i = current_page[0] * page_size + offset
                 rank_color = ["#FFD700", "#C0C0C0", "#CD7F32"][i] if i < 3 else STYLE["TEXT"]
                 score_text = f"{i+1}. {score['name']} - {score['percentage']:.1f}% ({score['category']} - {score.get('difficulty', 'N/A')})"
-                tk.Label(scores_window, text=score_text, font=("Arial", 12),
+                tk.Label(list_frame, text=score_text, font=("Arial", 12),
                         bg=STYLE["BG"], fg=rank_color).pack(pady=3)
+
+            rank = leaderboard.rank(self.current_user, category, difficulty)
+            rank_label.config(text=f"Your best rank: #{rank}" if rank else "")
+            page_label.config(text=f"Page {current_page[0] + 1} of {max(pages, 1)}")
+
+        CustomButton(nav_frame, text="< Prev", command=lambda: render(current_page[0] - 1), font=("Arial", 10),
+                     bg_color=STYLE["DISABLED_BG"], fg_color=STYLE["TEXT_LIGHT"], hover_color=STYLE["DISABLED_HOVER"],
+                     padx=10, pady=5, radius=15).pack(side="left", padx=10)
+        page_label.pack(side="left", padx=10)
+        CustomButton(nav_frame, text="Next >", command=lambda: render(current_page[0] + 1), font=("Arial", 10),
+                     bg_color=STYLE["DISABLED_BG"], fg_color=STYLE["TEXT_LIGHT"], hover_color=STYLE["DISABLED_HOVER"],
+                     padx=10, pady=5, radius=15).pack(side="left", padx=10)
+
+        category_box.bind("<<ComboboxSelected>>", lambda e: render(0))
+        difficulty_box.bind("<<ComboboxSelected>>", lambda e: render(0))
+        render(0)
     
     def add_questions(self):
         add_window = tk.Toplevel(self.root)
@@ -792,7 +1204,7 @@ class QuizApp:
         tk.Label(add_window, text="Category (select existing or type a new one):", bg=STYLE["BG"], fg=STYLE["TEXT"]).pack()
         category_var = tk.StringVar()
         ttk.Combobox(add_window, textvariable=category_var, width=58,
-                    values=list(self.categories.keys())).pack(pady=5)
+                    values=self.question_bank.names()).pack(pady=5)
         
         # Question input
         tk.Label(add_window, text="Question:", bg=STYLE["BG"], fg=STYLE["TEXT"]).pack(pady=(20, 5))
@@ -822,14 +1234,23 @@ class QuizApp:
                 messagebox.showerror("Error", "Please fill all fields!")
                 return
 
-            if category not in self.categories:
-                self.categories[category] = {"questions": [], "choices": [], "answers": []}
+            duplicates = self._duplicate_index()
+            exact, similar = duplicates.check(category, question, choices)
+            if exact is not None:
+                messagebox.showerror("Duplicate Question", f"This question is already in '{exact[0]}'.", parent=add_window)
+                return
+            if similar:
+                (similar_category, similar_idx), _ = similar[0]
+                similar_text = self.question_bank.get(similar_category, similar_idx)[0]
+                if not messagebox.askyesno("Possible Duplicate",
+                                           f"This looks like an existing question:\n\n{similar_text}\n\nAdd it anyway?",
+                                           parent=add_window):
+                    return
 
             try:
-                self.categories[category]["questions"].append(question)
-                self.categories[category]["choices"].append(choices)
-                self.categories[category]["answers"].append(correct_idx)
-                self._save_questions()
+                self.question_bank.add(category, question, choices, correct_idx)
+                duplicates.add((category, self.question_bank.count(category) - 1), category, question, choices)
+                self.engine.questions_changed(category)
                 messagebox.showinfo("Success", "Question added successfully!")
                 self.create_main_menu() # Refresh main menu to show new category
                 add_window.destroy()
@@ -839,109 +1260,117 @@ class QuizApp:
         CustomButton(add_window, text="Save Question", command=save_question, font=STYLE["FONT_BODY"],
                      bg_color=STYLE["SUCCESS"], fg_color=STYLE["TEXT_LIGHT"], hover_color=STYLE["SUCCESS_HOVER"]).pack(pady=20)
     
+    def _duplicate_index(self):
+        # Built on first use; near-duplicate checks are skipped for very large banks
+        if self.duplicate_index is None:
+            total = sum(self.question_bank.count(name) for name in self.question_bank.names())
+            self.duplicate_index = DuplicateIndex.from_bank(self.question_bank, near=total <= NEAR_DUPLICATE_LIMIT)
+        return self.duplicate_index
+
     def clear_window(self):
+        self.scheduler.cancel_all()
         for widget in self.root.winfo_children():
             widget.destroy()
     
-    def get_default_questions(self):
-        return {
-            "Python Basics": {
-                "questions": [
-                    "What is the output of: print(2 ** 3)",
-                    "Which keyword is used to define a function in Python?",
-                    "What does len([1, 2, 3]) return?",
-                    "Which of the following is a mutable data type?",
-                    "What is the correct way to create a list?"
-                ],
-                "choices": [
-                    ["6", "8", "9", "5"],
-                    ["function", "def", "define", "func"],
-                    ["2", "3", "4", "Error"],
-                    ["tuple", "string", "list", "int"],
-                    ["list = []", "list = ()", "list = {}", "All correct"]
-                ],
-                "answers": [1, 1, 1, 2, 0]
-            },
-            "Python Advanced": {
-                "questions": [
-                    "What is a lambda function?",
-                    "Which module is used for regular expressions?",
-                    "What does 'self' represent in a class?",
-                    "Which decorator is used for static methods?",
-                    "What is list comprehension?"
-                ],
-                "choices": [
-                    ["Named function", "Anonymous function", "Class method", "Built-in function"],
-                    ["regex", "re", "regexp", "regular"],
-                    ["Class name", "Instance reference", "Method name", "Variable"],
-                    ["@static", "@staticmethod", "@classmethod", "@property"],
-                    ["Loop syntax", "Compact way to create lists", "Function type", "Class feature"]
-                ],
-                "answers": [1, 1, 1, 1, 1]
-            }
-        }
+    def _user_index(self):
+        # Built on first use, then kept up to date as users are added and roles change
+        if self.user_index is None:
+            self.user_index = UserIndex(self.users)
+        return self.user_index
 
     def show_user_management_page(self):
         manage_window = tk.Toplevel(self.root)
         manage_window.title("Manage Admins")
-        manage_window.geometry("500x400")
+        manage_window.geometry("500x480")
         manage_window.configure(bg=STYLE["BG"])
         manage_window.transient(self.root)
         manage_window.grab_set()
 
         tk.Label(manage_window, text="Manage Admin Roles", font=STYLE["FONT_HEADER"], bg=STYLE["BG"], fg=STYLE["TEXT"]).pack(pady=20)
 
-        # Scrollable frame
-        canvas = tk.Canvas(manage_window, bg=STYLE["BG"], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(manage_window, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg=STYLE["BG"])
-        
-        scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        for username, data in sorted(self.users.items()):
-            user_frame = tk.Frame(scrollable_frame, bg="#FFFFFF", relief="solid", bd=1)
-            user_frame.pack(fill="x", padx=10, pady=4)
-
-            role = data.get('role', 'user')
-            label_text = f"{username} (Role: {role.capitalize()})"
-            tk.Label(user_frame, text=label_text, bg="#FFFFFF", fg=STYLE["TEXT"], font=STYLE["FONT_BODY"]).pack(side="left", padx=10, pady=10)
-
+        index = self._user_index()
+        all_roles = "All Roles"
+        role_filters = {all_roles: None, "Admins": "admin", "Users": "user"}
+        search_var = tk.StringVar()
+        role_var = tk.StringVar(value=all_roles)
+        search_frame = tk.Frame(manage_window, bg=STYLE["BG"])
+        search_frame.pack(fill="x", padx=10, pady=(0, 10))
+        tk.Label(search_frame, text="Search", font=STYLE["FONT_BODY"], bg=STYLE["BG"], fg=STYLE["TEXT"]).pack(side="left")
+        tk.Entry(search_frame, textvariable=search_var, font=STYLE["FONT_BODY"], width=20, relief="solid", bd=1).pack(side="left", padx=5)
+        role_box = ttk.Combobox(search_frame, textvariable=role_var, values=list(role_filters), state="readonly", width=10)
+        role_box.pack(side="left", padx=5)
+        count_label = tk.Label(search_frame, text="", font=("Arial", 10), bg=STYLE["BG"], fg=STYLE["TEXT"])
+        count_label.pack(side="right")
+        results = [index.search()]
+
+        def make_row(parent):
+            row = tk.Frame(parent, bg="#FFFFFF", relief="solid", bd=1)
+            row.username = None
+            row.label = tk.Label(row, text="", bg="#FFFFFF", fg=STYLE["TEXT"], font=STYLE["FONT_BODY"])
+            row.label.pack(side="left", padx=10)
+            row.promote = CustomButton(row, text="Promote", command=lambda: change_role(row.username, 'admin'),
+                                       font=("Arial", 10), padx=10, pady=5, radius=15,
+                                       bg_color=STYLE["SUCCESS"], fg_color=STYLE["TEXT_LIGHT"], hover_color=STYLE["SUCCESS_HOVER"])
+            row.demote = CustomButton(row, text="Demote", command=lambda: change_role(row.username, 'user'),
+                                      font=("Arial", 10), padx=10, pady=5, radius=15,
+                                      bg_color=STYLE["DISABLED_BG"], fg_color=STYLE["TEXT_LIGHT"], hover_color=STYLE["DISABLED_HOVER"])
+            return row
+
+        def fill_row(row, i):
+            username = results[0][i]
+            role = index.roles[username]
+            row.username = username
+            row.label.config(text=f"{username} (Role: {role.capitalize()})")
             # Super admin cannot be demoted by themselves
-            if username == self.current_user:
-                continue
-
-            if role == 'user':
-                CustomButton(user_frame, text="Promote", command=lambda u=username: self._update_user_role(u, 'admin', manage_window),
-                             font=("Arial", 10), padx=10, pady=5, radius=15,
-                             bg_color=STYLE["SUCCESS"], fg_color=STYLE["TEXT_LIGHT"], hover_color=STYLE["SUCCESS_HOVER"]).pack(side="right", padx=10)
-            else: # role == 'admin'
-                CustomButton(user_frame, text="Demote", command=lambda u=username: self._update_user_role(u, 'user', manage_window),
-                             font=("Arial", 10), padx=10, pady=5, radius=15,
-                             bg_color=STYLE["DISABLED_BG"], fg_color=STYLE["TEXT_LIGHT"], hover_color=STYLE["DISABLED_HOVER"]).pack(side="right", padx=10)
-
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+            show = None if username == self.current_user else (row.promote if role == 'user' else row.demote)
+            for button in (row.promote, row.demote):
+                if button is show and not button.winfo_manager():
+                    button.pack(side="right", padx=10)
+                elif button is not show and button.winfo_manager():
+                    button.pack_forget()
+
+        user_list = VirtualList(manage_window, 48, make_row, fill_row)
+        user_list.pack(fill="both", expand=True, padx=10)
+
+        def search(*args):
+            results[0] = index.search(search_var.get().strip(), role_filters[role_var.get()])
+            count_label.config(text=f"{len(results[0])} users")
+            user_list.canvas.yview_moveto(0)
+            user_list.set_count(len(results[0]))
+
+        def change_role(username, new_role):
+            self._update_user_role(username, new_role, manage_window, lambda: on_role_changed(username))
+
+        def on_role_changed(username):
+            if role_filters[role_var.get()] is None:
+                # The user keeps their place in the list, so only their row changes
+                user_list.refresh_item(results[0].index(username))
+            else:
+                search()
+
+        search_var.trace_add("write", search)
+        role_box.bind("<<ComboboxSelected>>", search)
+        search()
 
         # Add a button for the root admin to add new users
         add_user_btn_frame = tk.Frame(manage_window, bg=STYLE["BG"])
         add_user_btn_frame.pack(pady=10)
-        CustomButton(add_user_btn_frame, text="Add New User", command=lambda: self._show_add_user_by_admin_page(manage_window),
+        CustomButton(add_user_btn_frame, text="Add New User", command=lambda: self._show_add_user_by_admin_page(manage_window, search),
                      font=("Arial", 11, "bold"), bg_color=STYLE["SUCCESS"], fg_color=STYLE["TEXT_LIGHT"], hover_color=STYLE["SUCCESS_HOVER"]).pack()
 
-    def _update_user_role(self, username, new_role, window):
+    def _update_user_role(self, username, new_role, window, on_updated=None):
         if username in self.users:
             self.users[username]['role'] = new_role
-            self._save_users()
+            self._save_user(username)
+            if self.user_index is not None:
+                self.user_index.set_role(username, new_role)
             messagebox.showinfo("Success", f"User '{username}' has been updated to '{new_role}'.", parent=window)
-            # Refresh the window
-            window.destroy()
-            self.show_user_management_page()
+            if on_updated:
+                on_updated()
         else:
             messagebox.showerror("Error", f"User '{username}' not found.", parent=window)
 
-    def _show_add_user_by_admin_page(self, parent_window):
+    def _show_add_user_by_admin_page(self, parent_window, on_added=None):
         add_user_window = tk.Toplevel(self.root)
         add_user_window.title("Add New User")
         add_user_window.geometry("450x550")
@@ -975,20 +1404,23 @@ class QuizApp:
         tk.Entry(add_user_window, textvariable=sa_var, font=STYLE["FONT_BODY"], width=30, relief="solid", bd=1).pack(pady=5)
 
         CustomButton(add_user_window, text="CREATE USER", 
-                     command=lambda: self._create_account_by_admin(username_var.get(), password_var.get(), confirm_var.get(), sq_var.get(), sa_var.get(), add_user_window, parent_window),
+                     command=lambda: self._create_account_by_admin(username_var.get(), password_var.get(), confirm_var.get(), sq_var.get(), sa_var.get(), add_user_window, parent_window, on_added),
                      font=STYLE["FONT_BUTTON"], bg_color=STYLE["SUCCESS"], fg_color=STYLE["TEXT_LIGHT"], 
                      hover_color=STYLE["SUCCESS_HOVER"]).pack(pady=30)
 
-    def _create_account_by_admin(self, username, password, confirm, sq_text, sa, add_user_window, manage_window):
-        error_message = self._create_user_logic(username, password, confirm, sq_text, sa)
-        if error_message:
-            messagebox.showerror("Error", error_message, parent=add_user_window)
-        else:
+    def _create_account_by_admin(self, username, password, confirm, sq_text, sa, add_user_window, manage_window, on_added=None):
+        def on_created(error_message):
+            if error_message:
+                messagebox.showerror("Error", error_message, parent=add_user_window)
+                return
             messagebox.showinfo("Success", "User created successfully.", parent=add_user_window)
-            # Destroy the 'add user' window and refresh the 'manage admins' window
             add_user_window.destroy()
-            manage_window.destroy()
-            self.show_user_management_page()
+            if on_added and manage_window.winfo_exists():
+                on_added()
+
+        error_message = self._create_user_logic(username, password, confirm, sq_text, sa, on_created, add_user_window)
+        if error_message:
+            messagebox.showerror("Error", error_message, parent=add_user_window)
 
     def _show_forgot_password_flow(self):
         fp_window = tk.Toplevel(self.root)
@@ -1060,13 +1492,19 @@ class QuizApp:
 
         user_data = self.users.get(username)
         stored_hash = user_data.get("security_answer_hash")
-        answer_hash = hashlib.sha256(answer.lower().encode()).hexdigest()
 
-        if stored_hash == answer_hash:
+        def on_verified(result):
+            matches, new_hash = result
+            if not matches:
+                messagebox.showerror("Error", "Incorrect answer.", parent=window)
+                return
+            if new_hash:
+                user_data["security_answer_hash"] = new_hash
+                self._save_user(username)
             frame2.pack_forget()
             frame3.pack(fill="both", expand=True)
-        else:
-            messagebox.showerror("Error", "Incorrect answer.", parent=window)
+
+        self._run_credential_job(lambda: self.credentials.verify(answer.lower(), stored_hash), on_verified, window)
 
     def _handle_fp_step3(self, username, new_pass, confirm_pass, window):
         if not new_pass or not confirm_pass:
@@ -1081,17 +1519,73 @@ class QuizApp:
             messagebox.showerror("Error", "Password must be at least 6 characters long.", parent=window)
             return
 
-        new_pass_hash = hashlib.sha256(new_pass.encode()).hexdigest()
-        self.users[username]["password"] = new_pass_hash
-        self._save_users()
+        def on_hashed(new_pass_hash):
+            self.users[username]["password"] = new_pass_hash
+            self._save_user(username)
+
+            messagebox.showinfo("Success", "Your password has been reset successfully. You can now log in.", parent=window)
+            window.destroy()
 
-        messagebox.showinfo("Success", "Your password has been reset successfully. You can now log in.", parent=window)
-        window.destroy()
+        self._run_credential_job(lambda: self.credentials.hash(new_pass), on_hashed, window)
 
     def run(self):
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            if self._loader is not None:
+                self._loader.join()
+            self.credentials.shutdown()
+            if self.packs is not None:
+                self.packs.close()
+            if self.engine is not None:
+                self.engine.adaptive.close()
+            if self.stats is not None:
+                self.stats.close()
+            if self.attempts is not None:
+                self.attempts.close()
+            if self.checkpoints is not None:
+                self.checkpoints.close()
+            if self.question_bank is not None:
+                self.question_bank.close()
+            self.storage.close()
 
 
 if __name__ == "__main__":
-    app = QuizApp()
-    app.run()
\ No newline at end of file
+    multiprocessing.freeze_support()  # The credential pool uses worker processes, also in the PyInstaller build
+    parser = argparse.ArgumentParser(description="Enhanced Quiz App")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default=None,
+                        help="storage backend (default: $QUIZ_STORAGE or json)")
+    parser.add_argument("--db", default=None, help="SQLite database path (default: $QUIZ_DB or quiz.db)")
+    parser.add_argument("--question-bank", default=os.environ.get("QUIZ_QUESTION_BANK"),
+                        help="serve questions from a memory-mapped bank built with question_bank.py")
+    parser.add_argument("--pack-cache", action="store_true", help="pre-draw quiz question sets in the background")
+    parser.add_argument("--question-stats", default="question_stats.json",
+                        help="file for per-question answer statistics, empty to disable")
+    parser.add_argument("--attempts", default="attempts.bin",
+                        help="file keeping each quiz's answers for re-scoring, empty to disable")
+    parser.add_argument("--checkpoints", default="checkpoints",
+                        help="directory for unfinished quizzes that can be resumed, empty to disable")
+    parser.add_argument("--fast-start", action="store_true", default=bool(os.environ.get("QUIZ_FAST_START")),
+                        help="show the login page first and load questions and scores in the background "
+                             "(default: on if $QUIZ_FAST_START is set)")
+    parser.add_argument("--startup-report", action="store_true", help="print how long each startup phase took")
+    parser.add_argument("--metrics", default=os.environ.get("QUIZ_METRICS"),
+                        help="record timings and file I/O and export them to this file "
+                             "(JSON if it ends in .json, otherwise Prometheus text; default: $QUIZ_METRICS)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0, help="seconds between metrics exports")
+    args = parser.parse_args()
+
+    exporter = MetricsExporter(args.metrics, args.metrics_interval) if args.metrics else None
+    startup = StartupProfile(STARTED, args.startup_report)
+    startup.add("imports", time.perf_counter() - STARTED)
+    with startup.phase("open files"):
+        question_bank = MappedQuestionBank(args.question_bank) if args.question_bank else None
+        storage = open_storage(args.storage, args.db)
+        stats = QuestionStats(args.question_stats) if args.question_stats else None
+        attempts = AttemptLog(args.attempts) if args.attempts else None
+        checkpoints = CheckpointWriter(args.checkpoints) if args.checkpoints else None
+    app = QuizApp(storage, question_bank, PackCache() if args.pack_cache else None, stats, attempts, checkpoints,
+                  fast_start=args.fast_start, startup=startup)
+    app.run()
+    if exporter is not None:
+        exporter.close()
\ No newline at end of file
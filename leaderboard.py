@@ -0,0 +1,99 @@
+from bisect import bisect_left, bisect_right
+
+
+class _Board:
+    """The best `capacity` results for one category/difficulty, kept in rank order."""
+    __slots__ = ("capacity", "keys", "entries", "user_best")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.keys = []          # (-percentage, seq), ascending == best first
+        self.entries = []
+        self.user_best = {}     # name -> key of that user's best ranked result
+
+    def add(self, key, entry):
+        if len(self.keys) >= self.capacity and key >= self.keys[-1]:
+            return
+        pos = bisect_right(self.keys, key)
+        self.keys.insert(pos, key)
+        self.entries.insert(pos, entry)
+
+        name = entry.get("name")
+        best = self.user_best.get(name)
+        if best is None or key < best:
+            self.user_best[name] = key
+
+        if len(self.keys) > self.capacity:
+            evicted_key = self.keys.pop()
+            evicted = self.entries.pop()
+            # Anything else this user has on the board ranks below the evicted
+            # result, so the user is no longer on the board at all.
+            if self.user_best.get(evicted.get("name")) == evicted_key:
+                del self.user_best[evicted.get("name")]
+
+    def rank(self, name):
+        key = self.user_best.get(name)
+        if key is None:
+            return None
+        return bisect_left(self.keys, key) + 1
+
+
+class Leaderboard:
+    """
+    Bounded top-K rankings per (category, difficulty), per category, per
+    difficulty and overall. Pass None for "any" category or difficulty.
+
+    Each result is placed with a binary search on every board it belongs to, so
+    recording a result never rescans or re-sorts the stored history. Ties are
+    ranked in the order the results were recorded.
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self._boards = {}
+        self._seq = 0
+
+    def _board(self, category, difficulty):
+        board = self._boards.get((category, difficulty))
+        if board is None:
+            board = self._boards[(category, difficulty)] = _Board(self.capacity)
+        return board
+
+    def add(self, entry):
+        self._seq += 1
+        key = (-entry.get("percentage", 0), self._seq)
+        category = entry.get("category")
+        difficulty = entry.get("difficulty")
+        # A set, since results without a category/difficulty map to the same board twice
+        for board_key in {(None, None), (category, None), (None, difficulty), (category, difficulty)}:
+            self._board(*board_key).add(key, entry)
+
+    def rebuild(self, entries):
+        self._boards = {}
+        self._seq = 0
+        for entry in entries:
+            self.add(entry)
+
+    def categories(self):
+        return sorted({c for c, _ in self._boards if c is not None})
+
+    def top(self, n=10, category=None, difficulty=None):
+        board = self._boards.get((category, difficulty))
+        return board.entries[:n] if board else []
+
+    def page(self, page, page_size=10, category=None, difficulty=None):
+        """Returns the results on the 0-based `page` of the given ranking."""
+        board = self._boards.get((category, difficulty))
+        if not board:
+            return []
+        start = page * page_size
+        return board.entries[start:start + page_size]
+
+    def page_count(self, page_size=10, category=None, difficulty=None):
+        board = self._boards.get((category, difficulty))
+        return (len(board.entries) + page_size - 1) // page_size if board else 0
+
+    def rank(self, name, category=None, difficulty=None):
+        """1-based rank of the user's best result, or None if it is not in the top `capacity`."""
+        board = self._boards.get((category, difficulty))
+        return board.rank(name) if board else None
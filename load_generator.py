@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlencode
+
+from quiz_server import encode_frame, read_frame
+
+
+class HttpClient:
+    """Keep-alive JSON client for one connection to the quiz server."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.token = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def call(self, op, **params):
+        method, path = OPERATIONS[op]
+        body = json.dumps(params).encode() if method == "POST" else b""
+        query = urlencode({k: v for k, v in params.items() if v is not None}) if method == "GET" else ""
+        head = f"{method} {path}{'?' + query if query else ''} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        if self.token:
+            head += f"Authorization: Bearer {self.token}\r\n"
+        self.writer.write((head + "\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        data = json.loads(await self.reader.readexactly(length))
+        if status != 200:
+            raise RuntimeError(f"{op}: {status} {data.get('error')}")
+        if op == "login":
+            self.token = data["token"]
+        return data
+
+    def close(self):
+        self.writer.close()
+
+
+class WebSocketClient(HttpClient):
+    async def connect(self):
+        await super().connect()
+        self.writer.write((f"GET /ws HTTP/1.1\r\nHost: {self.host}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                           "Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        await self.writer.drain()
+        while (await self.reader.readline()) not in (b"\r\n", b""):
+            pass
+        self._ids = 0
+
+    async def call(self, op, **params):
+        self._ids += 1
+        self.writer.write(encode_frame(0x1, json.dumps(dict(params, id=self._ids, op=op)).encode(), mask=True))
+        await self.writer.drain()
+        _, payload = await read_frame(self.reader)
+        reply = json.loads(payload)
+        if not reply["ok"]:
+            raise RuntimeError(f"{op}: {reply['status']} {reply['error']}")
+        return reply["data"]
+
+
+OPERATIONS = {
+    "login": ("POST", "/api/login"),
+    "categories": ("GET", "/api/categories"),
+    "start": ("POST", "/api/quiz/start"),
+    "answer": ("POST", "/api/quiz/answer"),
+    "results": ("GET", "/api/quiz/results"),
+    "leaderboard": ("GET", "/api/leaderboard"),
+}
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.quizzes = 0
+        self.errors = 0
+
+    async def timed(self, coro):
+        started = time.perf_counter()
+        result = await coro
+        self.latencies.append(time.perf_counter() - started)
+        return result
+
+    def report(self, elapsed):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+        print(f"requests:   {len(latencies)} in {elapsed:.1f}s ({len(latencies) / elapsed:.0f} req/s)")
+        print(f"quizzes:    {self.quizzes} ({self.quizzes / elapsed:.1f} quizzes/s)")
+        print(f"errors:     {self.errors}")
+        print(f"latency ms: p50={percentile(0.50):.2f} p90={percentile(0.90):.2f} p99={percentile(0.99):.2f} max={percentile(1.0):.2f}")
+
+
+async def fetch_categories(args):
+    """Names of the server's categories that have questions."""
+    client = (WebSocketClient if args.websocket else HttpClient)(args.host, args.port)
+    await client.connect()
+    try:
+        await client.call("login", username=args.username, password=args.password)
+        return [c["name"] for c in (await client.call("categories"))["categories"] if c["questions"]]
+    finally:
+        client.close()
+
+
+async def run_client(args, categories, stats, deadline):
+    client = (WebSocketClient if args.websocket else HttpClient)(args.host, args.port)
+    await client.connect()
+    try:
+        await client.call("login", username=args.username, password=args.password)
+        while time.monotonic() < deadline:
+            try:
+                quiz = await stats.timed(client.call("start", category=random.choice(categories),
+                                                     difficulty=args.difficulty, timed=True))
+                question, finished = quiz["question"], False
+                while not finished:
+                    reply = await stats.timed(client.call("answer", session_id=quiz["session_id"],
+                                                          choice=random.randrange(len(question["choices"]))))
+                    finished = reply["finished"]
+                    question = reply.get("question")
+                await stats.timed(client.call("results", session_id=quiz["session_id"]))
+                stats.quizzes += 1
+            except RuntimeError:
+                stats.errors += 1
+    finally:
+        client.close()
+
+
+async def run(args, categories):
+    stats = Stats()
+    started = time.monotonic()
+    deadline = started + args.duration
+    # Logging in runs the password KDF, so clients connect in waves rather than all at once
+    clients = []
+    for i in range(args.clients):
+        clients.append(asyncio.create_task(run_client(args, categories, stats, deadline)))
+        if i % 50 == 49:
+            await asyncio.sleep(0.05)
+    results = await asyncio.gather(*clients, return_exceptions=True)
+    stats.errors += sum(1 for r in results if isinstance(r, Exception))
+    stats.report(time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate quiz traffic against quiz_server.py and report latency.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--difficulty", default="Medium", choices=["Easy", "Medium", "Hard", "Adaptive"])
+    parser.add_argument("--username", default="demo")
+    parser.add_argument("--password", default="demo")
+    parser.add_argument("--websocket", action="store_true", help="use one WebSocket per client instead of HTTP")
+    args = parser.parse_args()
+    try:
+        categories = asyncio.run(fetch_categories(args))
+    except (OSError, RuntimeError) as e:
+        parser.exit(1, f"Error: could not reach the quiz server: {e}\n")
+    if not categories:
+        parser.exit(1, "Error: the server has no categories with questions to quiz on.\n")
+    asyncio.run(run(args, categories))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import atexit
+import json
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from functools import wraps
+
+# Upper bounds, in seconds, of the latency histogram buckets; anything slower lands in +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DESCRIPTIONS = {
+    "operation_seconds": "Time taken by app and engine operations.",
+    "operation_errors": "Operations that raised an exception.",
+    "io_seconds": "Time taken by file reads and writes.",
+    "io_bytes": "Bytes read from and written to files.",
+    "io_operations": "File reads and writes.",
+}
+
+
+class Histogram:
+    """Counts of observed values per bucket, plus their number and sum."""
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = array("Q", bytes(8 * (len(bounds) + 1)))    # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """(upper bound, observations at or below it) per bucket, ending with +Inf."""
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile; None with no observations."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+
+
+class Metrics:
+    """
+    Latency histograms and counters, keyed by a metric name and a tuple of
+    (label, value) pairs.
+
+    Disabled by default, and while disabled every recording call returns
+    straight away, so the instrumentation can stay on hot paths: a function
+    wrapped with timed() costs one extra call and an attribute check. Set
+    `enabled` (the app and server do it for --metrics) to start recording.
+    """
+
+    def __init__(self, prefix="quiz"):
+        self.prefix = prefix
+        self.enabled = False
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, labels=()):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = Histogram()
+            histogram.observe(value)
+
+    def count(self, name, amount=1, labels=()):
+        if not self.enabled:
+            return
+        with self._lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def record_io(self, op, path, nbytes, seconds, label=None):
+        """Records one file read or write ("read"/"write") of `nbytes` bytes; `label` names the file, default its basename."""
+        if not self.enabled:
+            return
+        labels = (("op", op), ("file", label or os.path.basename(path)))
+        with self._lock:
+            for name, amount in (("io_bytes", nbytes), ("io_operations", 1)):
+                self.counters[(name, labels)] = self.counters.get((name, labels), 0) + amount
+        self.observe("io_seconds", seconds, labels)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+
+    def snapshot(self):
+        """Everything recorded so far as a JSON-ready dict."""
+        with self._lock:
+            histograms = [(name, labels, h.count, h.sum, list(h.cumulative()), h.quantile(0.5), h.quantile(0.95),
+                           h.quantile(0.99)) for (name, labels), h in sorted(self.histograms.items())]
+            counters = sorted(self.counters.items())
+        return {
+            "time": time.time(),
+            "histograms": [{"name": name, "labels": dict(labels), "count": count, "sum": total,
+                            "buckets": {_bound(bound): n for bound, n in buckets},
+                            "p50": p50, "p95": p95, "p99": p99}
+                           for name, labels, count, total, buckets, p50, p95, p99 in histograms],
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in counters],
+        }
+
+    def prometheus_text(self):
+        """Everything recorded so far in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = [(name, labels, h.count, h.sum, list(h.cumulative()))
+                          for (name, labels), h in sorted(self.histograms.items())]
+            counters = sorted(self.counters.items())
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                full = f"{self.prefix}_{name}{'_total' if kind == 'counter' else ''}"
+                if name in DESCRIPTIONS:
+                    lines.append(f"# HELP {full} {DESCRIPTIONS[name]}")
+                lines.append(f"# TYPE {full} {kind}")
+
+        for name, labels, count, total, buckets in histograms:
+            describe(name, "histogram")
+            for bound, n in buckets:
+                lines.append(f"{self.prefix}_{name}_bucket{_labels(labels + (('le', _bound(bound)),))} {n}")
+            lines.append(f"{self.prefix}_{name}_sum{_labels(labels)} {total!r}")
+            lines.append(f"{self.prefix}_{name}_count{_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{self.prefix}_{name}_total{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Writes a snapshot to `path`: JSON if it ends in .json, otherwise Prometheus text."""
+        from write_behind import write_text_atomic
+        if path.endswith(".json"):
+            text = json.dumps(self.snapshot(), indent=2)
+        else:
+            text = self.prometheus_text()
+        write_text_atomic(path, text)
+
+
+def _bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+METRICS = Metrics()
+
+
+def timed(operation, metrics=METRICS):
+    """Decorator recording each call's duration under operation_seconds, and exceptions under operation_errors."""
+    labels = (("operation", operation),)
+
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                metrics.count("operation_errors", 1, labels)
+                raise
+            finally:
+                metrics.observe("operation_seconds", time.perf_counter() - started, labels)
+        return wrapper
+    return decorate
+
+
+class MetricsExporter:
+    """Enables `metrics` and rewrites `path` with a snapshot every `interval` seconds, and once more on close() or exit."""
+
+    def __init__(self, path, interval=15.0, metrics=METRICS):
+        self.path = path
+        self.interval = interval
+        self.metrics = metrics
+        metrics.enabled = True
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while not self._closed.wait(self.interval):
+            self.export()
+
+    def export(self):
+        try:
+            self.metrics.export(self.path)
+        except OSError:
+            pass  # The next export tries again
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join()
+        self.export()
+        atexit.unregister(self.close)
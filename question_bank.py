@@ -0,0 +1,340 @@
+import argparse
+import mmap
+from array import array
+import os
+import struct
+import time
+
+MAGIC = b"QBNK"
+VERSION = 1
+
+# magic, version, reserved, category count, index offset, overflow offset
+HEADER = struct.Struct("<4sHHIQQ")
+# answer index, number of choices, question length
+RECORD = struct.Struct("<bBI")
+LENGTH = struct.Struct("<I")
+NAME_LENGTH = struct.Struct("<H")
+# question count, position of the record offset table
+INDEX_ENTRY = struct.Struct("<IQ")
+OFFSET = struct.Struct("<Q")
+
+
+class DictQuestionBank:
+    """Question bank over the in-memory categories dict loaded by the storage backend."""
+
+    def __init__(self, categories, storage=None):
+        self.categories = categories
+        self.storage = storage
+
+    def names(self):
+        return list(self.categories.keys())
+
+    def __contains__(self, name):
+        return name in self.categories
+
+    def count(self, name):
+        category_data = self.categories.get(name)
+        return len(category_data["answers"]) if category_data else 0
+
+    def get(self, name, idx):
+        category_data = self.categories[name]
+        return category_data["questions"][idx], category_data["choices"][idx], category_data["answers"][idx]
+
+    def add(self, name, question, choices, answer):
+        if self.storage is not None:
+            # The storage backend appends to the same dict and persists the question
+            self.storage.add_question(name, question, choices, answer)
+            return
+        category_data = self.categories.setdefault(name, {"questions": [], "choices": [], "answers": []})
+        category_data["questions"].append(question)
+        category_data["choices"].append(choices)
+        category_data["answers"].append(answer)
+
+    def close(self):
+        pass
+
+
+def bank_to_categories(bank):
+    """Rebuilds the categories dict used by the JSON format from any question bank."""
+    categories = {}
+    for name in bank.names():
+        records = [bank.get(name, idx) for idx in range(bank.count(name))]
+        categories[name] = {
+            "questions": [q for q, _, _ in records],
+            "choices": [c for _, c, _ in records],
+            "answers": [a for _, _, a in records],
+        }
+    return categories
+
+
+class _CompactCategory:
+    __slots__ = ("texts", "text_offsets", "choice_ids", "choice_offsets", "answers")
+
+    def __init__(self):
+        self.texts = bytearray()                # UTF-8 question texts, back to back
+        self.text_offsets = array("Q", [0])     # question i is texts[text_offsets[i]:text_offsets[i + 1]]
+        self.choice_ids = array("I")            # ids into the bank's choice table
+        self.choice_offsets = array("I", [0])   # question i's choices are choice_ids[choice_offsets[i]:...[i + 1]]
+        self.answers = array("b")
+
+
+class CompactQuestionBank:
+    """
+    In-memory question bank stored as arrays instead of per-question Python
+    objects. Each category keeps its question texts in one UTF-8 buffer with an
+    offset table, its choices as ids into a table of choice strings shared by
+    every category, and its answers in an array('b'). Identical choices (such
+    as "True"/"False") are interned into one table entry while the bank is
+    built. get() is O(1) and only decodes the question that is asked for.
+    """
+
+    def __init__(self, categories=None, storage=None):
+        self.storage = storage
+        self._categories = {}
+        self._choice_texts = bytearray()
+        self._choice_offsets = array("Q", [0])
+        # Only needed while building; kept strings would cost more than interning saves
+        choice_ids = {}
+        for name, category_data in (categories or {}).items():
+            category = self._category(name)
+            for record in zip(category_data["questions"], category_data["choices"], category_data["answers"]):
+                self._append(category, *record, choice_ids=choice_ids)
+
+    def _category(self, name):
+        category = self._categories.get(name)
+        if category is None:
+            category = self._categories[name] = _CompactCategory()
+        return category
+
+    def _choice_id(self, choice, choice_ids):
+        choice_id = choice_ids.get(choice)
+        if choice_id is None:
+            choice_id = len(self._choice_offsets) - 1
+            self._choice_texts += choice.encode("utf-8")
+            self._choice_offsets.append(len(self._choice_texts))
+            choice_ids[choice] = choice_id
+        return choice_id
+
+    def _append(self, category, question, choices, answer, choice_ids):
+        category.texts += question.encode("utf-8")
+        category.text_offsets.append(len(category.texts))
+        category.choice_ids.extend(self._choice_id(choice, choice_ids) for choice in choices)
+        category.choice_offsets.append(len(category.choice_ids))
+        # Last, so a concurrent reader that goes by len(answers) never sees a half-added question
+        category.answers.append(answer)
+
+    def names(self):
+        return list(self._categories)
+
+    def __contains__(self, name):
+        return name in self._categories
+
+    def count(self, name):
+        category = self._categories.get(name)
+        return len(category.answers) if category else 0
+
+    def get(self, name, idx):
+        category = self._categories[name]
+        answer = category.answers[idx]
+        offsets = category.text_offsets
+        question = category.texts[offsets[idx]:offsets[idx + 1]].decode("utf-8")
+        texts, choice_offsets = self._choice_texts, self._choice_offsets
+        choices = [texts[choice_offsets[i]:choice_offsets[i + 1]].decode("utf-8")
+                   for i in category.choice_ids[category.choice_offsets[idx]:category.choice_offsets[idx + 1]]]
+        return question, choices, answer
+
+    def add(self, name, question, choices, answer):
+        self._append(self._category(name), question, choices, answer, {})
+        if self.storage is not None:
+            self.storage.add_question(name, question, choices, answer)
+
+    def to_categories(self):
+        return bank_to_categories(self)
+
+    def close(self):
+        pass
+
+
+def _encode_record(question, choices, answer):
+    question_bytes = question.encode("utf-8")
+    parts = [RECORD.pack(answer, len(choices), len(question_bytes)), question_bytes]
+    for choice in choices:
+        choice_bytes = choice.encode("utf-8")
+        parts.append(LENGTH.pack(len(choice_bytes)))
+        parts.append(choice_bytes)
+    return b"".join(parts)
+
+
+def _decode_record(buf, pos):
+    """Decodes the record at `pos`. Returns ((question, choices, answer), end position)."""
+    answer, num_choices, question_len = RECORD.unpack_from(buf, pos)
+    pos += RECORD.size
+    question = bytes(buf[pos:pos + question_len]).decode("utf-8")
+    pos += question_len
+    choices = []
+    for _ in range(num_choices):
+        (choice_len,) = LENGTH.unpack_from(buf, pos)
+        pos += LENGTH.size
+        choices.append(bytes(buf[pos:pos + choice_len]).decode("utf-8"))
+        pos += choice_len
+    return (question, choices, answer), pos
+
+
+def build_question_bank(bank, path):
+    """Writes every question in `bank` to a compact, indexed file at `path` (atomically)."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        tables = []
+        for name in bank.names():
+            offsets = []
+            for idx in range(bank.count(name)):
+                offsets.append(f.tell())
+                f.write(_encode_record(*bank.get(name, idx)))
+            tables.append((name, offsets))
+
+        index = []
+        for name, offsets in tables:
+            index.append((name, len(offsets), f.tell()))
+            f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+
+        index_offset = f.tell()
+        for name, count, offsets_pos in index:
+            name_bytes = name.encode("utf-8")
+            f.write(NAME_LENGTH.pack(len(name_bytes)))
+            f.write(name_bytes)
+            f.write(INDEX_ENTRY.pack(count, offsets_pos))
+
+        overflow_offset = f.tell()
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(index), index_offset, overflow_offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class MappedQuestionBank:
+    """
+    Read-mostly question bank backed by a memory-mapped file built with
+    `build_question_bank`. Opening it only reads the header and the per-category
+    index; questions are decoded from the map when a quiz asks for them.
+
+    Questions added afterwards are appended to an overflow area at the end of
+    the file and kept in memory; `python question_bank.py compact` folds them
+    back into the indexed part.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, num_categories, index_offset, overflow_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a question bank file.")
+
+        self._index = {}
+        pos = index_offset
+        for _ in range(num_categories):
+            (name_len,) = NAME_LENGTH.unpack_from(self._map, pos)
+            pos += NAME_LENGTH.size
+            name = bytes(self._map[pos:pos + name_len]).decode("utf-8")
+            pos += name_len
+            self._index[name] = INDEX_ENTRY.unpack_from(self._map, pos)
+            pos += INDEX_ENTRY.size
+
+        self._added = {}
+        self._load_overflow(overflow_offset)
+
+    def _load_overflow(self, pos):
+        end = len(self._map)
+        while pos < end:
+            try:
+                (name_len,) = NAME_LENGTH.unpack_from(self._map, pos)
+                name = bytes(self._map[pos + NAME_LENGTH.size:pos + NAME_LENGTH.size + name_len]).decode("utf-8")
+                record, next_pos = _decode_record(self._map, pos + NAME_LENGTH.size + name_len)
+            except (struct.error, UnicodeDecodeError):
+                break
+            if next_pos > end:
+                break
+            self._added.setdefault(name, []).append(record)
+            pos = next_pos
+
+        if pos < end:
+            # Drop a torn append so later appends start on a record boundary
+            with open(self.path, "r+b") as f:
+                f.truncate(pos)
+
+    def names(self):
+        return list(self._index) + [name for name in self._added if name not in self._index]
+
+    def __contains__(self, name):
+        return name in self._index or name in self._added
+
+    def count(self, name):
+        entry = self._index.get(name)
+        return (entry[0] if entry else 0) + len(self._added.get(name, ()))
+
+    def get(self, name, idx):
+        entry = self._index.get(name)
+        indexed = entry[0] if entry else 0
+        if idx >= indexed:
+            return self._added[name][idx - indexed]
+        (offset,) = OFFSET.unpack_from(self._map, entry[1] + idx * OFFSET.size)
+        return _decode_record(self._map, offset)[0]
+
+    def add(self, name, question, choices, answer):
+        name_bytes = name.encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(NAME_LENGTH.pack(len(name_bytes)) + name_bytes + _encode_record(question, choices, answer))
+            f.flush()
+            os.fsync(f.fileno())
+        self._added.setdefault(name, []).append((question, choices, answer))
+
+    def to_categories(self):
+        return bank_to_categories(self)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def main():
+    from storage import JsonStorage, open_storage
+
+    parser = argparse.ArgumentParser(description="Build and maintain memory-mapped question bank files.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="build a bank from the configured storage backend")
+    build.add_argument("bank")
+    build.add_argument("--storage", choices=["json", "sqlite"], default=None)
+    build.add_argument("--db", default=None)
+    compact = subparsers.add_parser("compact", help="fold questions added since the last build into the index")
+    compact.add_argument("bank")
+    export = subparsers.add_parser("export", help="write a bank out as questions JSON")
+    export.add_argument("bank")
+    export.add_argument("--questions", default="questions.json")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "build":
+        storage = open_storage(args.storage, args.db)
+        categories = storage.load_questions() or {}
+        build_question_bank(DictQuestionBank(categories), args.bank)
+        storage.close()
+    elif args.command == "compact":
+        # Decode first so the file isn't mapped while it is being replaced
+        bank = MappedQuestionBank(args.bank)
+        categories = bank.to_categories()
+        bank.close()
+        build_question_bank(DictQuestionBank(categories), args.bank)
+    else:
+        bank = MappedQuestionBank(args.bank)
+        storage = JsonStorage(questions_file=args.questions)
+        storage.save_questions(bank.to_categories())
+        storage.close()
+        bank.close()
+    print(f"{args.command} finished in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+from dedup import DuplicateIndex, normalize
+from storage import open_storage
+
+MAX_RECORD_CHARS = 1 << 24
+_WHITESPACE = re.compile(r"\s*")
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def read_csv(f):
+    """
+    Yields (line, record) from a CSV file with a header row. Choices come from a
+    "choices" column separated by "|", or from every column whose name starts
+    with "choice", in order.
+    """
+    reader = csv.reader(f)
+    header = [name.strip().lower() for name in next(reader, [])]
+    missing = {"category", "question", "answer"} - set(header)
+    if missing:
+        raise ValueError(f"CSV header is missing: {', '.join(sorted(missing))}")
+    columns = {name: i for i, name in enumerate(header)}
+    choice_columns = [i for i, name in enumerate(header) if name.startswith("choice") and name != "choices"]
+
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        row += [""] * (len(header) - len(row))
+        if "choices" in columns:
+            choices = row[columns["choices"]].split("|")
+        else:
+            choices = [row[i] for i in choice_columns]
+        yield reader.line_num, {"category": row[columns["category"]], "question": row[columns["question"]],
+                                "choices": choices, "answer": row[columns["answer"]]}
+
+
+def read_jsonl(f):
+    """Yields (line, record) from a file with one JSON question object per line."""
+    for line_num, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            record = InvalidRecord(f"invalid JSON: {e.msg}")  # Reported like any other invalid record
+        yield line_num, record
+
+
+class _JsonStream:
+    """Decodes a large JSON document one value at a time, reading it in chunks."""
+
+    def __init__(self, f, chunk_size=1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _more(self, size=None):
+        chunk = self.f.read(max(size or 0, self.chunk_size))
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop the consumed text only once it is most of the buffer, so copying stays linear overall
+        if self.pos > len(self.buf) // 2:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        if len(self.buf) - self.pos > MAX_RECORD_CHARS:
+            raise ValueError("JSON value too large or malformed")
+        return True
+
+    def peek(self):
+        """The next non-whitespace character, or "" at the end of the input."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in JSON input")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # At least double the unparsed text, so a large value is re-decoded only a few times
+                if not self._more(len(self.buf) - self.pos):
+                    raise
+                continue
+            # A number near the end of the buffer may continue in the next chunk
+            if isinstance(value, (int, float)) and len(self.buf) - end < 32 and not self.eof and self._more():
+                continue
+            self.pos = end
+            return value
+
+    def items(self, close):
+        """Yields values up to `close`, for the inside of an array or object."""
+        if self.peek() == close:
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == close:
+                return
+            if char != ",":
+                raise ValueError("Expected ',' in JSON input")
+
+    def members(self):
+        """Yields the keys of an object, leaving each one's value to be read before the next."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError("Expected ',' in JSON input")
+
+
+_CATEGORY_ARRAYS = ("questions", "choices", "answers")
+
+
+def _read_category(stream, category):
+    """
+    Yields (position, record) for one category of the questions.json layout,
+    decoding its arrays an element at a time. The arrays are parallel, so the
+    first two are kept as lists and records are yielded while the last one is
+    read.
+    """
+    if stream.peek() != "{":
+        raise ValueError(f"Category '{category}' is not an object")
+    arrays = {}
+    yielded = 0
+
+    def record(i, streamed=None, element=None):
+        fields = {name: arrays[name][i] if i < len(arrays.get(name, ())) else None for name in _CATEGORY_ARRAYS}
+        if streamed is not None:
+            fields[streamed] = element
+        return f"{category}#{i + 1}", {"category": category, "question": fields["questions"],
+                                        "choices": fields["choices"], "answer": fields["answers"]}
+
+    for key in stream.members():
+        if key not in _CATEGORY_ARRAYS or stream.peek() != "[":
+            stream.value()  # Unknown keys are skipped
+            continue
+        stream.pos += 1
+        if len(arrays) < len(_CATEGORY_ARRAYS) - 1:
+            arrays[key] = list(stream.items("]"))
+            continue
+        # The last array: every record is complete as soon as its element arrives
+        questions = arrays.get("questions", ())
+        for i, element in enumerate(stream.items("]")):
+            if key == "questions" or i < len(questions):
+                yield record(i, key, element)
+                yielded = i + 1
+        arrays[key] = []
+    # A category missing one of the arrays, or with a short last array
+    for i in range(yielded, len(arrays.get("questions", ()))):
+        yield record(i)
+
+
+def read_json(f):
+    """
+    Yields (position, record) from a JSON file holding either a list of
+    question objects or the questions.json layout ({category: {"questions",
+    "choices", "answers"}}). Records are decoded one at a time in both.
+    """
+    stream = _JsonStream(f)
+    if stream.peek() == "[":
+        stream.pos += 1
+        for i, record in enumerate(stream.items("]"), 1):
+            yield i, record
+        return
+    for category in stream.members():
+        yield from _read_category(stream, category)
+
+
+READERS = {".csv": read_csv, ".jsonl": read_jsonl, ".ndjson": read_jsonl, ".json": read_json}
+
+
+class QuestionImporter:
+    """
+    Validates question records as they stream in and appends the valid ones to
+    the storage backend in batches. Exact duplicates of the existing bank or
+    of earlier records are skipped; near duplicates are ignored, reported or
+    skipped depending on `near_duplicates` ("off", "report" or "skip").
+    """
+
+    def __init__(self, storage, num_choices=4, batch_size=1000, dry_run=False, strict=False,
+                 near_duplicates="off", threshold=0.7):
+        self.storage = storage
+        self.num_choices = num_choices
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.strict = strict
+        self.near_duplicates = near_duplicates
+        self.index = DuplicateIndex(near=near_duplicates != "off", threshold=threshold)
+        self.pending = {}       # category -> [(question, choices, answer)]
+        self.pending_count = 0
+        self.read = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.near = 0
+        self.errors = []
+        self.warnings = []
+        self.error_count = 0
+        self.per_category = {}
+
+        for category, category_data in (storage.load_questions() or {}).items():
+            for idx, (question, choices) in enumerate(zip(category_data["questions"], category_data["choices"])):
+                self.index.add(f"{category} #{idx + 1}", category, question, choices)
+
+    def validate(self, record):
+        """Returns (category, question, choices, answer) or raises ValueError."""
+        if isinstance(record, InvalidRecord):
+            raise record
+        if not isinstance(record, dict):
+            raise ValueError("record is not an object")
+        category, question, choices = record.get("category"), record.get("question"), record.get("choices")
+        if not isinstance(category, str) or not category.strip():
+            raise ValueError("missing category")
+        if not isinstance(question, str) or not question.strip():
+            raise ValueError("missing question")
+        if not isinstance(choices, list) or not all(isinstance(c, str) and c.strip() for c in choices):
+            raise ValueError("choices must be a list of non-empty strings")
+        choices = [choice.strip() for choice in choices]
+        if self.num_choices and len(choices) != self.num_choices:
+            raise ValueError(f"expected {self.num_choices} choices, got {len(choices)}")
+        if len(choices) < 2:
+            raise ValueError("a question needs at least 2 choices")
+        if len({normalize(choice) for choice in choices}) != len(choices):
+            raise ValueError("duplicate choices")
+        return category.strip(), question.strip(), choices, self._answer(record.get("answer"), len(choices))
+
+    @staticmethod
+    def _answer(answer, num_choices):
+        # An index, or a letter as shown in the app (A, B, C, ...)
+        if isinstance(answer, str):
+            answer = answer.strip()
+            if len(answer) == 1 and answer.isalpha():
+                answer = ord(answer.upper()) - ord("A")
+            elif answer.lstrip("-").isdigit():
+                answer = int(answer)
+        if isinstance(answer, bool) or not isinstance(answer, int):
+            raise ValueError("answer must be a choice index or letter")
+        if not 0 <= answer < num_choices:
+            raise ValueError(f"answer {answer} is out of range for {num_choices} choices")
+        return answer
+
+    def add(self, location, record):
+        self.read += 1
+        try:
+            category, question, choices, answer = self.validate(record)
+        except ValueError as e:
+            self.error_count += 1
+            if self.strict:
+                raise InvalidRecord(f"{location}: {e}")
+            if len(self.errors) < 20:
+                self.errors.append(f"{location}: {e}")
+            return
+
+        exact, similar = self.index.add(location, category, question, choices)
+        if exact is not None:
+            self.duplicates += 1
+            return
+        if similar:
+            self.near += 1
+            if len(self.warnings) < 20:
+                ref, score = similar[0]
+                self.warnings.append(f"{location}: {score:.0%} similar to {ref}")
+            if self.near_duplicates == "skip":
+                return
+        self.pending.setdefault(category, []).append((question, choices, answer))
+        self.pending_count += 1
+        if self.pending_count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for category, questions in self.pending.items():
+            if not self.dry_run:
+                self.storage.add_questions(category, questions)
+            self.per_category[category] = self.per_category.get(category, 0) + len(questions)
+            self.imported += len(questions)
+        self.pending = {}
+        self.pending_count = 0
+
+
+def import_file(importer, path, fmt=None):
+    reader = READERS[fmt or os.path.splitext(path)[1].lower()]
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for location, record in reader(f):
+            importer.add(f"{os.path.basename(path)}:{location}", record)
+    importer.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import questions in bulk from CSV, JSON Lines or JSON files.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--format", choices=["csv", "jsonl", "json"], default=None,
+                        help="file format (default: from the file extension)")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default=None)
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--choices", type=int, default=4, help="required number of choices, 0 for any")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="validate only, don't save")
+    parser.add_argument("--strict", action="store_true", help="stop at the first invalid record")
+    parser.add_argument("--near-duplicates", choices=["off", "report", "skip"], default="off",
+                        help="check each question for near duplicates (slower)")
+    parser.add_argument("--threshold", type=float, default=0.7, help="near-duplicate similarity, 0-1")
+    args = parser.parse_args()
+
+    fmt = f".{args.format}" if args.format else None
+    for path in args.files:
+        if (fmt or os.path.splitext(path)[1].lower()) not in READERS:
+            parser.error(f"Can't tell the format of '{path}'; use --format")
+
+    storage = open_storage(args.storage, args.db)
+    importer = QuestionImporter(storage, args.choices, args.batch_size, args.dry_run, args.strict,
+                                args.near_duplicates, args.threshold)
+    started = time.perf_counter()
+    try:
+        for path in args.files:
+            import_file(importer, path, fmt)
+    except (ValueError, csv.Error, OSError) as e:
+        importer.flush()  # Keep what was valid before the error
+        print(f"Error: {e}", file=sys.stderr)
+    finally:
+        storage.close()
+    elapsed = time.perf_counter() - started
+
+    for message in importer.errors:
+        print(f"  invalid: {message}")
+    if importer.error_count > len(importer.errors):
+        print(f"  ... and {importer.error_count - len(importer.errors)} more invalid records")
+    for message in importer.warnings:
+        print(f"  near duplicate: {message}")
+    if importer.near > len(importer.warnings):
+        print(f"  ... and {importer.near - len(importer.warnings)} more near duplicates")
+    for category, count in sorted(importer.per_category.items()):
+        print(f"  {category}: {count}")
+    print(f"{'Validated' if args.dry_run else 'Imported'} {importer.imported} of {importer.read} questions "
+          f"({importer.duplicates} duplicates, {importer.near} near duplicates{' skipped' if args.near_duplicates == 'skip' else ''}, "
+          f"{importer.error_count} invalid) in {elapsed:.2f}s "
+          f"({importer.read / max(elapsed, 1e-9):,.0f} records/s)")
+    if importer.error_count and args.strict:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
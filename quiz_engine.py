@@ -0,0 +1,254 @@
+import time
+import itertools
+from array import array
+from datetime import datetime
+
+import metrics
+from sampling import QuestionSampler
+
+# Number of questions asked per difficulty; "Hard" uses the whole category.
+# "Adaptive" picks each question to match the player and stops once their level is clear.
+NUM_QUESTIONS = {"Easy": 5, "Medium": 10}
+TIME_PER_QUESTION = {"Easy": 45, "Medium": 30, "Hard": 15, "Adaptive": 30}
+ADAPTIVE = "Adaptive"
+
+
+class QuizSession:
+    """State of a single quiz attempt. Kept small so one process can hold many of them."""
+    __slots__ = ("session_id", "user", "category", "difficulty", "order", "answers",
+                 "question_index", "score", "time_limit", "start_time", "timer_running", "finished",
+                 "timer_handle", "correct", "shown_at", "adaptive")
+
+    def __init__(self, session_id, user, category, difficulty, order, time_limit, start_time):
+        self.session_id = session_id
+        self.user = user
+        self.category = category
+        self.difficulty = difficulty
+        self.order = order                  # array('I') of question indices into the category
+        self.answers = array('b')           # the user's choice index for each answered question
+        self.question_index = 0
+        self.score = 0
+        self.time_limit = time_limit        # seconds, 0 when the timer is disabled
+        self.start_time = start_time
+        self.timer_running = time_limit > 0
+        self.finished = False
+        self.timer_handle = None            # the session's deadline in the engine's timer wheel
+        self.correct = array('b')           # whether each answered question was right
+        self.shown_at = start_time          # when the current question became current
+        self.adaptive = None                # AdaptiveState of an adaptive quiz; order grows as it goes
+
+    @property
+    def total(self):
+        return len(self.order)
+
+
+class QuizEngine:
+    """Headless quiz logic: question selection, answer checking, timing and scoring."""
+
+    def __init__(self, bank, clock=time.monotonic, sampler=None, timers=None, on_expire=None, session_ids=None,
+                 packs=None, stats=None, adaptive=None, attempts=None):
+        """
+        `timers` is an optional TimerWheel (from scheduler.py) sharing `clock`. When given,
+        timed sessions are expired by the wheel and reported through on_expire(session).
+        `session_ids` is an optional iterator of ids, e.g. to keep shards' ids disjoint.
+        `packs` is an optional PackCache of pre-drawn question orders.
+        `stats` is an optional QuestionStats (from analytics.py) that every answer is recorded in.
+        `adaptive` is an optional AdaptiveSelector (from adaptive.py) enabling the "Adaptive" difficulty.
+        `attempts` is an optional AttemptLog that keeps each finished quiz's answers for re-scoring.
+        """
+        self.bank = bank
+        self.clock = clock
+        self.sampler = sampler or QuestionSampler()
+        self.timers = timers
+        self.on_expire = on_expire
+        self.packs = packs
+        self.stats = stats
+        self.adaptive = adaptive
+        self.attempts = attempts
+        self.sessions = {}
+        self._ids = session_ids or itertools.count(1)
+
+    @metrics.timed("engine_start_session")
+    def start_session(self, user, category, difficulty="Medium", timed=True):
+        available = self.bank.count(category)
+        if not available:
+            raise ValueError("No questions available in this category.")
+        if difficulty == ADAPTIVE:
+            return self._start_adaptive(user, category, available, timed)
+
+        if difficulty == "Hard":
+            num_questions = available
+        else:
+            num_questions = min(NUM_QUESTIONS.get(difficulty, 10), available)
+        time_limit = num_questions * TIME_PER_QUESTION.get(difficulty, 30) if timed else 0
+
+        # Draw only the questions that will be asked, in random order. A quiz over the
+        # whole category (Hard) is a full shuffle, too big to keep packs of.
+        order = None
+        if self.packs is not None and num_questions < available:
+            order = self.packs.take(category, difficulty, available, num_questions)
+        if order is None:
+            order = array('I', self.sampler.sample(available, num_questions))
+        session = QuizSession(next(self._ids), user, category, difficulty, order, time_limit, self.clock())
+        self.sessions[session.session_id] = session
+        if self.timers is not None and time_limit:
+            session.timer_handle = self.timers.schedule(self.deadline(session), lambda: self._expire(session))
+        return session
+
+    def _start_adaptive(self, user, category, available, timed):
+        if self.adaptive is None:
+            raise ValueError("Adaptive quizzes are not available.")
+        state, first = self.adaptive.start(category)
+        max_questions = min(self.adaptive.max_questions, available)
+        time_limit = max_questions * TIME_PER_QUESTION[ADAPTIVE] if timed else 0
+        session = QuizSession(next(self._ids), user, category, ADAPTIVE, array('I', [first]), time_limit, self.clock())
+        session.adaptive = state
+        self.sessions[session.session_id] = session
+        if self.timers is not None and time_limit:
+            session.timer_handle = self.timers.schedule(self.deadline(session), lambda: self._expire(session))
+        return session
+
+    def resume_session(self, checkpoint):
+        """
+        Recreates a session from a SessionCheckpoint (see checkpoint.py). A timed
+        session gets a new deadline on this engine's clock with the time it had left.
+        """
+        if not checkpoint.order or max(checkpoint.order) >= self.bank.count(checkpoint.category):
+            raise ValueError("The questions of this quiz have changed.")
+        if checkpoint.adaptive is not None and self.adaptive is None:
+            raise ValueError("Adaptive quizzes are not available.")
+        now = self.clock()
+        start_time = now - (checkpoint.time_limit - checkpoint.remaining) if checkpoint.time_limit else now
+        session = QuizSession(next(self._ids), checkpoint.user, checkpoint.category, checkpoint.difficulty,
+                              array('I', checkpoint.order), checkpoint.time_limit, start_time)
+        session.answers = array('b', checkpoint.answers)
+        session.correct = array('b', checkpoint.correct)
+        session.question_index = checkpoint.question_index
+        session.score = checkpoint.score
+        session.adaptive = checkpoint.adaptive
+        session.shown_at = now
+        self.sessions[session.session_id] = session
+        if self.timers is not None and session.time_limit:
+            session.timer_handle = self.timers.schedule(self.deadline(session), lambda: self._expire(session))
+        return session
+
+    def planned_total(self, session):
+        """How many questions the session will ask at most; an adaptive quiz may end sooner."""
+        if session.adaptive is not None:
+            return min(self.adaptive.max_questions, self.bank.count(session.category))
+        return session.total
+
+    def questions_changed(self, category):
+        """Call after adding questions to `category` so no pre-drawn packs of it are handed out."""
+        if self.packs is not None:
+            self.packs.invalidate(category)
+
+    def _expire(self, session):
+        session.timer_handle = None
+        if session.finished:
+            return
+        session.timer_running = False
+        if self.on_expire:
+            self.on_expire(session)
+
+    def get_session(self, session_id):
+        return self.sessions.get(session_id)
+
+    def question(self, session, position):
+        """Returns (question, choices, answer) for the question at `position` in the session."""
+        return self.bank.get(session.category, session.order[position])
+
+    def current_question(self, session):
+        if session.question_index >= session.total:
+            return None
+        return self.question(session, session.question_index)
+
+    def question_shown(self, session):
+        """Starts the answer clock for the current question, for front ends that show it after a delay."""
+        session.shown_at = self.clock()
+
+    @metrics.timed("engine_submit_answer")
+    def submit_answer(self, session, choice):
+        """Records the answer to the current question and advances. Returns (is_correct, correct_idx)."""
+        if session.finished or session.question_index >= session.total:
+            raise ValueError("The quiz is already over.")
+        _, choices, correct_idx = self.current_question(session)
+        if not 0 <= choice < len(choices):
+            raise ValueError("Please select an answer!")
+
+        session.answers.append(choice)
+        is_correct = choice == correct_idx
+        session.correct.append(is_correct)
+        if is_correct:
+            session.score += 1
+        if self.stats is not None:
+            now = self.clock()
+            self.stats.record_answer(session.category, session.order[session.question_index], choice,
+                                     len(choices), is_correct, now - session.shown_at)
+            session.shown_at = now
+        if session.adaptive is not None:
+            following = self.adaptive.answered(session.adaptive, session.category,
+                                               session.order[session.question_index], is_correct)
+            if following is not None:
+                session.order.append(following)
+        session.question_index += 1
+        return is_correct, correct_idx
+
+    def deadline(self, session):
+        """The session's deadline on the engine clock, or None if the session is untimed."""
+        if not session.time_limit:
+            return None
+        return session.start_time + session.time_limit
+
+    def remaining(self, session):
+        """Seconds left on the session's timer, or None if the session is untimed."""
+        if not session.time_limit:
+            return None
+        return max(0, session.time_limit - (self.clock() - session.start_time))
+
+    def is_expired(self, session):
+        remaining = self.remaining(session)
+        return remaining is not None and remaining <= 0
+
+    def is_complete(self, session):
+        return session.finished or session.question_index >= session.total or self.is_expired(session)
+
+    @metrics.timed("engine_finish")
+    def finish(self, session):
+        """Ends the session and returns its score entry."""
+        attempt = None
+        if not session.finished:
+            answered = session.order[:len(session.answers)]
+            if self.stats is not None:
+                self.stats.record_quiz(session.category, answered, session.correct, session.total)
+            if self.attempts is not None:
+                attempt = self.attempts.append(session.category, answered, session.answers, session.total)
+        session.timer_running = False
+        session.finished = True
+        self._cancel_timer(session)
+        self.sessions.pop(session.session_id, None)
+
+        total_questions = session.total
+        percentage = (session.score / total_questions) * 100 if total_questions > 0 else 0
+        entry = {
+            "name": session.user,
+            "score": session.score,
+            "total": total_questions,
+            "percentage": percentage,
+            "category": session.category,
+            "difficulty": session.difficulty,
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M")
+        }
+        if attempt is not None:
+            entry["attempt"] = attempt
+        return entry
+
+    def _cancel_timer(self, session):
+        if session.timer_handle is not None:
+            self.timers.cancel(session.timer_handle)
+            session.timer_handle = None
+
+    def end_session(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            self._cancel_timer(session)
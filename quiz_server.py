@@ -0,0 +1,479 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import itertools
+import json
+import secrets
+import struct
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+from credentials import CredentialService, ServiceBusy
+from question_bank import CompactQuestionBank, MappedQuestionBank
+from quiz_engine import QuizEngine
+from sampling import PackCache
+from analytics import QuestionStats
+from adaptive import AdaptiveSelector
+from attempt_log import AttemptLog
+from metrics import MetricsExporter
+from scheduler import TimerWheel
+from storage import open_storage, seed_default_questions, seed_default_users
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_BODY = 64 * 1024
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+               404: "Not Found", 413: "Payload Too Large", 502: "Bad Gateway", 503: "Service Unavailable"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def leaderboard_page(leaderboard, category=None, difficulty=None, page=0, page_size=10):
+    """The "leaderboard" operation's response for a page of `leaderboard`."""
+    page, page_size = int(page), min(int(page_size), 100)
+    return {
+        "page": page,
+        "pages": leaderboard.page_count(page_size, category, difficulty),
+        "scores": leaderboard.page(page, page_size, category, difficulty),
+    }
+
+
+class QuizService:
+    """
+    The quiz operations served over HTTP and WebSocket. Question selection,
+    scoring and timing come from QuizEngine, so results match the desktop app.
+    """
+
+    def __init__(self, storage, question_bank=None, credentials=None, max_results=10000,
+                 shard=0, num_shards=1, token_secret=None, packs=None, stats=None,
+                 attempts=None, token_ttl=12 * 3600, max_tokens=100000, idle_timeout=30 * 60):
+        """
+        When running as one of several shards, session ids are shard + k * num_shards so
+        the id alone identifies the owning shard, and tokens are signed with the shared
+        `token_secret` so any shard can check them.
+        Tokens expire `token_ttl` seconds after login; without a secret at most
+        `max_tokens` are kept, and the oldest login is dropped beyond that. An
+        untimed quiz with no answer for `idle_timeout` seconds is dropped unscored.
+        """
+        self.storage = storage
+        if question_bank is None:
+            question_bank = CompactQuestionBank(seed_default_questions(storage), storage)
+            storage.release_questions(question_bank.to_categories)
+        self.question_bank = question_bank
+        self.users = storage.load_users()
+        seed_default_users(storage, self.users)
+        self.scores = storage.scores
+        self.credentials = credentials or CredentialService()
+        self.timers = TimerWheel(1.0)
+        self.engine = QuizEngine(question_bank, timers=self.timers, on_expire=self._finish,
+                                 session_ids=itertools.count(shard + num_shards, num_shards), packs=packs,
+                                 stats=stats, adaptive=AdaptiveSelector(question_bank, stats),
+                                 attempts=attempts)
+        self.token_secret = token_secret
+        self.token_ttl = token_ttl
+        self.max_tokens = max_tokens
+        self.idle_timeout = idle_timeout
+        self.tokens = OrderedDict()     # token -> (user, expiry time), oldest first
+        self._idle = {}                 # session_id -> idle timer of an untimed quiz
+        self.results = OrderedDict()    # session_id -> (user, score entry) for recently finished quizzes
+        self.max_results = max_results
+        self.operations = {
+            "login": self.login,
+            "categories": self.categories,
+            "start": self.start,
+            "answer": self.answer,
+            "results": self.result,
+            "leaderboard": self.leaderboard,
+        }
+
+    async def call(self, op, params, token=None):
+        handler = self.operations.get(op)
+        if handler is None:
+            raise ApiError(404, f"Unknown operation: {op}")
+        if op == "login":
+            return await handler(params.get("username"), params.get("password"))
+        if op in ("categories", "leaderboard"):
+            result = handler(**params)
+        else:
+            user = self._token_user(token)
+            if user is None:
+                raise ApiError(401, "Please log in first.")
+            result = handler(user, **params)
+        # Operations may be coroutines, e.g. a shard forwarding the leaderboard to the store process
+        return await result if asyncio.iscoroutine(result) else result
+
+    async def login(self, username, password):
+        if not username or not password:
+            raise ApiError(400, "Please enter both username and password.")
+        user_data = self.users.get(username)
+        if not user_data:
+            raise ApiError(401, "Username not found.")
+        try:
+            future = self.credentials.verify(password, user_data["password"])
+        except ServiceBusy as e:
+            raise ApiError(503, str(e))
+        matches, new_hash = await asyncio.wrap_future(future)
+        if not matches:
+            raise ApiError(401, "Incorrect password.")
+        if new_hash:
+            user_data["password"] = new_hash
+            self.storage.save_user(username, user_data)
+
+        return {"token": self._issue_token(username), "role": user_data.get("role", "user")}
+
+    def _sign(self, username, expires):
+        return hmac.new(self.token_secret, f"{username}\n{expires}".encode(), hashlib.sha256).hexdigest()[:32]
+
+    def _issue_token(self, username):
+        now = time.time()
+        expires = int(now + self.token_ttl)
+        if self.token_secret is None:
+            # Every token lives as long, so the expired ones are the oldest
+            while self.tokens and next(iter(self.tokens.values()))[1] <= now:
+                self.tokens.popitem(last=False)
+            token = secrets.token_urlsafe(24)
+            self.tokens[token] = (username, expires)
+            if len(self.tokens) > self.max_tokens:
+                self.tokens.popitem(last=False)
+            return token
+        encoded = base64.urlsafe_b64encode(username.encode()).decode()
+        return f"{encoded}.{expires}.{self._sign(username, expires)}"
+
+    def _token_user(self, token):
+        if not token:
+            return None
+        if self.token_secret is None:
+            username, expires = self.tokens.get(token, (None, 0))
+            return username if expires > time.time() else None
+        encoded, expires, signature = (token.split(".") + ["", ""])[:3]
+        try:
+            username = base64.urlsafe_b64decode(encoded.encode()).decode()
+            expires = int(expires)
+        except ValueError:
+            return None
+        if expires <= time.time() or not hmac.compare_digest(signature, self._sign(username, expires)):
+            return None
+        return username
+
+    def categories(self):
+        return {"categories": [{"name": name, "questions": self.question_bank.count(name)}
+                               for name in self.question_bank.names()]}
+
+    def _question(self, session):
+        question, choices, _ = self.engine.current_question(session)
+        return {
+            "index": session.question_index,
+            "total": self.engine.planned_total(session),
+            "question": question,
+            "choices": choices,
+            "remaining": self.engine.remaining(session),
+        }
+
+    def _session(self, user, session_id):
+        session = self.engine.get_session(session_id)
+        if session is None:
+            raise ApiError(404, "No active quiz with this id.")
+        if session.user != user:
+            raise ApiError(403, "This quiz belongs to another user.")
+        return session
+
+    def _finish(self, session):
+        self.timers.cancel(self._idle.pop(session.session_id, None))
+        if session.finished:
+            return self.results.get(session.session_id, (None, None))[1]
+        entry = self.engine.finish(session)
+        self.scores.append(entry)
+        self.results[session.session_id] = (session.user, entry)
+        if len(self.results) > self.max_results:
+            self.results.popitem(last=False)
+        return entry
+
+    def start(self, user, category, difficulty="Medium", timed=True):
+        try:
+            session = self.engine.start_session(user, category, difficulty, timed=timed)
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        self._touch(session)
+        return {"session_id": session.session_id, "time_limit": session.time_limit,
+                "question": self._question(session)}
+
+    def answer(self, user, session_id, choice):
+        session = self._session(user, session_id)
+        if self.engine.is_expired(session):
+            return {"finished": True, "expired": True, "result": self._finish(session)}
+        try:
+            is_correct, correct_idx = self.engine.submit_answer(session, choice)
+        except (ValueError, TypeError) as e:
+            raise ApiError(400, str(e))
+
+        response = {"correct": is_correct, "correct_index": correct_idx, "score": session.score}
+        if session.question_index >= session.total:
+            response.update(finished=True, result=self._finish(session))
+        else:
+            self._touch(session)
+            response.update(finished=False, question=self._question(session))
+        return response
+
+    def _touch(self, session):
+        """Restarts the idle timer of an untimed quiz; timed quizzes end at their deadline anyway."""
+        if session.time_limit:
+            return
+        session_id = session.session_id
+        self.timers.cancel(self._idle.pop(session_id, None))
+        self._idle[session_id] = self.timers.schedule(self.timers.clock() + self.idle_timeout,
+                                                      lambda: self._abandon(session_id))
+
+    def _abandon(self, session_id):
+        self._idle.pop(session_id, None)
+        self.engine.end_session(session_id)
+
+    def result(self, user, session_id):
+        owner, entry = self.results.get(session_id, (None, None))
+        if entry is None:
+            raise ApiError(404, "No finished quiz with this id.")
+        if owner != user:
+            raise ApiError(403, "This quiz belongs to another user.")
+        return entry
+
+    def leaderboard(self, category=None, difficulty=None, page=0, page_size=10):
+        return leaderboard_page(self.scores.leaderboard, category, difficulty, page, page_size)
+
+    def background(self):
+        """Coroutines to run alongside the server."""
+        return [self.run_timers()]
+
+    async def run_timers(self):
+        """Expires timed-out sessions; one task drives every session deadline."""
+        while True:
+            self.timers.advance()
+            await asyncio.sleep(1.0)
+
+
+# HTTP routes: (method, path) -> operation
+ROUTES = {
+    ("POST", "/api/login"): "login",
+    ("GET", "/api/categories"): "categories",
+    ("POST", "/api/quiz/start"): "start",
+    ("POST", "/api/quiz/answer"): "answer",
+    ("GET", "/api/quiz/results"): "results",
+    ("GET", "/api/leaderboard"): "leaderboard",
+}
+INT_PARAMS = ("session_id", "choice", "page", "page_size")
+
+
+class QuizServer:
+    """Minimal HTTP/1.1 (keep-alive) and WebSocket front end for QuizService on asyncio streams."""
+
+    def __init__(self, service):
+        self.service = service
+
+    async def serve(self, host="127.0.0.1", port=8765, **kwargs):
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024, **kwargs)
+        tasks = [asyncio.create_task(coro) for coro in self.service.background()]
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"error": "Request body too large."}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                path, _, query = target.partition("?")
+
+                if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    await self._websocket(reader, writer, headers)
+                    break
+
+                status, payload = await self._handle_http(method, path, query, headers, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_http(self, method, path, query, headers, body):
+        op = ROUTES.get((method, path))
+        if op is None:
+            return 404, {"error": "Not found."}
+        try:
+            params = {k: v[0] for k, v in parse_qs(query).items()}
+            if body:
+                params.update(json.loads(body))
+            for name in INT_PARAMS:
+                if name in params:
+                    params[name] = int(params[name])
+            token = headers.get("authorization", "").removeprefix("Bearer ").strip() or None
+            return 200, await self.service.call(op, params, token)
+        except ApiError as e:
+            return e.status, {"error": str(e)}
+        except (ValueError, TypeError) as e:
+            return 400, {"error": f"Bad request: {e}"}
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _websocket(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+        token = None
+        while True:
+            opcode, payload = await read_frame(reader)
+            if opcode == 0x8:  # close
+                writer.write(encode_frame(0x8, payload[:2]))
+                await writer.drain()
+                return
+            if opcode == 0x9:  # ping
+                writer.write(encode_frame(0xA, payload))
+                await writer.drain()
+                continue
+            if opcode != 0x1:
+                continue
+
+            # Messages are {"id": ..., "op": ..., ...params}; the token from "login" is remembered
+            try:
+                message = json.loads(payload)
+                request_id = message.pop("id", None)
+                op = message.pop("op", None)
+                message.pop("token", None)
+                data = await self.service.call(op, message, token)
+                if op == "login":
+                    token = data["token"]
+                reply = {"id": request_id, "ok": True, "data": data}
+            except ApiError as e:
+                reply = {"id": request_id, "ok": False, "status": e.status, "error": str(e)}
+            except (ValueError, TypeError, AttributeError) as e:
+                reply = {"id": None, "ok": False, "status": 400, "error": f"Bad request: {e}"}
+            writer.write(encode_frame(0x1, json.dumps(reply).encode()))
+            await writer.drain()
+
+
+def _apply_mask(payload, mask):
+    n = len(payload)
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(n, "big")
+
+
+async def read_frame(reader):
+    """Reads one (possibly fragmented) WebSocket message. Returns (opcode, payload)."""
+    opcode, chunks = None, []
+    while True:
+        first, second = await reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            (length,) = struct.unpack("!H", await reader.readexactly(2))
+        elif length == 127:
+            (length,) = struct.unpack("!Q", await reader.readexactly(8))
+        if length > MAX_BODY:
+            raise ValueError("WebSocket frame too large")
+        mask = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(length)
+        if mask:
+            payload = _apply_mask(payload, mask)
+
+        frame_opcode = first & 0x0F
+        if frame_opcode >= 0x8:
+            return frame_opcode, payload  # Control frames are never fragmented
+        if frame_opcode:
+            opcode = frame_opcode
+        chunks.append(payload)
+        if first & 0x80:
+            return opcode, b"".join(chunks)
+
+
+def encode_frame(opcode, payload, mask=False):
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length | (0x80 if mask else 0))
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126 | (0x80 if mask else 0), length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127 | (0x80 if mask else 0), length)
+    if mask:
+        key = secrets.token_bytes(4)
+        return header + key + _apply_mask(payload, key)
+    return header + payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve quizzes over HTTP and WebSocket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--storage", choices=["json", "sqlite"], default=None)
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--question-bank", default=None)
+    parser.add_argument("--pack-cache", action="store_true", help="pre-draw quiz question sets in the background")
+    parser.add_argument("--question-stats", default=None, help="record per-question answer statistics in this file")
+    parser.add_argument("--attempts", default=None, help="keep each quiz's answers in this file for re-scoring")
+    parser.add_argument("--metrics", default=None,
+                        help="record timings and file I/O and export them to this file "
+                             "(JSON if it ends in .json, otherwise Prometheus text)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0, help="seconds between metrics exports")
+    args = parser.parse_args()
+
+    exporter = MetricsExporter(args.metrics, args.metrics_interval) if args.metrics else None
+    storage = open_storage(args.storage, args.db)
+    question_bank = MappedQuestionBank(args.question_bank) if args.question_bank else None
+    packs = PackCache() if args.pack_cache else None
+    stats = QuestionStats(args.question_stats) if args.question_stats else None
+    attempts = AttemptLog(args.attempts) if args.attempts else None
+    service = QuizService(storage, question_bank, packs=packs, stats=stats, attempts=attempts)
+    print(f"Serving quizzes on http://{args.host}:{args.port} (WebSocket at /ws)")
+    try:
+        asyncio.run(QuizServer(service).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.credentials.shutdown()
+        if packs is not None:
+            packs.close()
+        service.engine.adaptive.close()
+        if stats is not None:
+            stats.close()
+        if attempts is not None:
+            attempts.close()
+        service.question_bank.close()
+        storage.close()
+        if exporter is not None:
+            exporter.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import argparse
+import time
+from array import array
+
+from attempt_log import ANSWER_RECORD, INDEX_RECORD, AttemptLog, category_id
+
+try:
+    import numpy as np
+except ImportError:  # Re-scoring falls back to a plain Python loop
+    np = None
+
+# Points per correct answer. "legacy" is the original Quiz_App.py scheme of 3 points per question.
+SCHEMES = {"standard": 1, "legacy": 3}
+
+if np is not None:
+    INDEX_DTYPE = np.dtype([("attempt", "<u4"), ("category", "<u4"), ("offset", "<u8"),
+                            ("count", "<u4"), ("total", "<u4")])
+    ANSWER_DTYPE = np.dtype([("question", "<u4"), ("choice", "i1")])
+    assert INDEX_DTYPE.itemsize == INDEX_RECORD.size and ANSWER_DTYPE.itemsize == ANSWER_RECORD.size
+
+
+def score_matrix(answers, key, points=1):
+    """
+    Scores a dense batch of attempts in one pass: `answers` is an (attempts,
+    questions) array of chosen choice indices, -1 where a question was not
+    answered, and `key` the correct indices, either the same shape or a single
+    row shared by all attempts. Returns each attempt's points. Needs numpy.
+    """
+    return np.count_nonzero(np.asarray(answers) == np.asarray(key), axis=1) * points
+
+
+class AnswerKeys:
+    """The correct choice of every question, in one flat array with an offset per category."""
+
+    def __init__(self, categories):
+        self.keys = array("b")
+        self.offsets = {}       # category id -> (offset, number of questions)
+        for name, category_data in categories.items():
+            answers = category_data.get("answers", [])
+            self.offsets[category_id(name)] = (len(self.keys), len(answers))
+            self.keys.extend(answers)
+
+
+def bank_answer_keys(bank):
+    """AnswerKeys for a question bank, such as a MappedQuestionBank with questions in its overflow area."""
+    return AnswerKeys({name: {"answers": [bank.get(name, idx)[2] for idx in range(bank.count(name))]}
+                       for name in bank.names()})
+
+
+def rescore(log, keys, points=1):
+    """
+    Re-scores every attempt in `log` against the AnswerKeys `keys`. Returns
+    (attempt ids, scores, percentages) for the attempts whose category still
+    exists; answers to questions no longer in the bank count as wrong.
+    """
+    if np is not None:
+        return _rescore_numpy(log, keys, points)
+    return _rescore_python(log, keys, points)
+
+
+def _rescore_numpy(log, keys, points):
+    log.flush()
+    if not log.count or not keys.offsets:
+        return np.zeros(0, np.uint32), np.zeros(0, np.int64), np.zeros(0)
+    index = np.fromfile(log.path, INDEX_DTYPE, count=log.count, offset=log.header_size)
+    answers = np.fromfile(log.answers_path, ANSWER_DTYPE, count=log.answer_count)
+
+    # Attempts whose category is gone are dropped up front
+    known = sorted(keys.offsets)
+    known_ids = np.array(known, dtype=np.uint32)
+    slot = np.searchsorted(known_ids, index["category"])
+    found = slot < len(known)
+    found[found] = known_ids[slot[found]] == index["category"][found]
+    index, slot = index[found], slot[found]
+    if not len(index) or not len(keys.keys):
+        # Nothing to look up: every remaining attempt is in a category with no questions left
+        return index["attempt"], np.zeros(len(index), np.int64), np.zeros(len(index))
+    category_offset = np.array([keys.offsets[c][0] for c in known], dtype=np.int64)[slot]
+    category_size = np.array([keys.offsets[c][1] for c in known], dtype=np.int64)[slot]
+
+    # One row per answer across all attempts: which attempt it belongs to and where it is in the answers file
+    counts = index["count"].astype(np.int64)
+    owner = np.repeat(np.arange(len(index)), counts)
+    starts = np.cumsum(counts) - counts
+    position = np.arange(counts.sum()) - starts[owner] + index["offset"].astype(np.int64)[owner]
+    question = answers["question"][position].astype(np.int64)
+    choice = answers["choice"][position]
+
+    in_bank = question < category_size[owner]
+    key = np.asarray(keys.keys, dtype=np.int8)[np.where(in_bank, category_offset[owner] + question, 0)]
+    correct = np.bincount(owner, weights=in_bank & (choice == key), minlength=len(index)).astype(np.int64)
+
+    total = index["total"].astype(np.int64)
+    percentage = np.divide(correct, total, out=np.zeros(len(index)), where=total > 0) * 100
+    return index["attempt"], correct * points, percentage
+
+
+def _rescore_python(log, keys, points):
+    attempt_ids, categories, offsets, counts, totals, questions, choices = log.read()
+    rescored_ids, scores, percentages = array("I"), array("I"), array("d")
+    key_array = keys.keys
+    for attempt, category, offset, count, total in zip(attempt_ids, categories, offsets, counts, totals):
+        found = keys.offsets.get(category)
+        if found is None:
+            continue
+        base, size = found
+        correct = 0
+        for i in range(offset, offset + count):
+            question = questions[i]
+            if question < size and choices[i] == key_array[base + question]:
+                correct += 1
+        rescored_ids.append(attempt)
+        scores.append(correct * points)
+        percentages.append((correct / total) * 100 if total > 0 else 0)
+    return rescored_ids, scores, percentages
+
+
+def apply_rescore(scores, log, attempt_ids, new_scores, percentages):
+    """
+    Writes attempts of `log` re-scored by rescore() back to a score store
+    and re-ranks its leaderboard. Returns the number changed. Only results
+    recorded through this log match. Stored scores are counts of correct
+    answers out of each entry's total, so `new_scores` must come from the
+    standard scheme.
+    """
+    updates = dict(zip(map(log.key, attempt_ids.tolist()), zip(new_scores.tolist(), percentages.tolist())))
+    return scores.rescore(updates)
+
+
+def report_points(storage, log, attempt_ids, points, scheme, limit=10):
+    """Prints a summary of re-scored points and the `limit` highest results, leaving the stored results alone."""
+    points = points.tolist()
+    if not points:
+        print("No attempts to report")
+        return
+    print(f"{scheme} scheme: {sum(points)} points over {len(points)} attempts, "
+          f"{sum(points) / len(points):.1f} on average (not saved)")
+    entries = {entry.get("attempt"): entry for entry in storage.iter_scores()}
+    best = sorted(zip(attempt_ids.tolist(), points), key=lambda item: -item[1])[:limit]
+    for attempt, score in best:
+        entry = entries.get(log.key(attempt), {})
+        print(f"  {score} points: {entry.get('name', '?')}, {entry.get('category', '?')} "
+              f"({entry.get('difficulty', '?')}), attempt {attempt}")
+
+
+def main():
+    from question_bank import MappedQuestionBank
+    from storage import open_storage
+
+    parser = argparse.ArgumentParser(
+        description="Re-score every logged quiz attempt against the current answer keys.")
+    parser.add_argument("--attempts", default="attempts.bin")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default=None)
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--question-bank", default=None,
+                        help="take the answer keys from this question bank file, as the app and server do")
+    parser.add_argument("--scheme", choices=sorted(SCHEMES), default="standard",
+                        help="points per correct answer: standard 1, legacy 3")
+    parser.add_argument("--dry-run", action="store_true", help="report changes without saving them")
+    parser.add_argument("--limit", type=int, default=10, help="results to list for a report-only scheme")
+    args = parser.parse_args()
+
+    storage = open_storage(args.storage, args.db)
+    log = AttemptLog(args.attempts)
+    try:
+        if args.question_bank:
+            bank = MappedQuestionBank(args.question_bank)
+            try:
+                keys = bank_answer_keys(bank)
+            finally:
+                bank.close()
+        else:
+            keys = AnswerKeys(storage.load_questions() or {})
+        started = time.perf_counter()
+        points = SCHEMES[args.scheme]
+        attempt_ids, new_scores, percentages = rescore(log, keys, points)
+        elapsed = time.perf_counter() - started
+        print(f"Re-scored {len(attempt_ids)} of {log.count} attempts in {elapsed:.2f}s"
+              f"{'' if np is not None else ' (install numpy for faster re-scoring)'}")
+        if points != SCHEMES["standard"]:
+            # Saved results are correct answers out of the questions asked, so other schemes are only reported
+            report_points(storage, log, attempt_ids, new_scores, args.scheme, args.limit)
+        elif args.dry_run:
+            entries = {entry.get("attempt"): entry for entry in storage.iter_scores()}
+            changed = sum(1 for attempt, score, percentage
+                          in zip(map(log.key, attempt_ids.tolist()), new_scores.tolist(), percentages.tolist())
+                          if attempt in entries
+                          and (entries[attempt]["score"], entries[attempt]["percentage"]) != (score, percentage))
+            print(f"{changed} results would change")
+        else:
+            changed = apply_rescore(storage.scores, log, attempt_ids, new_scores, percentages)
+            print(f"Updated {changed} results")
+    finally:
+        log.close()
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import random
+import threading
+from array import array
+from collections import deque
+
+
+class QuestionSampler:
+    """Draws random question orders. Pass a seed to get reproducible quizzes."""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def sample(self, n, k):
+        """
+        Returns k distinct indices from range(n) in random order.
+
+        This is a Fisher-Yates shuffle that stops after k steps and records
+        only the positions it swapped in a dict, so it costs O(k) time and
+        memory however large n is.
+        """
+        k = min(k, n)
+        if k == n:
+            order = list(range(n))
+            self.rng.shuffle(order)
+            return order
+
+        randrange = self.rng.randrange
+        swapped = {}
+        order = []
+        for i in range(k):
+            j = randrange(i, n)
+            order.append(swapped.get(j, j))
+            swapped[j] = swapped.get(i, i)
+        return order
+
+
+class PackCache:
+    """
+    Pre-generated question orders ("packs") for the (category, difficulty)
+    pairs that get played. take() hands out a pack in O(1); a background
+    thread refills a pair once it drops below `low_water`, so busy pairs
+    rarely have to sample on the request path. Packs are tied to the size of
+    the category when they were drawn, and invalidate() drops a category's
+    packs when its questions change. Whole-category orders (k == n) are not
+    cached: `capacity` of them would hold `capacity` copies of the category.
+    """
+
+    def __init__(self, capacity=32, low_water=8, seed=None):
+        self.capacity = capacity
+        self.low_water = low_water
+        # Only the refill thread draws from this sampler
+        self.sampler = QuestionSampler(seed)
+        self.hits = 0
+        self.misses = 0
+        self._packs = {}        # (category, difficulty) -> deque of orders
+        self._shapes = {}       # (category, difficulty) -> (n, k) the packs were drawn for
+        self._wanted = {}       # pairs waiting for a refill, in request order
+        self._lock = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def take(self, category, difficulty, n, k):
+        """Returns a pack of k of range(n) for the pair, or None if none is ready yet or k covers all of n."""
+        if k >= n:
+            return None
+        key = (category, difficulty)
+        with self._lock:
+            if self._shapes.get(key) != (n, k):
+                self._shapes[key] = (n, k)
+                self._packs[key] = deque()
+            packs = self._packs[key]
+            if packs:
+                order = packs.popleft()
+                self.hits += 1
+            else:
+                order = None
+                self.misses += 1
+            if len(packs) < self.low_water and key not in self._wanted:
+                self._wanted[key] = None
+                self._start()
+                self._lock.notify()
+        return order
+
+    def invalidate(self, category):
+        with self._lock:
+            for key in [key for key in self._shapes if key[0] == category]:
+                del self._shapes[key]
+                del self._packs[key]
+                self._wanted.pop(key, None)
+
+    def _start(self):
+        if self._thread is None and not self._closed:
+            self._thread = threading.Thread(target=self._run, name="pack-cache", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._wanted and not self._closed:
+                    self._lock.wait()
+                if self._closed:
+                    return
+                key = next(iter(self._wanted))
+                del self._wanted[key]
+                shape = self._shapes.get(key)
+                if shape is None:
+                    continue
+                missing = self.capacity - len(self._packs[key])
+
+            # Drawn without the lock so take() never waits on a refill
+            orders = [array("I", self.sampler.sample(*shape)) for _ in range(missing)]
+            with self._lock:
+                if self._shapes.get(key) == shape:  # Not invalidated meanwhile
+                    packs = self._packs[key]
+                    packs.extend(orders[:self.capacity - len(packs)])
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
@@ -0,0 +1,159 @@
+import math
+import time
+
+
+class TimerHandle:
+    __slots__ = ("tick", "deadline", "callback", "cancelled")
+
+    def __init__(self, tick, deadline, callback):
+        self.tick = tick
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel for large numbers of coarse deadlines, such as the
+    time limits of many headless quiz sessions. Scheduling and cancelling are
+    O(1); advance() only visits the slots for the ticks that have passed.
+    Deadlines fire on the first advance() at or after them, rounded up to `tick`.
+    """
+
+    def __init__(self, tick=1.0, slots=512, clock=time.monotonic):
+        self.tick = tick
+        self.slots = slots
+        self.clock = clock
+        self._wheel = [[] for _ in range(slots)]
+        self._current = int(clock() // tick)
+        self._pending = 0
+
+    def __len__(self):
+        return self._pending
+
+    def schedule(self, deadline, callback):
+        tick = max(math.ceil(deadline / self.tick), self._current + 1)
+        handle = TimerHandle(tick, deadline, callback)
+        self._wheel[tick % self.slots].append(handle)
+        self._pending += 1
+        return handle
+
+    def cancel(self, handle):
+        # Cancelled handles are dropped lazily when their slot is next visited
+        if handle is not None and not handle.cancelled:
+            handle.cancelled = True
+            self._pending -= 1
+
+    def advance(self, now=None):
+        """Fires every timer that is due at `now`. Returns the number fired."""
+        now = self.clock() if now is None else now
+        target = int(now // self.tick)
+        if target <= self._current:
+            return 0
+
+        due = []
+        steps = min(target - self._current, self.slots)
+        for tick in range(self._current + 1, self._current + 1 + steps):
+            slot = self._wheel[tick % self.slots]
+            if not slot:
+                continue
+            keep = []
+            for handle in slot:
+                if handle.cancelled:
+                    continue
+                if handle.tick <= target:
+                    due.append(handle)
+                else:
+                    keep.append(handle)
+            slot[:] = keep
+        self._current = target
+
+        fired = 0
+        for handle in due:
+            if handle.cancelled:
+                continue  # Cancelled by an earlier callback in this batch
+            handle.cancelled = True
+            self._pending -= 1
+            handle.callback()
+            fired += 1
+        return fired
+
+
+class Countdown:
+    __slots__ = ("deadline", "on_tick", "on_expire")
+
+    def __init__(self, deadline, on_tick, on_expire):
+        self.deadline = deadline
+        self.on_tick = on_tick
+        self.on_expire = on_expire
+
+
+class TkScheduler:
+    """
+    The app's single timer. One root.after chain drives every countdown and
+    the timer wheel. Remaining time is always computed from monotonic
+    deadlines, so late callbacks never accumulate drift, and ticks land on
+    wall-clock second boundaries so all countdowns change together.
+    """
+
+    def __init__(self, root, clock=time.monotonic, wall_clock=time.time):
+        self.root = root
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.wheel = TimerWheel(1.0, clock=clock)
+        self._countdowns = []
+        self._after_id = None
+
+    def countdown(self, deadline, on_tick, on_expire):
+        """Calls on_tick(remaining_seconds) every second until `deadline`, then on_expire()."""
+        countdown = Countdown(deadline, on_tick, on_expire)
+        self._countdowns.append(countdown)
+        on_tick(max(0, deadline - self.clock()))
+        self._reschedule()
+        return countdown
+
+    def schedule(self, deadline, callback):
+        handle = self.wheel.schedule(deadline, callback)
+        self._reschedule()
+        return handle
+
+    def cancel(self, countdown):
+        if countdown in self._countdowns:
+            self._countdowns.remove(countdown)
+
+    def cancel_all(self):
+        """Drops every countdown; called whenever the screen they belong to goes away."""
+        self._countdowns = []
+        if self._after_id is not None and not len(self.wheel):
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _reschedule(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if not self._countdowns and not len(self.wheel):
+            return
+
+        # Next wall-clock second, or sooner if a countdown expires before then
+        delay = 1.0 - (self.wall_clock() % 1.0)
+        now = self.clock()
+        for countdown in self._countdowns:
+            delay = min(delay, max(0.0, countdown.deadline - now))
+        self._after_id = self.root.after(max(1, int(math.ceil(delay * 1000))), self._tick)
+
+    def _tick(self):
+        self._after_id = None
+        now = self.clock()
+        for countdown in list(self._countdowns):
+            if countdown not in self._countdowns:
+                continue  # Cancelled by an earlier callback
+            remaining = countdown.deadline - now
+            if remaining <= 0:
+                self._countdowns.remove(countdown)
+                countdown.on_expire()
+            else:
+                countdown.on_tick(remaining)
+        self.wheel.advance(now)
+        if self._after_id is None:
+            self._reschedule()
@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+import time
+
+from leaderboard import Leaderboard
+from metrics import METRICS
+
+
+class ScoreJournal:
+    """
+    Append-only store for quiz results.
+
+    Each result is appended as one JSON line to the journal file, so recording a
+    completion costs a single small write. The journal is fsync'ed in batches and
+    periodically compacted into the snapshot file, which is always replaced
+    atomically (write to a temp file, fsync, rename). A crash can at worst leave a
+    torn last line in the journal, which is discarded on the next load.
+
+    Every result reaches the OS as soon as it is appended, so only a power loss or
+    OS crash can lose any. A result is fsync'ed by the append that fills a batch of
+    `fsync_every`, or else by a background thread at most `fsync_interval` seconds
+    after the previous sync, so at most that much time's worth of results is at risk.
+    """
+
+    def __init__(self, snapshot_path="scores.json", journal_path="scores.log",
+                 fsync_every=16, fsync_interval=2.0, compact_after=1000, leaderboard=None):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_after = compact_after
+        self.leaderboard = leaderboard if leaderboard is not None else Leaderboard()
+
+        self.entries = []
+        self.last_seq = 0
+        self._journal_len = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Condition(threading.RLock())
+        self._thread = None
+        self._closed = False
+
+        self._load()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    def _load(self):
+        started = time.perf_counter()
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                data = f.read()
+            METRICS.record_io("read", self.snapshot_path, len(data), time.perf_counter() - started)
+            snapshot = json.loads(data)
+        except (FileNotFoundError, ValueError):
+            snapshot = []
+
+        # Older versions stored a plain list of the top 10 scores.
+        if isinstance(snapshot, list):
+            snapshot = {"last_seq": 0, "scores": snapshot}
+        for entry in snapshot.get("scores", []):
+            self._add(entry)
+        self.last_seq = max(self.last_seq, snapshot.get("last_seq", 0))
+
+        self._replay_journal()
+
+    def _replay_journal(self):
+        try:
+            f = open(self.journal_path, "rb")
+        except FileNotFoundError:
+            return
+
+        good_offset = 0
+        with f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Torn write from a crash
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                good_offset += len(line)
+                self._journal_len += 1
+                # Records already folded into the snapshot are skipped, which makes
+                # a crash between compaction's rename and truncate harmless.
+                if record.get("seq", 0) > self.last_seq:
+                    self.last_seq = record["seq"]
+                    self._add(record["entry"])
+
+        if good_offset < os.path.getsize(self.journal_path):
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(good_offset)
+
+    def _add(self, entry):
+        self.entries.append(entry)
+        self.leaderboard.add(entry)
+
+    def append(self, entry):
+        """Records a result. Cost is independent of how many results are stored."""
+        with self._lock:
+            started = time.perf_counter()
+            self.last_seq += 1
+            line = json.dumps({"seq": self.last_seq, "entry": entry}) + "\n"
+            self._journal.write(line)
+            self._journal.flush()
+            METRICS.record_io("write", self.journal_path, len(line), time.perf_counter() - started)
+            self._journal_len += 1
+            self._unsynced += 1
+            self._add(entry)
+
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self.sync()
+            elif self._unsynced == 1:
+                # The first result of a batch: make sure it is synced in time even if no more arrive
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._run, name="score-journal", daemon=True)
+                    self._thread.start()
+                self._lock.notify()
+            if self._journal_len >= self.compact_after:
+                self.compact()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._closed and not self._unsynced:
+                    self._lock.wait()
+                if self._closed:
+                    return
+                due_in = self._last_sync + self.fsync_interval - time.monotonic()
+                if due_in > 0:
+                    self._lock.wait(due_in)
+                    continue
+                try:
+                    self.sync()
+                except OSError:
+                    # Retried after the next interval
+                    self._last_sync = time.monotonic()
+
+    def sync(self):
+        with self._lock:
+            if self._unsynced:
+                os.fsync(self._journal.fileno())
+                self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def compact(self):
+        """Folds the journal into a fresh snapshot and truncates the journal."""
+        with self._lock:
+            self.sync()
+            started = time.perf_counter()
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"last_seq": self.last_seq, "scores": self.entries}, f)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            os.replace(tmp_path, self.snapshot_path)
+            METRICS.record_io("write", self.snapshot_path, size, time.perf_counter() - started)
+
+            self._journal.truncate(0)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal_len = 0
+
+    def rescore(self, updates):
+        """
+        Applies {attempt id: (score, percentage)} to the stored results, then
+        compacts so the new snapshot holds them, and re-ranks the leaderboard.
+        Returns how many results changed.
+        """
+        changed = 0
+        with self._lock:
+            for entry in self.entries:
+                update = updates.get(entry.get("attempt"))
+                if update is not None and (entry["score"], entry["percentage"]) != update:
+                    entry["score"], entry["percentage"] = update
+                    changed += 1
+            if changed:
+                self.compact()
+                self.leaderboard.rebuild(self.entries)
+        return changed
+
+    def top(self, n=10):
+        """Best results first, ties in the order they were recorded."""
+        return self.leaderboard.top(n)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            if not self._journal.closed:
+                self.sync()
+                self._journal.close()
@@ -0,0 +1,519 @@
+import argparse
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from leaderboard import Leaderboard
+from metrics import METRICS
+from score_journal import ScoreJournal
+from write_behind import WriteBehindFile, write_text_atomic
+
+
+def default_questions():
+    """The built-in categories, used until the question bank has any."""
+    return {
+        "Python Basics": {
+            "questions": [
+                "What is the output of: print(2 ** 3)",
+                "Which keyword is used to define a function in Python?",
+                "What does len([1, 2, 3]) return?",
+                "Which of the following is a mutable data type?",
+                "What is the correct way to create a list?"
+            ],
+            "choices": [
+                ["6", "8", "9", "5"],
+                ["function", "def", "define", "func"],
+                ["2", "3", "4", "Error"],
+                ["tuple", "string", "list", "int"],
+                ["list = []", "list = ()", "list = {}", "All correct"]
+            ],
+            "answers": [1, 1, 1, 2, 0]
+        },
+        "Python Advanced": {
+            "questions": [
+                "What is a lambda function?",
+                "Which module is used for regular expressions?",
+                "What does 'self' represent in a class?",
+                "Which decorator is used for static methods?",
+                "What is list comprehension?"
+            ],
+            "choices": [
+                ["Named function", "Anonymous function", "Class method", "Built-in function"],
+                ["regex", "re", "regexp", "regular"],
+                ["Class name", "Instance reference", "Method name", "Variable"],
+                ["@static", "@staticmethod", "@classmethod", "@property"],
+                ["Loop syntax", "Compact way to create lists", "Function type", "Class feature"]
+            ],
+            "answers": [1, 1, 1, 1, 1]
+        }
+    }
+
+
+def seed_default_questions(storage):
+    """Returns storage.load_questions(), first saving the default questions if there are none."""
+    categories = storage.load_questions()
+    if categories is None:
+        categories = default_questions()
+        storage.save_questions(categories)
+    return categories
+
+
+def seed_default_users(storage, users):
+    """
+    Makes sure `users` (as returned by load_users()) has the root admin and
+    the demo account. Only accounts that were added or fixed are saved.
+    Returns their names.
+    """
+    updated_users = []
+
+    # Ensure the root admin user "sai kiran" exists and has the correct role.
+    root_admin_user = "sai kiran"
+    if root_admin_user not in users or users[root_admin_user].get("role") != "root_admin":
+        root_admin_password = "sai123@R"
+        password_hash = hashlib.sha256(root_admin_password.encode()).hexdigest()
+        if root_admin_user not in users:
+            users[root_admin_user] = {}
+        users[root_admin_user]["password"] = password_hash
+        users[root_admin_user]["role"] = "root_admin"
+        updated_users.append(root_admin_user)
+
+    # Ensure a default demo user exists for testing.
+    demo_user_name = "demo"
+    if demo_user_name not in users:
+        demo_user_password = "demo"
+        password_hash = hashlib.sha256(demo_user_password.encode()).hexdigest()
+        users[demo_user_name] = {
+            "password": password_hash, "role": "user"
+        }
+        updated_users.append(demo_user_name)
+
+    for username in updated_users:
+        storage.save_user(username, users[username])
+    return updated_users
+
+
+def _read_file(path):
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        data = f.read()
+    METRICS.record_io("read", path, len(data), time.perf_counter() - started)
+    return data
+
+
+class JsonStorage:
+    """
+    The original storage format: one JSON file each for questions and users, plus
+    the score journal. Question and user changes are written behind (see
+    write_behind.py), so a burst of them costs one rewrite of each file.
+    """
+
+    def __init__(self, questions_file="questions.json", users_file="users.json",
+                 scores_file="scores.json", scores_log="scores.log", flush_every=100, flush_interval=1.0):
+        self.questions_file = questions_file
+        self.users_file = users_file
+        self.scores_file = scores_file
+        self.scores_log = scores_log
+        self.categories = None
+        self.users = None
+        self._scores = None
+        self._questions_source = None
+        self._questions_writer = WriteBehindFile(questions_file, None, flush_every, flush_interval)
+        self._users_writer = WriteBehindFile(users_file, None, flush_every, flush_interval)
+
+    def load_questions(self):
+        """Returns the categories dict, or None if there is no usable question bank."""
+        self._questions_writer.flush()
+        try:
+            categories = json.loads(_read_file(self.questions_file))
+        except (FileNotFoundError, ValueError):
+            return None
+        self._questions_source = None
+        self.categories = self._questions_writer.document = categories
+        return self.categories
+
+    def save_questions(self, categories):
+        with self._questions_writer.changing():
+            self._questions_source = None
+            self.categories = self._questions_writer.document = categories
+
+    def release_questions(self, source):
+        """
+        Drops this storage's copy of the questions once a question bank holds
+        them. Saves then write source() (such as bank.to_categories), and the
+        bank has already appended anything passed to add_question().
+        """
+        self._questions_source = self._questions_writer.document = source
+        self.categories = None
+
+    def add_question(self, category, question, choices, answer):
+        self.add_questions(category, [(question, choices, answer)])
+
+    def add_questions(self, category, questions):
+        """Appends (question, choices, answer) tuples to `category` as a single change."""
+        if self._questions_source is not None:
+            self._questions_writer.changed()
+            return
+        with self._questions_writer.changing():
+            if self.categories is None:
+                self.categories = self._questions_writer.document = {}
+            category_data = self.categories.setdefault(category, {"questions": [], "choices": [], "answers": []})
+            for question, choices, answer in questions:
+                category_data["questions"].append(question)
+                category_data["choices"].append(choices)
+                category_data["answers"].append(answer)
+
+    def load_users(self):
+        """Returns a copy of the users; changes reach the file through save_user()."""
+        self._users_writer.flush()
+        try:
+            users = json.loads(_read_file(self.users_file))
+        except (FileNotFoundError, ValueError):
+            users = {}
+        self.users = self._users_writer.document = users
+        return {username: dict(data) for username, data in users.items()}
+
+    def save_user(self, username, data):
+        with self._users_writer.changing() as users:
+            users[username] = dict(data)
+
+    def flush(self):
+        """Writes any pending question and user changes now."""
+        self._questions_writer.flush()
+        self._users_writer.flush()
+
+    @property
+    def scores(self):
+        if self._scores is None:
+            self._scores = ScoreJournal(self.scores_file, self.scores_log)
+        return self._scores
+
+    def iter_scores(self):
+        return iter(self.scores.entries)
+
+    def close(self):
+        self._questions_writer.close()
+        self._users_writer.close()
+        if self._scores is not None:
+            self._scores.close()
+
+
+class ConnectionPool:
+    """A small fixed-size pool of SQLite connections in WAL mode, shareable across threads."""
+
+    def __init__(self, path, size=4):
+        self.path = path
+        self._connections = []
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            conn = sqlite3.connect(path, timeout=10, check_same_thread=False, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._connections.append(conn)
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            with conn:
+                yield conn
+
+    def close(self):
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    category_id INTEGER NOT NULL REFERENCES categories(id),
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    choices TEXT NOT NULL,
+    answer INTEGER NOT NULL,
+    UNIQUE (category_id, position)
+);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'user',
+    security_question_idx INTEGER,
+    security_answer_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS users_role ON users(role);
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    percentage REAL NOT NULL,
+    category TEXT,
+    difficulty TEXT,
+    date TEXT,
+    attempt INTEGER
+);
+CREATE INDEX IF NOT EXISTS scores_board ON scores(category, difficulty, percentage DESC);
+CREATE INDEX IF NOT EXISTS scores_name ON scores(name);
+"""
+
+# Statements are kept as constants so sqlite3's per-connection statement cache
+# reuses the prepared form instead of re-parsing them.
+SQL_INSERT_CATEGORY = "INSERT OR IGNORE INTO categories (name) VALUES (?)"
+SQL_CATEGORY_ID = "SELECT id FROM categories WHERE name = ?"
+SQL_INSERT_QUESTION = "INSERT INTO questions (category_id, position, text, choices, answer) VALUES (?, ?, ?, ?, ?)"
+SQL_NEXT_POSITION = "SELECT COALESCE(MAX(position) + 1, 0) FROM questions WHERE category_id = ?"
+SQL_ALL_QUESTIONS = ("SELECT c.name, q.text, q.choices, q.answer FROM categories c "
+                     "LEFT JOIN questions q ON q.category_id = c.id ORDER BY c.id, q.position")
+SQL_UPSERT_USER = ("INSERT INTO users (username, password, role, security_question_idx, security_answer_hash) "
+                   "VALUES (?, ?, ?, ?, ?) ON CONFLICT(username) DO UPDATE SET password = excluded.password, "
+                   "role = excluded.role, security_question_idx = excluded.security_question_idx, "
+                   "security_answer_hash = excluded.security_answer_hash")
+SQL_ALL_USERS = "SELECT username, password, role, security_question_idx, security_answer_hash FROM users"
+SQL_INSERT_SCORE = ("INSERT INTO scores (name, score, total, percentage, category, difficulty, date, attempt) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+SQL_ALL_SCORES = "SELECT name, score, total, percentage, category, difficulty, date, attempt FROM scores ORDER BY id"
+SQL_RESCORE = ("UPDATE scores SET score = ?, percentage = ? "
+               "WHERE attempt = ? AND (score != ?1 OR percentage != ?2)")
+
+SCORE_FIELDS = ("name", "score", "total", "percentage", "category", "difficulty", "date", "attempt")
+
+
+def _user_row(username, data):
+    return (username, data["password"], data.get("role", "user"),
+            data.get("security_question_idx"), data.get("security_answer_hash"))
+
+
+class SqliteScores:
+    """Score log backed by the scores table, with the same interface as ScoreJournal."""
+
+    def __init__(self, pool, leaderboard=None):
+        self.pool = pool
+        self.leaderboard = leaderboard if leaderboard is not None else Leaderboard()
+        for entry in self._rows():
+            self.leaderboard.add(entry)
+
+    def _rows(self):
+        with self.pool.connection() as conn:
+            for row in conn.execute(SQL_ALL_SCORES):
+                yield dict(zip(SCORE_FIELDS, row))
+
+    def append(self, entry):
+        with self.pool.transaction() as conn:
+            conn.execute(SQL_INSERT_SCORE, tuple(entry.get(field) for field in SCORE_FIELDS))
+        self.leaderboard.add(entry)
+
+    def rescore(self, updates):
+        """
+        Applies {attempt id: (score, percentage)} to the stored results and
+        re-ranks the leaderboard. Returns how many results changed.
+        """
+        with self.pool.transaction() as conn:
+            changed = conn.executemany(SQL_RESCORE, ((score, percentage, attempt)
+                                                     for attempt, (score, percentage) in updates.items())).rowcount
+        if changed:
+            self.leaderboard.rebuild(self._rows())
+        return changed
+
+    def top(self, n=10):
+        return self.leaderboard.top(n)
+
+    def close(self):
+        pass
+
+
+class SqliteStorage:
+    """
+    Stores questions, users and scores in one SQLite database. Every change is
+    a single-row write, so saves no longer scale with the size of the data and
+    concurrent writers don't overwrite each other's updates.
+    """
+
+    def __init__(self, path="quiz.db", pool_size=4):
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.transaction() as conn:
+            conn.executescript(SCHEMA)
+            # Databases from before attempts were logged have no attempt column yet
+            if "attempt" not in {row[1] for row in conn.execute("PRAGMA table_info(scores)")}:
+                conn.execute("ALTER TABLE scores ADD COLUMN attempt INTEGER")
+            conn.execute("CREATE INDEX IF NOT EXISTS scores_attempt ON scores(attempt)")
+        self.categories = None
+        self.users = None
+        self._scores = None
+
+    def is_empty(self):
+        with self.pool.connection() as conn:
+            return not any(conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+                           for table in ("categories", "users", "scores"))
+
+    def load_questions(self):
+        categories = {}
+        with self.pool.connection() as conn:
+            for name, text, choices, answer in conn.execute(SQL_ALL_QUESTIONS):
+                category_data = categories.setdefault(name, {"questions": [], "choices": [], "answers": []})
+                if text is not None:
+                    category_data["questions"].append(text)
+                    category_data["choices"].append(json.loads(choices))
+                    category_data["answers"].append(answer)
+        if not categories:
+            return None
+        self.categories = categories
+        return categories
+
+    def _category_id(self, conn, category):
+        conn.execute(SQL_INSERT_CATEGORY, (category,))
+        return conn.execute(SQL_CATEGORY_ID, (category,)).fetchone()[0]
+
+    def save_questions(self, categories):
+        self.categories = categories
+        with self.pool.transaction() as conn:
+            conn.execute("DELETE FROM questions")
+            conn.execute("DELETE FROM categories")
+            for category, category_data in categories.items():
+                category_id = self._category_id(conn, category)
+                conn.executemany(SQL_INSERT_QUESTION, (
+                    (category_id, position, text, json.dumps(choices), answer)
+                    for position, (text, choices, answer) in enumerate(zip(
+                        category_data["questions"], category_data["choices"], category_data["answers"]))
+                ))
+
+    def add_question(self, category, question, choices, answer):
+        self.add_questions(category, [(question, choices, answer)])
+
+    def add_questions(self, category, questions):
+        """Appends (question, choices, answer) tuples to `category` in one transaction."""
+        questions = list(questions)
+        with self.pool.transaction() as conn:
+            category_id = self._category_id(conn, category)
+            position = conn.execute(SQL_NEXT_POSITION, (category_id,)).fetchone()[0]
+            conn.executemany(SQL_INSERT_QUESTION, (
+                (category_id, position + i, question, json.dumps(choices), answer)
+                for i, (question, choices, answer) in enumerate(questions)
+            ))
+
+        if self.categories is not None:
+            category_data = self.categories.setdefault(category, {"questions": [], "choices": [], "answers": []})
+            for question, choices, answer in questions:
+                category_data["questions"].append(question)
+                category_data["choices"].append(choices)
+                category_data["answers"].append(answer)
+
+    def release_questions(self, source):
+        """Drops the in-memory copy of the questions once a question bank holds them."""
+        self.categories = None
+
+    def load_users(self):
+        users = {}
+        with self.pool.connection() as conn:
+            for username, password, role, sq_idx, sa_hash in conn.execute(SQL_ALL_USERS):
+                data = {"password": password, "role": role}
+                if sq_idx is not None:
+                    data["security_question_idx"] = sq_idx
+                if sa_hash is not None:
+                    data["security_answer_hash"] = sa_hash
+                users[username] = data
+        self.users = users
+        return users
+
+    def save_user(self, username, data):
+        with self.pool.transaction() as conn:
+            conn.execute(SQL_UPSERT_USER, _user_row(username, data))
+        self.users[username] = data
+
+    @property
+    def scores(self):
+        if self._scores is None:
+            self._scores = SqliteScores(self.pool)
+        return self._scores
+
+    def iter_scores(self):
+        return self.scores._rows()
+
+    def flush(self):
+        pass  # Every change is committed as it is made
+
+    def close(self):
+        self.pool.close()
+
+
+def open_storage(kind=None, db_path=None):
+    """Opens the storage backend selected by `kind` or the QUIZ_STORAGE environment variable."""
+    kind = kind or os.environ.get("QUIZ_STORAGE", "json")
+    if kind == "json":
+        return JsonStorage()
+    if kind == "sqlite":
+        return SqliteStorage(db_path or os.environ.get("QUIZ_DB", "quiz.db"))
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+def migrate_json_to_sqlite(source, target):
+    """One-shot import of the JSON files into an empty SQLite database."""
+    if not target.is_empty():
+        raise ValueError(f"Database '{target.path}' already contains data.")
+
+    categories = source.load_questions() or {}
+    users = source.load_users()
+    target.save_questions(categories)
+    with target.pool.transaction() as conn:
+        conn.executemany(SQL_UPSERT_USER, (_user_row(username, data) for username, data in users.items()))
+        conn.executemany(SQL_INSERT_SCORE, (tuple(entry.get(field) for field in SCORE_FIELDS)
+                                            for entry in source.iter_scores()))
+    return len(categories), len(users)
+
+
+def export_sqlite_to_json(source, target):
+    """Writes the database contents out in the JSON file format."""
+    target.save_questions(source.load_questions() or {})
+    target.users = source.load_users()
+    write_text_atomic(target.users_file, json.dumps(target.users, indent=4))
+    # The exported snapshot replaces any results still pending in the journal. The journal is
+    # emptied first: an export cut short must not leave old results to replay onto the new ones.
+    open(target.scores_log, "w").close()
+    write_text_atomic(target.scores_file, json.dumps(list(source.iter_scores()), indent=4))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move quiz data between the JSON files and SQLite.")
+    parser.add_argument("command", choices=["migrate", "export"],
+                        help="migrate: JSON files -> SQLite; export: SQLite -> JSON files")
+    parser.add_argument("--db", default="quiz.db")
+    parser.add_argument("--questions", default="questions.json")
+    parser.add_argument("--users", default="users.json")
+    parser.add_argument("--scores", default="scores.json")
+    args = parser.parse_args()
+
+    json_storage = JsonStorage(args.questions, args.users, args.scores)
+    sqlite_storage = SqliteStorage(args.db)
+    try:
+        if args.command == "migrate":
+            num_categories, num_users = migrate_json_to_sqlite(json_storage, sqlite_storage)
+            print(f"Imported {num_categories} categories and {num_users} users into {args.db}")
+        else:
+            export_sqlite_to_json(sqlite_storage, json_storage)
+            print(f"Exported {args.db} to {args.questions}, {args.users} and {args.scores}")
+    except ValueError as e:
+        parser.exit(1, f"Error: {e}\n")
+    finally:
+        json_storage.close()
+        sqlite_storage.close()
+
+
+if __name__ == "__main__":
+    main()
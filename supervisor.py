@@ -0,0 +1,523 @@
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import secrets
+import signal
+import socket
+import time
+import zlib
+from urllib.parse import parse_qs, urlencode
+
+from analytics import QuestionStats
+from attempt_log import AttemptLog
+from credentials import CredentialService
+from question_bank import MappedQuestionBank
+from quiz_server import MAX_BODY, STATUS_TEXT, ApiError, QuizServer, QuizService, leaderboard_page
+from sampling import PackCache
+from storage import default_questions, open_storage, seed_default_questions
+
+
+class ForwardedScores:
+    """
+    Worker-side score journal: appends are sent to the store process, and
+    leaderboard pages are fetched from it, since it has every worker's scores.
+    """
+
+    def __init__(self, writes, store_port, host="127.0.0.1"):
+        self.writes = writes
+        self.store_port = store_port
+        self.host = host
+
+    def append(self, entry):
+        self.writes.put(("score", entry))
+
+    async def leaderboard_page(self, params):
+        query = urlencode({name: value for name, value in params.items() if value is not None})
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.store_port)
+        except OSError:
+            raise ApiError(502, "Leaderboard unavailable, please retry.")
+        try:
+            writer.write((f"GET /api/leaderboard?{query} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          "Connection: close\r\n\r\n").encode("latin-1"))
+            await writer.drain()
+            response, _ = await _read_response(reader)
+        except (ConnectionError, asyncio.IncompleteReadError, OSError):
+            raise ApiError(502, "Leaderboard unavailable, please retry.")
+        finally:
+            writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        status, payload = int(head.split()[1]), json.loads(body)
+        if status != 200:
+            raise ApiError(status, payload.get("error", "Leaderboard request failed."))
+        return payload
+
+
+class ForwardedStats(QuestionStats):
+    """
+    Worker-side question statistics. They start from the store process's
+    statistics file, read once when the worker starts, so adaptive quizzes on
+    every worker begin from the same history. Answers are then counted
+    locally, for this worker's adaptive quizzes, and sent to the store
+    process, which keeps the file for all workers.
+    """
+
+    def __init__(self, writes, path=None):
+        super().__init__()
+        self.writes = writes
+        if path:
+            self.load(path)
+
+    def record_answer(self, *args):
+        super().record_answer(*args)
+        self.writes.put(("answer", args))
+
+    def record_quiz(self, *args):
+        super().record_quiz(*args)
+        self.writes.put(("quiz", args))
+
+
+class ForwardedAttempts:
+    """
+    Worker-side attempt log: attempts are appended by the store process.
+    append() returns a placeholder id; the store swaps in the real one when
+    the score entry carrying it arrives, which is always right after.
+    """
+
+    def __init__(self, writes, shard):
+        self.writes = writes
+        self.shard = shard
+        self._keys = itertools.count()
+
+    def append(self, category, questions, choices, total):
+        key = f"pending-{self.shard}-{next(self._keys)}"
+        self.writes.put(("attempt", key, category, questions, choices, total))
+        return key
+
+    def close(self):
+        pass
+
+
+class ShardQuizService(QuizService):
+    """A worker's QuizService; leaderboard requests arriving on its WebSockets go to the store process."""
+
+    async def leaderboard(self, **params):
+        return await self.scores.leaderboard_page(params)
+
+
+class SharedStorage:
+    """
+    A worker's view of the shared stores. Reads come straight from the backend,
+    every write is queued to the single store process that owns it.
+    """
+
+    def __init__(self, kind, db_path, writes, store_port):
+        self._backend = open_storage(kind, db_path)
+        self.writes = writes
+        self.scores = ForwardedScores(writes, store_port)
+
+    def load_questions(self):
+        # The store process saves the defaults to an empty bank before any worker starts
+        return self._backend.load_questions() or default_questions()
+
+    def load_users(self):
+        return self._backend.load_users()
+
+    def release_questions(self, source):
+        self._backend.release_questions(source)
+
+    def save_user(self, username, data):
+        self.writes.put(("user", username, data))
+
+    def add_question(self, category, question, choices, answer):
+        self.writes.put(("question", category, question, choices, answer))
+
+    def close(self):
+        self._backend.close()
+
+
+class StoreService:
+    """
+    The single writer. Applies the writes queued by the workers in arrival
+    order, and serves the leaderboard, which needs every worker's scores.
+    It also owns the question statistics and attempt log files, if any.
+    """
+
+    def __init__(self, storage, writes, stats=None, attempts=None):
+        self.storage = storage
+        self.writes = writes
+        self.scores = storage.scores
+        self.stats = stats
+        self.attempts = attempts
+        self._attempt_ids = {}  # worker placeholder -> attempt id, until its score arrives
+        storage.load_users()
+        seed_default_questions(storage)
+        storage.flush()  # The workers read the questions straight from the backend
+
+    async def call(self, op, params, token=None):
+        if op != "leaderboard":
+            raise ApiError(404, f"Unknown operation: {op}")
+        return leaderboard_page(self.scores.leaderboard, **params)
+
+    def background(self):
+        return []
+
+    def apply(self, item):
+        kind, *args = item
+        if kind == "score":
+            entry = args[0]
+            if "attempt" in entry:
+                attempt = self._attempt_ids.pop(entry["attempt"], None)
+                if attempt is None:
+                    del entry["attempt"]
+                else:
+                    entry["attempt"] = attempt
+            self.scores.append(entry)
+        elif kind == "attempt":
+            key, *attempt = args
+            if self.attempts is not None:
+                self._attempt_ids[key] = self.attempts.append(*attempt)
+        elif kind == "answer":
+            if self.stats is not None:
+                self.stats.record_answer(*args[0])
+        elif kind == "quiz":
+            if self.stats is not None:
+                self.stats.record_quiz(*args[0])
+        elif kind == "user":
+            self.storage.save_user(*args)
+        elif kind == "question":
+            self.storage.add_question(*args)
+
+    async def run(self, host, port):
+        """Serves until the supervisor queues None, after all workers have stopped."""
+        server = asyncio.create_task(QuizServer(self).serve(host, port))
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, self.writes.get)
+            if item is None:
+                break
+            self.apply(item)
+        server.cancel()
+
+
+class Router:
+    """
+    Stateless front end that proxies each request to its worker. Session ids
+    are shard + k * workers, so quiz requests go to the worker holding the
+    session; other requests stick to a worker per user token.
+    """
+
+    def __init__(self, worker_ports, store_port, host="127.0.0.1"):
+        self.worker_ports = worker_ports
+        self.store_port = store_port
+        self.host = host
+        self._next = itertools.count()
+
+    def route(self, path, query, headers, body):
+        if path == "/api/leaderboard":
+            return self.store_port
+        session_id = None
+        try:
+            if path == "/api/quiz/results":
+                session_id = int(parse_qs(query)["session_id"][0])
+            elif path == "/api/quiz/answer":
+                session_id = int(json.loads(body)["session_id"])
+        except (KeyError, ValueError, TypeError):
+            pass  # The worker reports the bad request
+        if session_id is not None:
+            return self.worker_ports[session_id % len(self.worker_ports)]
+        token = headers.get("authorization")
+        if token:
+            return self.worker_ports[zlib.crc32(token.encode("latin-1")) % len(self.worker_ports)]
+        return self.worker_ports[next(self._next) % len(self.worker_ports)]
+
+    async def serve(self, host, port, reuse_port=False):
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024,
+                                            reuse_port=reuse_port or None)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        upstreams = {}  # port -> (reader, writer), kept alive for this client connection
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                raw = [request_line]
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    raw.append(line)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    await _respond(writer, 413, "Request body too large.")
+                    break
+                body = await reader.readexactly(length) if length else b""
+                raw.append(body)
+                path, _, query = request_line.decode("latin-1").split()[1].partition("?")
+
+                if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    # A WebSocket is pinned to one worker, which then holds all of its sessions
+                    await self._tunnel(reader, writer, self.route(path, query, headers, b""), b"".join(raw))
+                    break
+
+                port = self.route(path, query, headers, body)
+                try:
+                    if port not in upstreams:
+                        upstreams[port] = await asyncio.open_connection(self.host, port)
+                    up_reader, up_writer = upstreams[port]
+                    up_writer.write(b"".join(raw))
+                    await up_writer.drain()
+                    response, close = await _read_response(up_reader)
+                except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                    stale = upstreams.pop(port, None)
+                    if stale:
+                        stale[1].close()
+                    await _respond(writer, 502, "Worker unavailable, please retry.")
+                    continue
+                writer.write(response)
+                await writer.drain()
+                if close:
+                    break  # Workers only close when the client asked to
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, IndexError):
+            pass
+        finally:
+            for _, up_writer in upstreams.values():
+                up_writer.close()
+            writer.close()
+
+    async def _tunnel(self, reader, writer, port, handshake):
+        try:
+            up_reader, up_writer = await asyncio.open_connection(self.host, port)
+        except OSError:
+            await _respond(writer, 502, "Worker unavailable, please retry.")
+            return
+        up_writer.write(handshake)
+
+        async def pipe(source, sink):
+            try:
+                while data := await source.read(65536):
+                    sink.write(data)
+                    await sink.drain()
+            except ConnectionError:
+                pass
+            finally:
+                sink.close()
+
+        await asyncio.gather(pipe(reader, up_writer), pipe(up_reader, writer))
+
+
+async def _read_response(reader):
+    """Reads one response from a worker. Returns (raw bytes, whether the worker closes the connection)."""
+    raw = [await reader.readline()]
+    length, close = 0, False
+    while True:
+        line = await reader.readline()
+        raw.append(line)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection":
+            close = value.strip().lower() == "close"
+    raw.append(await reader.readexactly(length))
+    return b"".join(raw), close
+
+
+async def _respond(writer, status, message):
+    body = json.dumps({"error": message}).encode()
+    writer.write((f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def _serve_until(coro, stop):
+    task = asyncio.create_task(coro)
+    while not stop.is_set() and not task.done():
+        await asyncio.sleep(0.2)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+# Process entry points. Children ignore Ctrl-C; the supervisor stops them in order.
+
+def _child_signals():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def run_store(kind, db_path, port, writes, stats_path, attempts_path):
+    _child_signals()
+    storage = open_storage(kind, db_path)
+    stats = QuestionStats(stats_path) if stats_path else None
+    attempts = AttemptLog(attempts_path) if attempts_path else None
+    try:
+        asyncio.run(StoreService(storage, writes, stats, attempts).run("127.0.0.1", port))
+    finally:
+        if stats is not None:
+            stats.close()
+        if attempts is not None:
+            attempts.close()
+        storage.close()
+
+
+def run_worker(shard, num_shards, port, kind, db_path, question_bank_path, token_secret, pack_cache,
+               store_port, stats_path, record_attempts, writes, stop):
+    _child_signals()
+    storage = SharedStorage(kind, db_path, writes, store_port)
+    question_bank = MappedQuestionBank(question_bank_path) if question_bank_path else None
+    # The worker is already its own process, so the KDF runs on threads (hashlib releases the GIL)
+    credentials = CredentialService(use_processes=False)
+    packs = PackCache() if pack_cache else None
+    service = ShardQuizService(storage, question_bank, credentials,
+                               shard=shard, num_shards=num_shards, token_secret=token_secret, packs=packs,
+                               stats=ForwardedStats(writes, stats_path) if stats_path else None,
+                               attempts=ForwardedAttempts(writes, shard) if record_attempts else None)
+    try:
+        asyncio.run(_serve_until(QuizServer(service).serve("127.0.0.1", port), stop))
+    finally:
+        credentials.shutdown()
+        if packs is not None:
+            packs.close()
+        service.engine.adaptive.close()
+        service.question_bank.close()
+        storage.close()
+        # Make sure every queued write reaches the store before exiting
+        writes.close()
+        writes.join_thread()
+
+
+def run_router(host, port, worker_ports, store_port, reuse_port, stop):
+    _child_signals()
+    router = Router(worker_ports, store_port)
+    asyncio.run(_serve_until(router.serve(host, port, reuse_port), stop))
+
+
+def wait_for_ports(ports, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    for port in ports:
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1.0).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Worker on port {port} did not start")
+                time.sleep(0.05)
+
+
+class Supervisor:
+    """
+    Runs the quiz server as one store process, `workers` quiz worker processes
+    and `routers` router processes, restarting workers and routers that die.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.store_port = args.internal_port
+        self.worker_ports = [args.internal_port + 1 + i for i in range(args.workers)]
+        self.token_secret = secrets.token_bytes(32)
+        self.writes = multiprocessing.Queue()
+        self.stop = multiprocessing.Event()
+        self.store = None
+        self.workers = []
+        self.routers = []
+
+    def _start_worker(self, shard):
+        args = self.args
+        process = multiprocessing.Process(
+            target=run_worker, name=f"quiz-worker-{shard}", daemon=True,
+            args=(shard, args.workers, self.worker_ports[shard], args.storage, args.db,
+                  args.question_bank, self.token_secret, args.pack_cache, self.store_port,
+                  args.question_stats, bool(args.attempts), self.writes, self.stop))
+        process.start()
+        return process
+
+    def _start_router(self, index):
+        args = self.args
+        process = multiprocessing.Process(
+            target=run_router, name=f"quiz-router-{index}", daemon=True,
+            args=(args.host, args.port, self.worker_ports, self.store_port, args.routers > 1, self.stop))
+        process.start()
+        return process
+
+    def run(self):
+        self.store = multiprocessing.Process(target=run_store, name="quiz-store",
+                                             args=(self.args.storage, self.args.db, self.store_port, self.writes,
+                                                   self.args.question_stats, self.args.attempts))
+        self.store.start()
+        # Once the store is serving, the question bank has been seeded for the workers to load
+        wait_for_ports([self.store_port])
+        self.workers = [self._start_worker(shard) for shard in range(self.args.workers)]
+        wait_for_ports(self.worker_ports)
+        self.routers = [self._start_router(i) for i in range(self.args.routers)]
+        # Stop gracefully on SIGTERM as well as Ctrl-C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        print(f"Serving quizzes on http://{self.args.host}:{self.args.port} with {self.args.workers} workers "
+              f"and {self.args.routers} router(s) (WebSocket at /ws)")
+        try:
+            while True:
+                time.sleep(1.0)
+                for shard, process in enumerate(self.workers):
+                    if not process.is_alive():
+                        # Its in-flight quizzes are lost; new ones land on the restarted worker
+                        print(f"Worker {shard} exited with {process.exitcode}, restarting")
+                        self.workers[shard] = self._start_worker(shard)
+                for i, process in enumerate(self.routers):
+                    if not process.is_alive():
+                        self.routers[i] = self._start_router(i)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self.stop.set()
+        for process in self.routers + self.workers:
+            process.join(timeout=10)
+        # Every worker has flushed its writes, so the store can drain and close
+        self.writes.put(None)
+        self.store.join(timeout=30)
+        for process in self.routers + self.workers + [self.store]:
+            if process.is_alive():
+                process.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve quizzes from several worker processes behind a router.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--routers", type=int, default=1,
+                        help="router processes sharing --port (more than one needs SO_REUSEPORT)")
+    parser.add_argument("--internal-port", type=int, default=9100,
+                        help="first of the loopback ports used by the store and the workers")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default=None)
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--question-bank", default=None)
+    parser.add_argument("--pack-cache", action="store_true", help="pre-draw quiz question sets in the background")
+    parser.add_argument("--question-stats", default=None, help="record per-question answer statistics in this file")
+    parser.add_argument("--attempts", default=None, help="keep each quiz's answers in this file for re-scoring")
+    args = parser.parse_args()
+    if args.routers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        parser.error("--routers > 1 needs SO_REUSEPORT, which this platform lacks")
+    Supervisor(args).run()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,57 @@
+import time
+
+from adaptive import AdaptiveSelector
+from analytics import QuestionStats
+from question_bank import CompactQuestionBank
+
+
+def make_bank(size=20):
+    return CompactQuestionBank({"Math": {"questions": [f"Q{i}" for i in range(size)],
+                                         "choices": [["A", "B"]] * size, "answers": [0] * size}})
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_index_is_built_on_the_calling_thread_without_background():
+    selector = AdaptiveSelector(make_bank(), QuestionStats(), seed=1, background=False)
+    assert selector.index("Math") is not None
+    state, first = selector.start("Math")
+    assert 0 <= first < 20 and state.asked == {first}
+
+
+def test_picks_fall_back_to_random_until_the_background_build_is_done():
+    selector = AdaptiveSelector(make_bank(), QuestionStats(), seed=1)
+    try:
+        state, first = selector.start("Math")
+        assert 0 <= first < 20
+        assert wait_for(lambda: selector.index("Math") is not None)
+    finally:
+        selector.close()
+
+
+def test_a_failed_rebuild_is_logged_and_the_thread_keeps_running(caplog):
+    selector = AdaptiveSelector(make_bank(), QuestionStats(), seed=1)
+    rebuild, failures = selector._rebuild, []
+
+    def flaky_rebuild(category):
+        if not failures:
+            failures.append(category)
+            raise ValueError("bank and statistics disagree")
+        rebuild(category)
+
+    selector._rebuild = flaky_rebuild
+    try:
+        assert selector.index("Math") is None
+        assert wait_for(lambda: failures and not selector._wanted)
+        assert "Could not rebuild the difficulty index of 'Math'" in caplog.text
+        assert selector._thread.is_alive()
+        # The next request queues the category again and the rebuild goes through
+        selector.index("Math")
+        assert wait_for(lambda: selector.index("Math") is not None)
+    finally:
+        selector.close()
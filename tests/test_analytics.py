@@ -0,0 +1,69 @@
+import pytest
+
+from analytics import QuestionStats
+
+
+def test_answers_are_counted_per_question():
+    stats = QuestionStats()
+    stats.record_answer("Math", 2, 1, 4, True, 3.0)
+    stats.record_answer("Math", 2, 3, 4, False, 5.0)
+    stats.record_answer("Math", 2, 1, 4, True, 1.0)
+    row = stats.question("Math", 2)
+    assert row["attempts"] == 3
+    assert row["difficulty"] == pytest.approx(2 / 3)
+    assert row["mean_time"] == pytest.approx(3.0)
+    assert row["choices"] == [0, 2, 0, 1]
+    assert stats.question("Math", 0)["attempts"] == 0
+    assert stats.question("Art", 0) == {"attempts": 0, "difficulty": None, "mean_time": None, "choices": [],
+                                        "discrimination": None}
+    assert stats.recorded("Math") == 3 and stats.recorded("Art") == 0
+
+
+def test_more_choices_widen_every_questions_counters():
+    stats = QuestionStats()
+    stats.record_answer("Math", 0, 3, 4, True, 1.0)
+    stats.record_answer("Math", 1, 5, 6, False, 1.0)
+    assert stats.question("Math", 0)["choices"] == [0, 0, 0, 1, 0, 0]
+    assert stats.question("Math", 1)["choices"] == [0, 0, 0, 0, 0, 1]
+
+
+def test_discrimination_is_positive_when_strong_players_answer_correctly():
+    stats = QuestionStats()
+    # Question 0 is answered correctly by those who did well on the rest of the quiz
+    for correct in ([1, 1, 1, 1], [1, 1, 1, 0], [0, 0, 1, 0], [0, 0, 0, 1], [1, 1, 0, 1], [0, 1, 0, 0]):
+        stats.record_quiz("Math", [0, 1, 2, 3], correct, 4)
+    assert stats.question("Math", 0)["discrimination"] > 0.3
+    # A single-question quiz says nothing about discrimination
+    stats.record_quiz("Math", [5], [1], 1)
+    assert len(stats.categories["Math"]) == 4
+
+
+def test_discrimination_needs_both_outcomes():
+    stats = QuestionStats()
+    stats.record_quiz("Math", [0, 1], [1, 0], 2)
+    stats.record_quiz("Math", [0, 1], [1, 1], 2)
+    assert stats.question("Math", 0)["discrimination"] is None
+
+
+def test_report_filters_by_attempts():
+    stats = QuestionStats()
+    for _ in range(3):
+        stats.record_answer("Math", 0, 0, 4, True, 1.0)
+    stats.record_answer("Math", 1, 0, 4, True, 1.0)
+    assert [idx for idx, _ in stats.report("Math", min_attempts=2)] == [0]
+    assert list(stats.report("Art")) == []
+
+
+def test_counters_are_saved_and_restored(tmp_path):
+    path = str(tmp_path / "question_stats.json")
+    stats = QuestionStats(path)
+    stats.record_answer("Math", 1, 2, 4, True, 2.5)
+    stats.record_quiz("Math", [0, 1], [0, 1], 2)
+    stats.close()
+
+    restored = QuestionStats(path)
+    assert restored.question("Math", 1) == stats.question("Math", 1)
+    assert restored.categories["Math"].scored.tolist() == [1, 1]
+    # Answers recorded before this process started don't count as recent
+    assert restored.recorded("Math") == 0
+    restored.close()
@@ -0,0 +1,50 @@
+import pytest
+
+from checkpoint import CheckpointWriter, decode_session, encode_session
+from question_bank import CompactQuestionBank
+from quiz_engine import QuizEngine
+from sampling import QuestionSampler
+
+
+def make_session():
+    bank = CompactQuestionBank({"Math": {"questions": [f"Q{i}" for i in range(8)],
+                                         "choices": [["A", "B", "C", "D"]] * 8,
+                                         "answers": [i % 4 for i in range(8)]}})
+    engine = QuizEngine(bank, clock=lambda: 100.0, sampler=QuestionSampler(5))
+    session = engine.start_session("zoë", "Math", "Easy")
+    engine.submit_answer(session, 1)
+    return engine, session
+
+
+def test_encode_decode_round_trip():
+    _, session = make_session()
+    checkpoint = decode_session(encode_session(session, 12.5))
+    assert (checkpoint.user, checkpoint.category, checkpoint.difficulty) == ("zoë", "Math", "Easy")
+    assert list(checkpoint.order) == list(session.order)
+    assert list(checkpoint.answers) == [1]
+    assert (checkpoint.question_index, checkpoint.score, checkpoint.remaining) == (1, session.score, 12.5)
+    assert decode_session(encode_session(session, None)).remaining is None
+
+
+def test_damaged_checkpoint_is_rejected():
+    _, session = make_session()
+    data = bytearray(encode_session(session, 10.0))
+    data[10] ^= 0xFF
+    with pytest.raises(ValueError):
+        decode_session(bytes(data))
+    with pytest.raises(ValueError):
+        decode_session(b"QZC1")
+
+
+def test_writer_creates_its_directory_on_first_save(tmp_path):
+    directory = tmp_path / "checkpoints"
+    writer = CheckpointWriter(str(directory), min_interval=0)
+    assert not directory.exists()
+    engine, session = make_session()
+    writer.save(engine, session)
+    writer.flush()
+    assert writer.load("zoë").question_index == 1
+    writer.discard("zoë")
+    writer.flush()
+    assert writer.load("zoë") is None
+    writer.close()
@@ -0,0 +1,57 @@
+from dedup import DuplicateIndex, MinHasher, duplicate_report, normalize, shingles
+from question_bank import CompactQuestionBank
+
+QUESTION = "Which keyword is used to define a function in Python?"
+CHOICES = ["function", "def", "define", "func"]
+
+
+def test_exact_duplicates_ignore_case_whitespace_and_choice_order():
+    index = DuplicateIndex()
+    assert index.add(("Python", 0), "Python", QUESTION, CHOICES) == (None, [])
+    exact, _ = index.check("Python", "  which KEYWORD is used to define a function   in python?",
+                           list(reversed(CHOICES)))
+    assert exact == ("Python", 0)
+
+
+def test_duplicates_are_only_found_within_a_category():
+    index = DuplicateIndex()
+    index.add(("Python", 0), "Python", QUESTION, CHOICES)
+    assert index.check("Go", QUESTION, CHOICES) == (None, [])
+
+
+def test_near_duplicates_are_found_and_unrelated_questions_are_not():
+    index = DuplicateIndex()
+    index.add(("Python", 0), "Python", QUESTION, CHOICES)
+    index.add(("Python", 1), "Python", "What does len([1, 2, 3]) return?", ["2", "3", "4", "Error"])
+    exact, similar = index.check("Python", "Which keyword is used to define a function in Python 3?", CHOICES)
+    assert exact is None
+    assert [ref for ref, _ in similar] == [("Python", 0)]
+    assert 0.7 <= similar[0][1] <= 1.0
+    assert index.check("Python", "Which module is used for regular expressions?",
+                       ["regex", "re", "regexp", "regular"]) == (None, [])
+
+
+def test_exact_only_index_skips_signatures():
+    index = DuplicateIndex(near=False)
+    index.add(("Python", 0), "Python", QUESTION, CHOICES)
+    assert index.signatures == {}
+    assert index.check("Python", QUESTION + " 3", CHOICES) == (None, [])
+
+
+def test_minhash_similarity_tracks_shingle_overlap():
+    hasher = MinHasher(num_perm=64)
+    first = hasher.signature(shingles(QUESTION, CHOICES))
+    assert MinHasher.similarity(first, hasher.signature(shingles(QUESTION, CHOICES))) == 1.0
+    other = hasher.signature(shingles("What is list comprehension?", ["Loop syntax", "Function type"]))
+    assert MinHasher.similarity(first, other) < 0.3
+    assert normalize("  A\tb  C ") == "a b c"
+
+
+def test_duplicate_report_groups_a_bank():
+    bank = CompactQuestionBank({"Python": {
+        "questions": [QUESTION, QUESTION.upper(), QUESTION.replace("Python", "Python 3"), "What is PEP 8?"],
+        "choices": [CHOICES, CHOICES, CHOICES, ["A style guide", "A module", "A keyword", "A type"]],
+        "answers": [1, 1, 1, 0]}})
+    exact_groups, near_pairs = duplicate_report(bank)
+    assert exact_groups == {("Python", 0): [("Python", 1)]}
+    assert [(ref, similar) for ref, similar, _ in near_pairs] == [(("Python", 2), ("Python", 0))]
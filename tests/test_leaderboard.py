@@ -0,0 +1,66 @@
+from leaderboard import Leaderboard
+
+
+def result(name, percentage, category="Math", difficulty="Easy"):
+    return {"name": name, "percentage": percentage, "category": category, "difficulty": difficulty}
+
+
+def names(entries):
+    return [entry["name"] for entry in entries]
+
+
+def test_results_are_ranked_best_first_with_ties_in_recorded_order():
+    board = Leaderboard()
+    for entry in (result("ann", 60), result("bob", 90), result("cy", 60), result("dee", 75)):
+        board.add(entry)
+    assert names(board.top(10)) == ["bob", "dee", "ann", "cy"]
+    assert board.rank("ann") == 3
+    assert board.rank("nobody") is None
+
+
+def test_results_land_on_every_board_they_belong_to():
+    board = Leaderboard()
+    board.add(result("ann", 80, "Math", "Easy"))
+    board.add(result("bob", 70, "Math", "Hard"))
+    board.add(result("cy", 90, "Art", "Easy"))
+    assert names(board.top(10, "Math")) == ["ann", "bob"]
+    assert names(board.top(10, difficulty="Easy")) == ["cy", "ann"]
+    assert names(board.top(10, "Math", "Hard")) == ["bob"]
+    assert names(board.top(10)) == ["cy", "ann", "bob"]
+    assert board.categories() == ["Art", "Math"]
+    assert board.top(10, "Music") == []
+
+
+def test_boards_keep_only_the_best_capacity_results():
+    board = Leaderboard(capacity=3)
+    for i, percentage in enumerate((50, 40, 90, 70, 30)):
+        board.add(result(f"user{i}", percentage))
+    assert names(board.top(10)) == ["user2", "user3", "user0"]
+    # Evicted, and a result too low to get on the board, are not ranked
+    assert board.rank("user1") is None
+    assert board.rank("user4") is None
+
+
+def test_rank_follows_the_users_best_result_through_evictions():
+    board = Leaderboard(capacity=3)
+    board.add(result("ann", 50))
+    board.add(result("ann", 40))
+    board.add(result("bob", 60))
+    assert board.rank("ann") == 2
+    board.add(result("cy", 70))     # evicts ann's 40, her 50 stays
+    assert board.rank("ann") == 3
+    board.add(result("dee", 80))    # evicts ann's 50, the last of hers
+    assert board.rank("ann") is None
+    assert board.rank("bob") == 3
+
+
+def test_pages_and_rebuild():
+    board = Leaderboard()
+    entries = [result(f"user{i}", i) for i in range(25)]
+    board.rebuild(entries)
+    assert board.page_count(page_size=10) == 3
+    assert names(board.page(2, page_size=10)) == ["user4", "user3", "user2", "user1", "user0"]
+    assert board.page(3, page_size=10) == []
+    entries[0]["percentage"] = 100
+    board.rebuild(entries)
+    assert board.rank("user0") == 1
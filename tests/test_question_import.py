@@ -0,0 +1,120 @@
+import io
+import json
+
+import pytest
+
+import question_import
+from question_import import QuestionImporter, import_file, read_csv, read_json, read_jsonl
+from storage import JsonStorage
+
+
+class Trickle(io.StringIO):
+    """Hands out at most `size` characters per read, so values straddle chunk boundaries."""
+
+    def __init__(self, text, size=7):
+        super().__init__(text)
+        self.size = size
+
+    def read(self, n=-1):
+        return super().read(self.size if n < 0 else min(n, self.size))
+
+
+def record(i, category="Math"):
+    return {"category": category, "question": f"What is {i} + {i}?",
+            "choices": [str(2 * i), str(2 * i + 1), str(2 * i + 2), str(2 * i + 3)], "answer": 0}
+
+
+def layout(records):
+    categories = {}
+    for r in records:
+        data = categories.setdefault(r["category"], {"questions": [], "choices": [], "answers": []})
+        data["questions"].append(r["question"])
+        data["choices"].append(r["choices"])
+        data["answers"].append(r["answer"])
+    return categories
+
+
+def test_json_list_is_read_across_chunk_boundaries():
+    records = [record(i) for i in range(30)] + [dict(record(99), answer=123456789)]
+    assert [r for _, r in read_json(Trickle(json.dumps(records)))] == records
+
+
+def test_questions_json_layout_is_read_record_by_record():
+    records = [record(i) for i in range(5)] + [record(i, "Art") for i in range(3)]
+    categories = layout(records)
+    categories["Art"]["notes"] = {"skipped": [1, 2]}
+    read = list(read_json(Trickle(json.dumps(categories, indent=2), size=5)))
+    assert [r for _, r in read] == records
+    assert [position for position, _ in read][:2] == ["Math#1", "Math#2"]
+
+
+def test_arrays_in_any_order_and_short_arrays():
+    text = json.dumps({"Math": {"answers": [0, 1], "questions": ["Q1", "Q2", "Q3"], "choices": [["a", "b"]]}})
+    read = [r for _, r in read_json(Trickle(text))]
+    assert [(r["question"], r["choices"], r["answer"]) for r in read] == \
+        [("Q1", ["a", "b"], 0), ("Q2", None, 1), ("Q3", None, None)]
+
+
+def test_torn_json_raises_after_the_complete_records():
+    text = json.dumps([record(1), record(2)])[:-40]
+    reader = read_json(Trickle(text))
+    assert next(reader)[1] == record(1)
+    with pytest.raises(ValueError):
+        list(reader)
+
+
+def test_oversized_json_value_is_rejected(monkeypatch):
+    monkeypatch.setattr(question_import, "MAX_RECORD_CHARS", 300)
+    text = json.dumps([record(1), dict(record(2), question="x" * 2000)])
+    reader = read_json(Trickle(text, size=64))
+    assert next(reader)[1] == record(1)
+    with pytest.raises(ValueError, match="too large"):
+        list(reader)
+
+
+def test_jsonl_reports_a_torn_line_as_an_invalid_record():
+    text = json.dumps(record(1)) + "\n\n" + json.dumps(record(2))[:-5]
+    read = list(read_jsonl(io.StringIO(text)))
+    assert read[0] == (1, record(1))
+    assert read[1][0] == 3 and isinstance(read[1][1], question_import.InvalidRecord)
+
+
+def test_csv_choice_columns_and_choices_column():
+    columns = "category,question,choice_a,choice_b,answer\nMath,One?,1,2,A\n,,,,\nMath,Two?,2,3,1\n"
+    assert [r for _, r in read_csv(io.StringIO(columns))] == [
+        {"category": "Math", "question": "One?", "choices": ["1", "2"], "answer": "A"},
+        {"category": "Math", "question": "Two?", "choices": ["2", "3"], "answer": "1"}]
+    joined = "Category,Question,Choices,Answer\nMath,One?,1|2|3,C\n"
+    assert next(read_csv(io.StringIO(joined)))[1]["choices"] == ["1", "2", "3"]
+    with pytest.raises(ValueError):
+        next(read_csv(io.StringIO("question,answer\n")))
+
+
+def test_importer_validates_skips_duplicates_and_saves_in_batches(tmp_path):
+    storage = JsonStorage(str(tmp_path / "questions.json"), str(tmp_path / "users.json"),
+                          str(tmp_path / "scores.json"), str(tmp_path / "scores.log"))
+    storage.save_questions(layout([record(0)]))
+    path = tmp_path / "new.jsonl"
+    lines = [record(0), record(1), dict(record(2), answer="D"), record(1),
+             dict(record(3), answer=7), dict(record(4), choices=["a", "a", "b", "c"]), record(5)]
+    path.write_text("\n".join(json.dumps(line) for line in lines) + "\n")
+
+    importer = QuestionImporter(storage, batch_size=2)
+    import_file(importer, str(path))
+    assert (importer.read, importer.imported, importer.duplicates, importer.error_count) == (7, 3, 2, 2)
+    assert importer.errors == ["new.jsonl:5: answer 7 is out of range for 4 choices", "new.jsonl:6: duplicate choices"]
+    storage.close()
+
+    saved = JsonStorage(str(tmp_path / "questions.json")).load_questions()["Math"]
+    assert saved["questions"] == ["What is 0 + 0?", "What is 1 + 1?", "What is 2 + 2?", "What is 5 + 5?"]
+    assert saved["answers"] == [0, 0, 3, 0]
+
+
+def test_strict_import_stops_at_the_first_invalid_record(tmp_path):
+    storage = JsonStorage(str(tmp_path / "questions.json"), str(tmp_path / "users.json"))
+    importer = QuestionImporter(storage, strict=True, dry_run=True)
+    importer.add("first", record(1))
+    with pytest.raises(question_import.InvalidRecord, match="second: missing question"):
+        importer.add("second", dict(record(2), question=" "))
+    importer.flush()
+    assert importer.imported == 1
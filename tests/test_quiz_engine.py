@@ -0,0 +1,200 @@
+import pytest
+
+from analytics import QuestionStats
+from checkpoint import decode_session, encode_session
+from question_bank import CompactQuestionBank
+from quiz_engine import NUM_QUESTIONS, TIME_PER_QUESTION, QuizEngine
+from sampling import PackCache, QuestionSampler
+from scheduler import TimerWheel
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_bank(size=12):
+    return CompactQuestionBank({
+        "Math": {"questions": [f"Question {i}" for i in range(size)],
+                 "choices": [["A", "B", "C", "D"] for _ in range(size)],
+                 "answers": [i % 4 for i in range(size)]},
+        "Empty": {"questions": [], "choices": [], "answers": []},
+    })
+
+
+def make_engine(seed=7, **kwargs):
+    return QuizEngine(make_bank(), clock=kwargs.pop("clock", FakeClock()), sampler=QuestionSampler(seed), **kwargs)
+
+
+def correct_choice(engine, session):
+    return engine.current_question(session)[2]
+
+
+def test_start_session_draws_distinct_questions_per_difficulty():
+    engine = make_engine()
+    for difficulty, expected in (("Easy", NUM_QUESTIONS["Easy"]), ("Medium", NUM_QUESTIONS["Medium"]), ("Hard", 12)):
+        session = engine.start_session("ann", "Math", difficulty)
+        assert session.total == expected
+        assert len(set(session.order)) == expected
+        assert all(0 <= idx < 12 for idx in session.order)
+        assert session.time_limit == expected * TIME_PER_QUESTION[difficulty]
+        assert engine.get_session(session.session_id) is session
+
+
+def test_start_session_is_reproducible_with_a_seed():
+    first = make_engine(seed=3).start_session("ann", "Math", "Medium")
+    second = make_engine(seed=3).start_session("ann", "Math", "Medium")
+    assert list(first.order) == list(second.order)
+
+
+def test_start_session_rejects_an_empty_category():
+    with pytest.raises(ValueError):
+        make_engine().start_session("ann", "Empty")
+    with pytest.raises(ValueError):
+        make_engine().start_session("ann", "Missing")
+
+
+def test_untimed_session_has_no_deadline():
+    engine = make_engine()
+    session = engine.start_session("ann", "Math", "Easy", timed=False)
+    assert session.time_limit == 0
+    assert engine.deadline(session) is None
+    assert engine.remaining(session) is None
+    assert not engine.is_expired(session)
+
+
+def test_submit_answer_scores_and_advances():
+    engine = make_engine()
+    session = engine.start_session("ann", "Math", "Easy")
+    answer = correct_choice(engine, session)
+    assert engine.submit_answer(session, answer) == (True, answer)
+    wrong = (correct_choice(engine, session) + 1) % 4
+    assert engine.submit_answer(session, wrong) == (False, (wrong + 3) % 4)
+    assert session.question_index == 2
+    assert session.score == 1
+    assert list(session.answers) == [answer, wrong]
+    assert list(session.correct) == [1, 0]
+
+
+def test_submit_answer_rejects_bad_choices_and_answers_after_the_end():
+    engine = make_engine()
+    session = engine.start_session("ann", "Math", "Easy")
+    for choice in (-1, 4):
+        with pytest.raises(ValueError):
+            engine.submit_answer(session, choice)
+    assert session.question_index == 0
+    while not engine.is_complete(session):
+        engine.submit_answer(session, 0)
+    with pytest.raises(ValueError):
+        engine.submit_answer(session, 0)
+
+
+def test_finish_returns_the_score_entry_and_ends_the_session():
+    engine = make_engine()
+    session = engine.start_session("ann", "Math", "Easy")
+    for i in range(session.total):
+        engine.submit_answer(session, correct_choice(engine, session) if i < 3 else (correct_choice(engine, session) + 1) % 4)
+    entry = engine.finish(session)
+    assert entry["name"] == "ann"
+    assert (entry["score"], entry["total"], entry["percentage"]) == (3, 5, 60.0)
+    assert (entry["category"], entry["difficulty"]) == ("Math", "Easy")
+    assert session.finished
+    assert engine.get_session(session.session_id) is None
+
+
+def test_finish_records_statistics_once():
+    stats = QuestionStats()
+    engine = make_engine(stats=stats)
+    session = engine.start_session("ann", "Math", "Easy")
+    engine.submit_answer(session, correct_choice(engine, session))
+    engine.finish(session)
+    engine.finish(session)
+    first = session.order[0]
+    assert stats.question("Math", first)["attempts"] == 1
+    assert stats.categories["Math"].scored[first] == 1
+
+
+def test_timer_expiry_calls_on_expire_at_the_deadline():
+    clock = FakeClock()
+    timers = TimerWheel(1.0, clock=clock)
+    expired = []
+    engine = make_engine(clock=clock, timers=timers, on_expire=expired.append)
+    session = engine.start_session("ann", "Math", "Easy")
+    limit = session.time_limit
+
+    clock.now += limit - 1
+    timers.advance()
+    assert expired == []
+    assert engine.remaining(session) == 1
+    assert not engine.is_expired(session)
+
+    clock.now += 1
+    timers.advance()
+    assert expired == [session]
+    assert engine.is_expired(session)
+    assert engine.is_complete(session)
+    assert not session.timer_running
+
+
+def test_finished_session_does_not_expire():
+    clock = FakeClock()
+    timers = TimerWheel(1.0, clock=clock)
+    expired = []
+    engine = make_engine(clock=clock, timers=timers, on_expire=expired.append)
+    session = engine.start_session("ann", "Math", "Easy")
+    engine.finish(session)
+    clock.now += session.time_limit + 5
+    timers.advance()
+    assert expired == []
+    assert len(timers) == 0
+
+
+def test_resume_session_restores_progress_and_remaining_time():
+    clock = FakeClock()
+    engine = make_engine(clock=clock)
+    session = engine.start_session("ann", "Math", "Medium")
+    engine.submit_answer(session, correct_choice(engine, session))
+    engine.submit_answer(session, (correct_choice(engine, session) + 1) % 4)
+    clock.now += 40
+    checkpoint = decode_session(encode_session(session, engine.remaining(session)))
+
+    later = FakeClock(5000.0)
+    timers = TimerWheel(1.0, clock=later)
+    expired = []
+    other = make_engine(clock=later, timers=timers, on_expire=expired.append)
+    resumed = other.resume_session(checkpoint)
+    assert resumed.user == "ann"
+    assert list(resumed.order) == list(session.order)
+    assert list(resumed.answers) == list(session.answers)
+    assert (resumed.question_index, resumed.score) == (2, 1)
+    assert other.remaining(resumed) == session.time_limit - 40
+    assert other.current_question(resumed) == engine.current_question(session)
+
+    later.now += session.time_limit - 40
+    timers.advance()
+    assert expired == [resumed]
+
+
+def test_resume_session_rejects_a_changed_bank():
+    engine = make_engine()
+    session = engine.start_session("ann", "Math", "Hard")
+    checkpoint = decode_session(encode_session(session, engine.remaining(session)))
+    smaller = QuizEngine(make_bank(size=4), clock=FakeClock())
+    with pytest.raises(ValueError):
+        smaller.resume_session(checkpoint)
+
+
+def test_hard_quizzes_are_not_taken_from_the_pack_cache():
+    packs = PackCache(capacity=4, low_water=2, seed=1)
+    try:
+        engine = make_engine(packs=packs)
+        session = engine.start_session("ann", "Math", "Hard")
+        assert sorted(session.order) == list(range(12))
+        assert (packs.hits, packs.misses) == (0, 0)
+        engine.start_session("ann", "Math", "Easy")
+        assert packs.misses == 1
+    finally:
+        packs.close()
@@ -0,0 +1,77 @@
+from attempt_log import INDEX_RECORD, AttemptLog
+from question_bank import CompactQuestionBank, MappedQuestionBank, build_question_bank
+from rescoring import AnswerKeys, apply_rescore, bank_answer_keys, rescore
+from score_journal import ScoreJournal
+
+
+def entry(name, attempt, score=0, total=3):
+    return {"name": name, "score": score, "total": total, "percentage": score / total * 100,
+            "category": "Math", "difficulty": "Easy", "date": "2026-01-01 10:00", "attempt": attempt}
+
+
+def test_rescore_uses_the_current_answer_keys(tmp_path):
+    log = AttemptLog(str(tmp_path / "attempts.bin"))
+    first = log.append("Math", [0, 1, 2], [0, 1, 3], 3)
+    second = log.append("Math", [3, 9], [3, 0], 4)
+    log.append("Gone", [0], [0], 1)
+
+    # Question 2's key was corrected to 3 and question 9 is no longer in the bank
+    keys = AnswerKeys({"Math": {"answers": [0, 1, 3, 3]}})
+    attempt_ids, scores, percentages = rescore(log, keys)
+    assert [log.key(attempt) for attempt in attempt_ids.tolist()] == [first, second]
+    assert list(scores) == [3, 1]
+    assert list(percentages) == [100.0, 25.0]
+    assert list(rescore(log, keys, points=3)[1]) == [9, 3]
+    log.close()
+
+
+def test_rescore_of_an_empty_log(tmp_path):
+    log = AttemptLog(str(tmp_path / "attempts.bin"))
+    assert [len(column) for column in rescore(log, AnswerKeys({}))] == [0, 0, 0]
+    log.close()
+
+
+def test_attempt_ids_are_unique_across_logs(tmp_path):
+    app_log = AttemptLog(str(tmp_path / "attempts.bin"))
+    server_log = AttemptLog(str(tmp_path / "server-attempts.bin"))
+    app_attempt = app_log.append("Math", [0, 1, 2], [0, 0, 0], 3)
+    server_attempt = server_log.append("Math", [0, 1, 2], [0, 1, 2], 3)
+    assert app_attempt != server_attempt
+    assert AttemptLog(str(tmp_path / "attempts.bin")).key(1) == app_attempt
+
+    scores = ScoreJournal(str(tmp_path / "scores.json"), str(tmp_path / "scores.log"))
+    scores.append(entry("ann", app_attempt, score=3))
+    scores.append(entry("bob", server_attempt, score=1))
+    keys = AnswerKeys({"Math": {"answers": [0, 1, 2]}})
+    # Only the app's result is re-scored, although both attempts are number 1 in their logs
+    assert apply_rescore(scores, app_log, *rescore(app_log, keys)) == 1
+    assert [(e["name"], e["score"]) for e in scores.entries] == [("ann", 1), ("bob", 1)]
+    scores.close()
+    app_log.close()
+    server_log.close()
+
+
+def test_logs_without_a_header_keep_plain_ids(tmp_path):
+    path = tmp_path / "attempts.bin"
+    path.write_bytes(INDEX_RECORD.pack(1, 0, 0, 0, 1))
+    log = AttemptLog(str(path))
+    assert (log.log_id, log.count) == (None, 1)
+    assert log.append("Math", [0], [0], 1) == 2
+    assert list(log.read()[0]) == [1, 2]
+    log.close()
+
+
+def test_answer_keys_from_a_mapped_bank_include_added_questions(tmp_path):
+    path = str(tmp_path / "questions.qbank")
+    build_question_bank(CompactQuestionBank({"Math": {"questions": ["Q0", "Q1"], "choices": [["A", "B"]] * 2,
+                                                      "answers": [1, 0]}}), path)
+    bank = MappedQuestionBank(path)
+    bank.add("Math", "Q2", ["A", "B"], 1)
+    bank.close()
+
+    log = AttemptLog(str(tmp_path / "attempts.bin"))
+    log.append("Math", [0, 1, 2], [1, 0, 1], 3)
+    bank = MappedQuestionBank(path)
+    assert list(rescore(log, bank_answer_keys(bank))[1]) == [3]
+    bank.close()
+    log.close()
@@ -0,0 +1,41 @@
+import time
+
+from sampling import PackCache, QuestionSampler
+
+
+def test_sample_returns_distinct_indices_in_range():
+    for n, k in ((10, 3), (10, 10), (1000000, 50), (5, 8)):
+        order = QuestionSampler(1).sample(n, k)
+        assert len(order) == min(n, k)
+        assert len(set(order)) == len(order)
+        assert all(0 <= i < n for i in order)
+
+
+def test_sample_is_reproducible_with_a_seed():
+    assert QuestionSampler(42).sample(500, 20) == QuestionSampler(42).sample(500, 20)
+    assert QuestionSampler(42).sample(500, 20) != QuestionSampler(43).sample(500, 20)
+
+
+def test_pack_cache_skips_whole_category_orders():
+    packs = PackCache(capacity=4, low_water=2, seed=1)
+    try:
+        assert packs.take("Math", "Hard", 100, 100) is None
+        assert packs.misses == 0
+        assert ("Math", "Hard") not in packs._packs
+        assert packs._thread is None
+    finally:
+        packs.close()
+
+
+def test_pack_cache_refills_in_the_background():
+    packs = PackCache(capacity=4, low_water=2, seed=1)
+    try:
+        assert packs.take("Math", "Easy", 100, 5) is None
+        deadline = time.monotonic() + 5
+        while len(packs._packs[("Math", "Easy")]) < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        order = packs.take("Math", "Easy", 100, 5)
+        assert len(set(order)) == 5 and all(0 <= i < 100 for i in order)
+        assert packs.hits == 1
+    finally:
+        packs.close()
@@ -0,0 +1,75 @@
+import json
+import time
+
+from score_journal import ScoreJournal
+
+
+def entry(name, score, total=10):
+    return {"name": name, "score": score, "total": total, "percentage": score / total * 100,
+            "category": "Math", "difficulty": "Easy", "date": "2026-01-01 10:00"}
+
+
+def open_journal(tmp_path, **kwargs):
+    return ScoreJournal(str(tmp_path / "scores.json"), str(tmp_path / "scores.log"), **kwargs)
+
+
+def test_results_survive_a_reopen(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.append(entry("ann", 7))
+    journal.append(entry("bob", 9))
+    journal.close()
+
+    reopened = open_journal(tmp_path)
+    assert [e["name"] for e in reopened.entries] == ["ann", "bob"]
+    assert [e["name"] for e in reopened.top()] == ["bob", "ann"]
+    reopened.close()
+
+
+def test_torn_last_line_is_discarded(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.append(entry("ann", 7))
+    journal.close()
+    with open(tmp_path / "scores.log", "a", encoding="utf-8") as f:
+        f.write('{"seq": 2, "entry": {"na')
+
+    reopened = open_journal(tmp_path)
+    assert [e["name"] for e in reopened.entries] == ["ann"]
+    reopened.append(entry("bob", 5))
+    reopened.close()
+    assert [e["name"] for e in open_journal(tmp_path).entries] == ["ann", "bob"]
+
+
+def test_compaction_moves_the_journal_into_the_snapshot(tmp_path):
+    journal = open_journal(tmp_path, compact_after=3)
+    for i in range(4):
+        journal.append(entry(f"user{i}", i))
+    journal.close()
+
+    with open(tmp_path / "scores.json", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert (snapshot["last_seq"], len(snapshot["scores"])) == (3, 3)
+    assert len(open_journal(tmp_path).entries) == 4
+
+
+def test_rescore_updates_entries_and_ranking(tmp_path):
+    journal = open_journal(tmp_path)
+    first, second = entry("ann", 9), entry("bob", 5)
+    first["attempt"], second["attempt"] = 1, 2
+    journal.append(first)
+    journal.append(second)
+    assert journal.rescore({1: (4, 40.0), 2: (5, 50.0)}) == 1
+    assert [e["name"] for e in journal.top()] == ["bob", "ann"]
+    journal.close()
+    assert open_journal(tmp_path).entries[0]["score"] == 4
+
+
+def test_quiet_journal_is_synced_within_the_interval(tmp_path):
+    journal = open_journal(tmp_path, fsync_every=100, fsync_interval=0.05)
+    journal.append(entry("ann", 7))
+    assert journal._unsynced == 1
+    deadline = time.monotonic() + 5
+    while journal._unsynced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert journal._unsynced == 0
+    journal.close()
+    assert not journal._thread.is_alive()
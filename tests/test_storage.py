@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from storage import JsonStorage, SqliteStorage, default_questions, export_sqlite_to_json, migrate_json_to_sqlite
+
+
+def json_storage(directory):
+    return JsonStorage(str(directory / "questions.json"), str(directory / "users.json"),
+                       str(directory / "scores.json"), str(directory / "scores.log"))
+
+
+def score(name, points):
+    return {"name": name, "score": points, "total": 5, "percentage": points * 20.0,
+            "category": "Python Basics", "difficulty": "Easy", "date": "2026-01-01 10:00", "attempt": None}
+
+
+@pytest.fixture
+def database(tmp_path):
+    source = json_storage(tmp_path)
+    source.save_questions(default_questions())
+    source.load_users()
+    source.save_user("ann", {"password": "x", "role": "user"})
+    source.scores.append(score("ann", 4))
+    source.close()
+    db = SqliteStorage(str(tmp_path / "quiz.db"))
+    migrate_json_to_sqlite(json_storage(tmp_path), db)
+    yield db
+    db.close()
+
+
+def test_export_round_trip(tmp_path, database):
+    out = tmp_path / "out"
+    out.mkdir()
+    target = json_storage(out)
+    export_sqlite_to_json(database, target)
+    target.close()
+
+    exported = json_storage(out)
+    assert exported.load_questions() == default_questions()
+    assert exported.load_users()["ann"]["role"] == "user"
+    assert [entry["name"] for entry in exported.scores.entries] == ["ann"]
+    exported.close()
+
+
+def test_interrupted_export_leaves_whole_files(tmp_path, database):
+    out = tmp_path / "out"
+    out.mkdir()
+    (out / "scores.json").write_text(json.dumps([score("old", 1)]))
+
+    def broken_scores():
+        yield score("new", 2)
+        raise OSError("disk went away")
+
+    database.iter_scores = broken_scores
+    target = json_storage(out)
+    with pytest.raises(OSError):
+        export_sqlite_to_json(database, target)
+    target.close()
+    assert json.loads((out / "users.json").read_text())["ann"]["role"] == "user"
+    assert json.loads((out / "scores.json").read_text()) == [score("old", 1)]
+    assert not (out / "scores.json.tmp").exists()
+
+
+def test_sqlite_rescore_updates_matching_attempts_and_reranks(tmp_path):
+    db = SqliteStorage(str(tmp_path / "quiz.db"))
+    scores = db.scores
+    for name, points, attempt in (("ann", 5, "log-1"), ("bob", 4, "log-2"), ("cy", 3, None)):
+        scores.append(dict(score(name, points), attempt=attempt))
+    assert scores.rescore({"log-1": (2, 40.0), "log-2": (4, 80.0), "other-1": (5, 100.0)}) == 1
+    assert [(e["name"], e["score"]) for e in scores.top()] == [("bob", 4), ("cy", 3), ("ann", 2)]
+    assert scores.rescore({"log-1": (2, 40.0)}) == 0
+    db.close()
+
+    reopened = SqliteStorage(str(tmp_path / "quiz.db"))
+    assert [(e["name"], e["attempt"]) for e in reopened.scores.top()] == [("bob", "log-2"), ("cy", None), ("ann", "log-1")]
+    reopened.close()
@@ -0,0 +1,27 @@
+import queue
+
+from analytics import QuestionStats
+from supervisor import ForwardedStats
+
+
+def test_worker_stats_start_from_the_store_file(tmp_path):
+    path = str(tmp_path / "question_stats.json")
+    store = QuestionStats(path)
+    store.record_answer("Math", 3, 1, 4, True, 2.0)
+    store.record_answer("Math", 3, 2, 4, False, 4.0)
+    store.close()
+
+    writes = queue.Queue()
+    worker = ForwardedStats(writes, path)
+    assert worker.question("Math", 3)["attempts"] == 2
+    worker.record_answer("Math", 3, 1, 4, True, 1.0)
+    assert worker.question("Math", 3)["attempts"] == 3
+    assert writes.get_nowait() == ("answer", ("Math", 3, 1, 4, True, 1.0))
+    # Only the store writes the file
+    worker.close()
+    assert QuestionStats(path).question("Math", 3)["attempts"] == 2
+
+
+def test_worker_stats_without_a_file(tmp_path):
+    worker = ForwardedStats(queue.Queue(), str(tmp_path / "question_stats.json"))
+    assert worker.categories == {}
@@ -0,0 +1,126 @@
+import json
+import time
+
+import pytest
+
+import write_behind
+from write_behind import WriteBehindFile, write_text_atomic
+
+
+class FakeAtexit:
+    def __init__(self):
+        self.registered = []
+
+    def register(self, func):
+        self.registered.append(func)
+
+    def unregister(self, func):
+        self.registered.remove(func)
+
+
+@pytest.fixture
+def exits(monkeypatch):
+    fake = FakeAtexit()
+    monkeypatch.setattr(write_behind, "atexit", fake)
+    return fake
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_a_burst_of_changes_is_one_write(tmp_path, exits):
+    path = str(tmp_path / "users.json")
+    writer = WriteBehindFile(path, {}, flush_every=1000, flush_interval=60)
+    for i in range(50):
+        with writer.changing() as users:
+            users[f"user{i}"] = {"role": "user"}
+    assert writer.pending == 50
+    assert not (tmp_path / "users.json").exists()
+    assert writer.flush()
+    assert not writer.flush()
+    assert (writer.flushes, len(read(path))) == (1, 50)
+    writer.close()
+
+
+def test_background_write_after_flush_every_changes(tmp_path, exits):
+    path = str(tmp_path / "users.json")
+    writer = WriteBehindFile(path, {}, flush_every=3, flush_interval=60)
+    for i in range(3):
+        with writer.changing() as users:
+            users[i] = i
+    assert wait_for(lambda: writer.flushes == 1)
+    assert read(path) == {"0": 0, "1": 1, "2": 2}
+    writer.close()
+
+
+def test_background_write_after_flush_interval(tmp_path, exits):
+    path = str(tmp_path / "questions.json")
+    questions = {"Math": [1]}
+    writer = WriteBehindFile(path, lambda: questions, flush_every=100, flush_interval=0.05)
+    writer.changed()
+    assert wait_for(lambda: writer.flushes == 1)
+    assert read(path) == {"Math": [1]}
+    writer.close()
+
+
+def test_close_writes_pending_changes_and_leaves_atexit(tmp_path, exits):
+    path = str(tmp_path / "users.json")
+    writer = WriteBehindFile(path, {"ann": 1}, flush_every=100, flush_interval=60)
+    assert exits.registered == [writer.close]
+    writer.changed()
+    writer.close()
+    assert read(path) == {"ann": 1}
+    assert exits.registered == []
+
+
+def test_pending_changes_are_written_at_exit(tmp_path, exits):
+    path = str(tmp_path / "users.json")
+    writer = WriteBehindFile(path, {"ann": 1}, flush_every=100, flush_interval=60)
+    writer.changed()
+    for func in list(exits.registered):
+        func()
+    assert read(path) == {"ann": 1}
+
+
+def test_a_failed_write_keeps_the_changes_pending(tmp_path, exits):
+    path = str(tmp_path / "missing" / "users.json")
+    writer = WriteBehindFile(path, {"ann": 1}, flush_every=100, flush_interval=60)
+    writer.changed()
+    with pytest.raises(OSError):
+        writer.flush()
+    assert writer.pending == 1
+    (tmp_path / "missing").mkdir()
+    writer.close()
+    assert read(path) == {"ann": 1}
+
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = str(tmp_path / "scores.json")
+    write_text_atomic(path, "[1]")
+    write_text_atomic(path, "[2]")
+    assert read(path) == [2]
+    assert [p.name for p in tmp_path.iterdir()] == ["scores.json"]
+
+
+def test_json_storage_writes_users_behind(tmp_path, exits):
+    from storage import JsonStorage
+
+    storage = JsonStorage(str(tmp_path / "questions.json"), str(tmp_path / "users.json"),
+                          str(tmp_path / "scores.json"), str(tmp_path / "scores.log"), flush_interval=60)
+    storage.load_users()
+    for i in range(20):
+        storage.save_user(f"user{i}", {"role": "user"})
+    assert not (tmp_path / "users.json").exists()
+    # Loading again sees every change made so far
+    assert len(storage.load_users()) == 20
+    assert storage._users_writer.flushes == 1
+    storage.close()
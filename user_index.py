@@ -0,0 +1,85 @@
+from bisect import bisect_left, insort
+
+# Sorts after any character a username can continue with
+_PREFIX_END = "\U0010ffff"
+
+
+class UserRange:
+    """A run of consecutive entries of a UserIndex list, indexable like a list of usernames."""
+    __slots__ = ("entries", "start", "stop")
+
+    def __init__(self, entries, start, stop):
+        self.entries = entries
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.entries[self.start + i][1]
+
+    def index(self, username):
+        """Position of `username` in the range; ValueError if it isn't there."""
+        pos = bisect_left(self.entries, (username.casefold(), username))
+        if self.start <= pos < self.stop and self.entries[pos][1] == username:
+            return pos - self.start
+        raise ValueError(f"{username!r} is not in the range")
+
+
+class UserIndex:
+    """
+    Usernames kept sorted (case-insensitively), overall and per role, so a
+    case-insensitive prefix search is two binary searches and returns a range
+    that can be paged through without copying. Adding a user or changing a
+    role updates the lists in place.
+    """
+
+    def __init__(self, users=None):
+        self.roles = {}         # username -> role
+        self._all = []          # (casefolded name, name), sorted
+        self._by_role = {}      # role -> sorted (casefolded name, name)
+        for username, data in (users or {}).items():
+            role = data.get("role", "user")
+            self.roles[username] = role
+            entry = (username.casefold(), username)
+            self._all.append(entry)
+            self._by_role.setdefault(role, []).append(entry)
+        self._all.sort()
+        for entries in self._by_role.values():
+            entries.sort()
+
+    def __len__(self):
+        return len(self._all)
+
+    def __contains__(self, username):
+        return username in self.roles
+
+    def add(self, username, role="user"):
+        if username in self.roles:
+            self.set_role(username, role)
+            return
+        self.roles[username] = role
+        entry = (username.casefold(), username)
+        insort(self._all, entry)
+        insort(self._by_role.setdefault(role, []), entry)
+
+    def set_role(self, username, role):
+        old_role = self.roles[username]
+        if old_role == role:
+            return
+        entry = (username.casefold(), username)
+        entries = self._by_role[old_role]
+        del entries[bisect_left(entries, entry)]
+        insort(self._by_role.setdefault(role, []), entry)
+        self.roles[username] = role
+
+    def search(self, prefix="", role=None):
+        """Users whose name starts with `prefix` (ignoring case), optionally only those with `role`, in order."""
+        entries = self._all if role is None else self._by_role.get(role, [])
+        key = prefix.casefold()
+        start = bisect_left(entries, (key,))
+        stop = bisect_left(entries, (key + _PREFIX_END,)) if key else len(entries)
+        return UserRange(entries, start, stop)
@@ -0,0 +1,138 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import METRICS
+
+
+def write_bytes_atomic(path, data, label=None):
+    """
+    Replaces `path` with `data` so readers see either the old or the new file,
+    never a partial one. `label` names the file in metrics, default its basename.
+    """
+    started = time.perf_counter()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    METRICS.record_io("write", path, len(data), time.perf_counter() - started, label)
+
+
+def write_text_atomic(path, text):
+    write_bytes_atomic(path, text.encode("utf-8"))
+
+
+class WriteBehindFile:
+    """
+    Write-behind persistence for a JSON document that is stored as one file.
+
+    Changes are made to the in-memory document inside `with writer.changing():`
+    and only mark it dirty. The document may also be a callable returning the
+    data to write, for data that lives in some other structure. A background
+    thread rewrites the file once `flush_every` changes have accumulated or
+    `flush_interval` seconds after the first unwritten change, so a burst of
+    signups or new questions costs one rewrite instead of one each. Background
+    rewrites are also spaced so they take at most about a tenth of the time,
+    which matters once the file is large. flush() and close() write
+    immediately, and close() also runs at interpreter exit so pending changes
+    are never dropped.
+    """
+
+    def __init__(self, path, document=None, flush_every=100, flush_interval=1.0, indent=4):
+        self.path = path
+        self.document = document
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.indent = indent
+        self.flushes = 0
+
+        self._lock = threading.Condition(threading.RLock())
+        self._io_lock = threading.Lock()
+        self._pending = 0
+        self._first_pending = None
+        self._next_allowed = 0.0
+        self._thread = None
+        self._closed = False
+        atexit.register(self.close)
+
+    @contextmanager
+    def changing(self):
+        """Context for changing the document; the change is counted once the block completes."""
+        with self._lock:
+            yield self.document
+            self.changed()
+
+    def changed(self):
+        """Counts a change that was made to the document."""
+        with self._lock:
+            self._pending += 1
+            if self._first_pending is None:
+                self._first_pending = time.monotonic()
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name=f"write-behind {self.path}", daemon=True)
+                self._thread.start()
+            self._lock.notify()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _due_in(self):
+        """Seconds until the next write is due, None if nothing is pending."""
+        if not self._pending:
+            return None
+        now = time.monotonic()
+        due = now if self._pending >= self.flush_every else self._first_pending + self.flush_interval
+        return max(0.0, due - now, self._next_allowed - now)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._closed and self._due_in() != 0.0:
+                    self._lock.wait(self._due_in())
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except OSError:
+                # Keep the changes pending and try again after the next interval
+                with self._lock:
+                    self._lock.wait(self.flush_interval)
+
+    def flush(self):
+        """Writes the document now if it has unwritten changes. Returns True if it wrote."""
+        with self._io_lock:
+            started = time.monotonic()
+            with self._lock:
+                if not self._pending:
+                    return False
+                # Serialized under the lock so no change can land halfway through
+                document = self.document() if callable(self.document) else self.document
+                text = json.dumps(document, indent=self.indent)
+                pending, self._pending, self._first_pending = self._pending, 0, None
+            try:
+                write_text_atomic(self.path, text)
+            except OSError:
+                with self._lock:
+                    self._pending += pending
+                    if self._first_pending is None:
+                        self._first_pending = time.monotonic()
+                raise
+            self.flushes += 1
+            finished = time.monotonic()
+            self._next_allowed = finished + 9 * (finished - started)
+            return True
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)